@@ -6,8 +6,7 @@ from app.app_settings import AppSettings
 settings = AppSettings()
 
 if __name__ == "__main__":
-    # TODO: allow parsing of multiple mods folders
-    mod_collection = ModsFolder(settings.core.mods_path[0])
+    mod_collection = ModsFolder(settings.core.mods_path)
 
     ui = CLI()
 
@@ -1,5 +1,6 @@
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, FrozenSet, List
+import sys
 import yaml
 from pathlib import Path
 from datetime import date
@@ -25,20 +26,27 @@ def print_recurse_dict(d: dict | str, indent_value: int = 0):
 class CoreAppSettings:
     mods_path: List[Path]
     open_mw_conf_path: Path
+    cache_path: Path
+    profiles_path: Path
 
     def __init__(self, core_dict: Dict):
         self.mods_path = [Path(p) for p in core_dict["mods_path"]]
         self.open_mw_conf_path = Path(core_dict["open_mw_conf_path"])
+        self.cache_path = Path(core_dict["cache_path"])
+        self.profiles_path = Path(core_dict["profiles_path"])
 
 
 @dataclass
 class ParsingAppSettings:
-    resource_dir_names: List[str]
+    resource_dir_names: FrozenSet[str]
     max_date_folder_timestamp: date
     min_date_folder_timestamp: date
 
     def __init__(self, parsing_dict: Dict):
-        self.resource_dir_names = parsing_dict["resource_dir_names"]
+        # case-folded to match against ModResource.folded_name
+        self.resource_dir_names = frozenset(
+            sys.intern(name.casefold()) for name in parsing_dict["resource_dir_names"]
+        )
         self.max_date_folder_timestamp = parsing_dict["max_date_folder_timestamp"]
         self.min_date_folder_timestamp = parsing_dict["min_date_folder_timestamp"]
 
@@ -0,0 +1,289 @@
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.mod_resources import Mod, ModDataDir, ModFile
+from app.scan_cache import ScanCache
+
+CACHE_NAMESPACE = "asset_headers"
+
+# resource dirs whose files are inspected, and the file types read in each
+INSPECTED_FILE_TYPES = {
+    "textures": ".dds",
+    "meshes": ".nif",
+}
+
+# only this much of any file is ever read - enough for the DDS header with
+# its DX10 extension, or the NIF header string and version block
+HEADER_READ_SIZE = 148
+
+DDS_MAGIC = b"DDS "
+# height, width, pitch, depth, mipmap count
+DDS_HEADER = struct.Struct("<5I")
+DDS_HEADER_OFFSET = 12
+# pixel format flags, four cc, rgb bit count
+DDS_PIXEL_FORMAT = struct.Struct("<I4sI")
+DDS_PIXEL_FORMAT_OFFSET = 80
+DDS_CAPS2_OFFSET = 112
+DDS_DX10_FORMAT_OFFSET = 128
+
+DDSD_MIPMAPCOUNT = 0x20000
+DDSCAPS2_CUBEMAP = 0x200
+DDPF_FOURCC = 0x4
+
+# bytes per 4x4 block of block compressed formats
+BLOCK_SIZES = {
+    b"DXT1": 8,
+    b"DXT2": 16,
+    b"DXT3": 16,
+    b"DXT4": 16,
+    b"DXT5": 16,
+    b"ATI1": 8,
+    b"BC4U": 8,
+    b"ATI2": 16,
+    b"BC5U": 16,
+}
+# DXGI formats (from the DX10 header) that are block compressed
+DXGI_BLOCK_SIZES = {
+    **{dxgi_format: 8 for dxgi_format in (70, 71, 72, 79, 80, 81)},
+    **{dxgi_format: 16 for dxgi_format in (73, 74, 75, 76, 77, 78, 82, 83, 84)},
+    **{dxgi_format: 16 for dxgi_format in (94, 95, 96, 97, 98, 99)},
+}
+
+NIF_VERSION = struct.Struct("<II")
+
+
+def estimate_texture_size(
+    width: int, height: int, mipmaps: int, block_size: int = 0, bits_per_pixel: int = 0
+) -> int:
+    """Bytes the texture takes up once loaded, including its mipmaps"""
+    total = 0
+    for level in range(max(1, mipmaps)):
+        level_width = max(1, width >> level)
+        level_height = max(1, height >> level)
+        if block_size:
+            total += ((level_width + 3) // 4) * ((level_height + 3) // 4) * block_size
+        else:
+            total += level_width * level_height * bits_per_pixel // 8
+    return total
+
+
+def read_dds_header(header: bytes) -> Optional[Dict]:
+    if len(header) < DDS_DX10_FORMAT_OFFSET or not header.startswith(DDS_MAGIC):
+        return None
+
+    flags = int.from_bytes(header[8:12], "little")
+    height, width, _, _, mipmaps = DDS_HEADER.unpack_from(header, DDS_HEADER_OFFSET)
+    pf_flags, four_cc, bits_per_pixel = DDS_PIXEL_FORMAT.unpack_from(
+        header, DDS_PIXEL_FORMAT_OFFSET
+    )
+    caps2 = int.from_bytes(header[DDS_CAPS2_OFFSET : DDS_CAPS2_OFFSET + 4], "little")
+
+    if not flags & DDSD_MIPMAPCOUNT:
+        mipmaps = 1
+
+    block_size = 0
+    if pf_flags & DDPF_FOURCC:
+        texture_format = four_cc.decode("ascii", "replace").strip("\0")
+        if four_cc == b"DX10" and len(header) >= DDS_DX10_FORMAT_OFFSET + 4:
+            dxgi_format = int.from_bytes(
+                header[DDS_DX10_FORMAT_OFFSET : DDS_DX10_FORMAT_OFFSET + 4], "little"
+            )
+            texture_format = f"DXGI_{dxgi_format}"
+            block_size = DXGI_BLOCK_SIZES.get(dxgi_format, 0)
+            bits_per_pixel = 0 if block_size else 32
+        else:
+            block_size = BLOCK_SIZES.get(four_cc, 0)
+            bits_per_pixel = 0 if block_size else 32
+    else:
+        texture_format = f"RGB{bits_per_pixel}"
+
+    vram = estimate_texture_size(width, height, mipmaps, block_size, bits_per_pixel)
+    if caps2 & DDSCAPS2_CUBEMAP:
+        vram *= 6
+
+    return {
+        "kind": "texture",
+        "width": width,
+        "height": height,
+        "mipmaps": mipmaps,
+        "format": texture_format,
+        "vram": vram,
+    }
+
+
+def read_nif_header(header: bytes) -> Optional[Dict]:
+    line_end = header.find(b"\n")
+    if line_end < 0 or b"File Format" not in header[:line_end]:
+        return None
+
+    header_string = header[:line_end].decode("ascii", "replace")
+    version_string = header_string.rsplit("Version", 1)[-1].strip()
+
+    version, num_blocks = None, None
+    if len(header) >= line_end + 1 + NIF_VERSION.size:
+        version, num_blocks = NIF_VERSION.unpack_from(header, line_end + 1)
+
+    return {
+        "kind": "mesh",
+        "version": version_string,
+        "version_number": version,
+        # only meaningful for Morrowind era (4.x) files, where it follows the
+        # version directly
+        "num_blocks": num_blocks if version_string.startswith("4.") else None,
+    }
+
+
+def inspect_file(path: Path) -> Optional[Dict]:
+    """Reads the header of a DDS or NIF file. Run from worker threads."""
+    with open(path, "rb", buffering=0) as asset_file:
+        header = asset_file.read(HEADER_READ_SIZE)
+
+    suffix = path.suffix.lower()
+    if suffix == ".dds":
+        return read_dds_header(header)
+    if suffix == ".nif":
+        return read_nif_header(header)
+    return None
+
+
+def inspect_files(
+    mod_files: Iterable[ModFile], cache: ScanCache = None, max_workers: int = 16
+) -> Dict[Path, Optional[Dict]]:
+    """Header info for each file, by path - taken from the cache for files
+    that haven't changed, otherwise read in parallel. Files are checked
+    against the cache with the size and modified time the scan found them
+    with, so nothing is stat'ed again."""
+    results = {}
+    to_read = []
+    for mod_file in mod_files:
+        cached = (
+            cache.get(CACHE_NAMESPACE, mod_file.path, signature=mod_file.signature)
+            if cache
+            else None
+        )
+        if cached is None:
+            to_read.append(mod_file)
+        else:
+            results[mod_file.path] = cached
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        paths = [mod_file.path for mod_file in to_read]
+        for mod_file, info in zip(to_read, executor.map(inspect_file, paths)):
+            results[mod_file.path] = info
+            if cache is not None:
+                # files that aren't valid are cached too, so they're not re-read
+                cache.put(
+                    CACHE_NAMESPACE,
+                    mod_file.path,
+                    info or {"kind": "invalid"},
+                    signature=mod_file.signature,
+                )
+
+    return {
+        path: info if info is None or info["kind"] != "invalid" else None
+        for path, info in results.items()
+    }
+
+
+def iter_inspected_files(data_dir: ModDataDir) -> Iterator[ModFile]:
+    for resource_dir in data_dir.resource_dirs:
+        file_type = INSPECTED_FILE_TYPES.get(resource_dir.folded_name)
+        if file_type is None:
+            continue
+
+        for mod_file in resource_dir.iter_files():
+            if mod_file.suffix == file_type:
+                yield mod_file
+
+
+@dataclass
+class AssetReport:
+    """Totals for the textures and meshes of a data dir or mod"""
+
+    name: str
+    num_textures: int = 0
+    num_meshes: int = 0
+    num_invalid: int = 0
+    texture_vram: int = 0
+    # (vram, width, height, format, data-relative path) of the biggest textures
+    largest_textures: List[Tuple[int, int, int, str, str]] = field(default_factory=list)
+
+    def add(self, data_key: str, info: Optional[Dict], num_largest: int):
+        if info is None:
+            self.num_invalid += 1
+        elif info["kind"] == "mesh":
+            self.num_meshes += 1
+        else:
+            self.num_textures += 1
+            self.texture_vram += info["vram"]
+            self.largest_textures.append(
+                (info["vram"], info["width"], info["height"], info["format"], data_key)
+            )
+            if len(self.largest_textures) > 2 * num_largest:
+                self.trim_largest(num_largest)
+
+    def trim_largest(self, num_largest: int):
+        self.largest_textures.sort(reverse=True)
+        del self.largest_textures[num_largest:]
+
+    def merge(self, other: "AssetReport", num_largest: int):
+        self.num_textures += other.num_textures
+        self.num_meshes += other.num_meshes
+        self.num_invalid += other.num_invalid
+        self.texture_vram += other.texture_vram
+        self.largest_textures.extend(other.largest_textures)
+        self.trim_largest(num_largest)
+
+    def to_record(self) -> Dict:
+        return {
+            "name": self.name,
+            "textures": self.num_textures,
+            "meshes": self.num_meshes,
+            "invalid": self.num_invalid,
+            "texture_vram": self.texture_vram,
+            "largest_textures": [
+                {
+                    "file": data_key,
+                    "vram": vram,
+                    "width": width,
+                    "height": height,
+                    "format": texture_format,
+                }
+                for vram, width, height, texture_format, data_key in (
+                    self.largest_textures
+                )
+            ],
+        }
+
+
+def inspect_mod(
+    mod: Mod, cache: ScanCache = None, num_largest: int = 5
+) -> Tuple[AssetReport, List[AssetReport]]:
+    """Inspects the textures and meshes of each of a mod's data dirs.
+    Returns the report for the whole mod, and one per data dir."""
+    if mod.data_dirs is None:
+        mod.get_data_dirs()
+
+    data_dir_files = [
+        (data_dir, list(iter_inspected_files(data_dir)))
+        for data_dir in mod.data_dirs or []
+    ]
+    infos = inspect_files(
+        [mod_file for _, files in data_dir_files for mod_file in files], cache
+    )
+
+    mod_report = AssetReport(mod.name)
+    data_dir_reports = []
+    for data_dir, files in data_dir_files:
+        report = AssetReport(data_dir.name)
+        for mod_file in files:
+            report.add(mod_file.data_key, infos[mod_file.path], num_largest)
+        report.trim_largest(num_largest)
+
+        data_dir_reports.append(report)
+        mod_report.merge(report, num_largest)
+
+    return mod_report, data_dir_reports
@@ -1,10 +1,17 @@
 from functools import total_ordering
 from pathlib import Path
-from typing import Tuple
+from typing import Iterable, List, Tuple
+import os
 from enum import Enum
 import click
 
 from app.app_settings import AppSettings
+from app.fallbacks import (
+    FALLBACK_PREFIX,
+    KIND_COLOUR,
+    FallbackTable,
+    parse_fallback_value,
+)
 
 settings = AppSettings()
 
@@ -97,10 +104,11 @@ class DataOption(Option):
 
 
 def detect_fallback_type(value_segment: str) -> object:
-    if len(value_segment) == 3:
+    kind, _ = parse_fallback_value(value_segment)
+    if kind == KIND_COLOUR:
         return ColourValue
 
-    elif value_segment in ["0", "1"]:
+    elif value_segment.strip() in ["0", "1"]:
         return BoolValue
 
     else:
@@ -108,17 +116,24 @@ def detect_fallback_type(value_segment: str) -> object:
 
 
 def parse_fallback_line(fallback_segment: str) -> Tuple[str, Value]:
-    parsed = fallback_segment.split(",")
-    name = parsed[0]
-    value_segment = parsed[1:]
+    name, _, value_segment = fallback_segment.partition(",")
 
     value_type = detect_fallback_type(value_segment)
 
     if value_type is ColourValue:
-        value = ColourValue(*value_segment)
+        _, colour = parse_fallback_value(value_segment)
+        value = ColourValue(
+            *(
+                ColourComponent(component_type, component)
+                for component_type, component in zip(ColourComponentType, colour)
+            )
+        )
+
+    elif value_type is BoolValue:
+        value = BoolValue(value_segment.strip() == "1")
 
     else:
-        value = Value("".join(value_segment))
+        value = Value(value_segment)
 
     return (name, value)
 
@@ -148,24 +163,85 @@ no '=' character found: {line}"
         return Option(line_number, name, value)
 
 
-def read_cfg(cfg_path: Path) -> dict:
-    """Reads a open MW config file and returns
-    all values as a dictionary"""
+def read_cfg(cfg_path: Path) -> Tuple[List[Option], FallbackTable]:
+    """Reads a open MW config file. fallback= values (there can be
+    thousands) go into a FallbackTable, and every other line is returned
+    as an Option"""
+    cfg_lines = [line.strip() for line in read_cfg_lines(cfg_path)]
+    fallbacks = FallbackTable.from_cfg_lines(cfg_lines)
+
+    options = [
+        parse_cfg_line(line_number, line)
+        for line_number, line in enumerate(cfg_lines)
+        if line and not line.startswith(("#", FALLBACK_PREFIX))
+    ]
+    return options, fallbacks
+
+
+def format_data_line(data_path: Path) -> str:
+    return f'data="{data_path}"'
+
+
+def replace_data_lines(cfg_lines: List[str], data_paths: Iterable[Path]) -> List[str]:
+    """Swaps every data= line in cfg_lines for data_paths. The new data= lines
+    go where the first existing data= line was, or at the end if there was none"""
+    new_data_lines = [format_data_line(p) for p in data_paths]
+
+    kept_lines = []
+    insert_idx = None
+    for line in cfg_lines:
+        if line.strip().startswith("data="):
+            if insert_idx is None:
+                insert_idx = len(kept_lines)
+            continue
+
+        kept_lines.append(line)
+
+    if insert_idx is None:
+        insert_idx = len(kept_lines)
+
+    return kept_lines[:insert_idx] + new_data_lines + kept_lines[insert_idx:]
+
 
+def read_cfg_lines(cfg_path: Path) -> List[str]:
     with open(cfg_path, "r") as cfg_file:
-        parsed = [
-            parsed_line
-            for parsed_line in map(
-                lambda x: parse_cfg_line(*x),
-                [
-                    (line_number, line.strip())
-                    for (line_number, line) in enumerate(cfg_file.readlines())
-                ],
-            )
-        ]
+        return cfg_file.read().splitlines()
+
+
+def read_cfg_values(cfg_path: Path, key: str) -> List[str]:
+    """Returns the values of every 'key=' line of the config, in order"""
+    prefix = f"{key}="
+    return [
+        line.strip()[len(prefix) :].strip()
+        for line in read_cfg_lines(cfg_path)
+        if line.strip().startswith(prefix)
+    ]
+
+
+def read_content_order(cfg_path: Path) -> List[str]:
+    """Returns the content= plugin names of the config, in load order"""
+    return read_cfg_values(cfg_path, "content")
+
+
+def read_data_paths(cfg_path: Path) -> List[Path]:
+    """Returns the data= directories of the config, in order"""
+    return [Path(value.strip('"')) for value in read_cfg_values(cfg_path, "data")]
 
-    for p in parsed:
-        print(p)
+
+def write_cfg_lines(cfg_path: Path, cfg_lines: List[str]):
+    """Writes the config to a temporary file, then swaps it into place so
+    OpenMW never sees a half written config"""
+    tmp_path = cfg_path.with_name(cfg_path.name + ".tmp")
+    with open(tmp_path, "w") as tmp_file:
+        tmp_file.write("\n".join(cfg_lines) + "\n")
+
+    os.replace(tmp_path, cfg_path)
+
+
+def write_data_dirs(cfg_path: Path, data_paths: Iterable[Path]):
+    """Replaces the data= entries of the config at cfg_path with data_paths"""
+    cfg_lines = read_cfg_lines(cfg_path)
+    write_cfg_lines(cfg_path, replace_data_lines(cfg_lines, data_paths))
 
 
 @click.command()
@@ -174,8 +250,10 @@ def cli():
     print("oh hi there")
 
 
-read_cfg(settings.core.open_mw_conf_path)
-
-
 if __name__ == "__main__":
+    options, fallbacks = read_cfg(settings.core.open_mw_conf_path)
+    for option in options:
+        print(option)
+    for name in fallbacks:
+        print(fallbacks.to_line(name))
     cli()
@@ -0,0 +1,200 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.mod_resources import ESP_FILE_TYPES, fold_name
+
+# data= paths are checked this many at a time - on network mounts each check
+# is mostly spent waiting, so this can be much higher than the CPU count
+MAX_WORKERS = 32
+
+
+@dataclass
+class CfgEntry:
+    line_number: int
+    key: str
+    value: str
+
+
+@dataclass
+class DataDirListing:
+    """What one scandir of a data= path found"""
+
+    path: Path
+    error: Optional[str] = None
+    # folded plugin name -> file name as it is on disk
+    plugins: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass
+class CfgIssue:
+    # missing, duplicate or shadowed
+    kind: str
+    entry: CfgEntry
+    detail: str
+
+    def to_record(self) -> Dict:
+        return {
+            "issue": self.kind,
+            "key": self.entry.key,
+            "line": self.entry.line_number + 1,
+            "value": self.entry.value,
+            "detail": self.detail,
+        }
+
+
+def iter_cfg_entries(cfg_lines: Iterable[str], keys=("data", "content")):
+    """Yields the entries of the given keys, skipping comments"""
+    for line_number, line in enumerate(cfg_lines):
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+
+        key, value = line.split("=", 1)
+        key = key.strip()
+        if key in keys:
+            yield CfgEntry(line_number, key, value.strip())
+
+
+def get_data_path(entry: CfgEntry, base_path: Path = None) -> Path:
+    path = Path(entry.value.strip('"'))
+    if base_path is not None and not path.is_absolute():
+        path = base_path / path
+    return path
+
+
+def list_data_dir(path: Path) -> DataDirListing:
+    """Checks a data= path and finds its plugins with a single scandir, so
+    each data dir costs one round trip. Run from worker threads."""
+    listing = DataDirListing(path)
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                folded_name = fold_name(entry.name)
+                if (
+                    os.path.splitext(folded_name)[1] in ESP_FILE_TYPES
+                    and entry.is_file()
+                ):
+                    listing.plugins[folded_name] = entry.name
+    except FileNotFoundError:
+        listing.error = "does not exist"
+    except NotADirectoryError:
+        listing.error = "is not a directory"
+    except OSError as e:
+        listing.error = e.strerror or str(e)
+
+    return listing
+
+
+def list_data_dirs(
+    paths: List[Path], max_workers: int = MAX_WORKERS
+) -> List[DataDirListing]:
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return list(executor.map(list_data_dir, paths))
+
+
+def get_path_key(path: Path) -> str:
+    return os.path.normcase(os.path.normpath(path))
+
+
+def validate_data_entries(
+    entries: List[CfgEntry], listings: List[DataDirListing]
+) -> List[CfgIssue]:
+    issues = []
+    first_lines: Dict[str, int] = {}
+    for entry, listing in zip(entries, listings):
+        if listing.error is not None:
+            issues.append(CfgIssue("missing", entry, f"{listing.path} {listing.error}"))
+
+        path_key = get_path_key(listing.path)
+        if path_key in first_lines:
+            issues.append(
+                CfgIssue(
+                    "duplicate",
+                    entry,
+                    f"already listed on line {first_lines[path_key] + 1}",
+                )
+            )
+        else:
+            first_lines[path_key] = entry.line_number
+
+    return issues
+
+
+def get_plugin_providers(
+    listings: List[DataDirListing],
+) -> Dict[str, List[Tuple[Path, str]]]:
+    """Maps each folded plugin name to the (data dir, file name) of every
+    data dir that has it, in data= order - the last one is what OpenMW loads.
+    Data dirs listed more than once only count where they are first listed."""
+    providers: Dict[str, List[Tuple[Path, str]]] = {}
+    seen_paths = set()
+    for listing in listings:
+        path_key = get_path_key(listing.path)
+        if path_key in seen_paths:
+            continue
+        seen_paths.add(path_key)
+
+        for folded_name, file_name in listing.plugins.items():
+            providers.setdefault(folded_name, []).append((listing.path, file_name))
+    return providers
+
+
+def validate_content_entries(
+    entries: List[CfgEntry], listings: List[DataDirListing]
+) -> List[CfgIssue]:
+    providers = get_plugin_providers(listings)
+
+    issues = []
+    first_lines: Dict[str, int] = {}
+    for entry in entries:
+        folded_name = fold_name(entry.value)
+        if folded_name in first_lines:
+            issues.append(
+                CfgIssue(
+                    "duplicate",
+                    entry,
+                    f"already listed on line {first_lines[folded_name] + 1}",
+                )
+            )
+            continue
+        first_lines[folded_name] = entry.line_number
+
+        plugin_providers = providers.get(folded_name)
+        if plugin_providers is None:
+            issues.append(CfgIssue("missing", entry, "not found in any data= dir"))
+        elif len(plugin_providers) > 1:
+            winner = plugin_providers[-1][0]
+            shadowed = ", ".join(str(path) for path, _ in plugin_providers[:-1])
+            issues.append(
+                CfgIssue("shadowed", entry, f"loaded from {winner}, hides {shadowed}")
+            )
+
+    return issues
+
+
+def validate_cfg_lines(
+    cfg_lines: Iterable[str], base_path: Path = None, max_workers: int = MAX_WORKERS
+) -> List[CfgIssue]:
+    """Checks the data= and content= entries of a config - data= paths that
+    are missing or listed twice, and content= plugins that are in no data=
+    dir, listed twice, or in more than one data dir (so all but the last
+    copy are never loaded). Every data= path is checked concurrently.
+
+    Relative data= paths are taken as relative to base_path, if given."""
+    entries = list(iter_cfg_entries(cfg_lines))
+    data_entries = [entry for entry in entries if entry.key == "data"]
+    content_entries = [entry for entry in entries if entry.key == "content"]
+
+    listings = list_data_dirs(
+        [get_data_path(entry, base_path) for entry in data_entries], max_workers
+    )
+
+    issues = validate_data_entries(data_entries, listings)
+    issues += validate_content_entries(content_entries, listings)
+    issues.sort(key=lambda issue: issue.entry.line_number)
+    return issues
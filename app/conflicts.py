@@ -0,0 +1,58 @@
+from pathlib import Path
+from typing import Dict, Iterable, List, Sequence
+
+from app.mod_resources import ModDataDir, ModFile, fold_name
+
+
+def get_data_key(data_dir: ModDataDir, mod_file: ModFile) -> str:
+    """The path of a file relative to data_dir, in the case-insensitive
+    form that OpenMW's VFS looks files up with"""
+    data_key = mod_file.data_key
+
+    # only data dirs nested inside data_dir need their keys joining up
+    owner = mod_file.data_dir
+    while owner is not None and owner is not data_dir:
+        data_key = f"{owner.data_key}/{data_key}"
+        owner = owner.data_dir
+
+    return data_key
+
+
+def get_file_providers(data_dirs: Iterable[ModDataDir]) -> Dict[str, List[ModDataDir]]:
+    """Maps each data-relative file to the data dirs that provide it, in the
+    order of data_dirs. As with openmw.cfg data= entries, the last provider
+    of a file is the one the game uses."""
+    providers: Dict[str, List[ModDataDir]] = {}
+    for data_dir in data_dirs:
+        for mod_file in data_dir.iter_files():
+            providers.setdefault(get_data_key(data_dir, mod_file), []).append(data_dir)
+
+    return providers
+
+
+def find_file_conflicts(data_dirs: Iterable[ModDataDir]) -> Dict[str, List[ModDataDir]]:
+    """Files that are provided by more than one of data_dirs"""
+    return {
+        data_key: file_providers
+        for data_key, file_providers in get_file_providers(data_dirs).items()
+        if len(file_providers) > 1
+    }
+
+
+def get_plugin_load_order(
+    data_dirs: Sequence[ModDataDir], content_names: Sequence[str] = ()
+) -> List[Path]:
+    """Paths of the plugins in data_dirs, in load order. When content_names
+    (the content= entries of openmw.cfg) are given only those plugins are
+    loaded, in that order, each from the last data dir that has it. Otherwise
+    every plugin is loaded, masters first, in data dir order."""
+    plugins: Dict[str, Path] = {}
+    for data_dir in data_dirs:
+        for esp in data_dir.esp_files:
+            plugins[esp.folded_name] = esp.path
+
+    if content_names:
+        folded_names = [fold_name(name) for name in content_names]
+        return [plugins[name] for name in folded_names if name in plugins]
+
+    return sorted(plugins.values(), key=lambda path: path.suffix.lower() != ".esm")
@@ -0,0 +1,261 @@
+import re
+import sys
+from array import array
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+FALLBACK_PREFIX = "fallback="
+
+# Morrowind.ini sections that OpenMW takes as fallback values - "Weather"
+# also covers "Weather Clear", "Weather Thunderstorm" etc.
+FALLBACK_SECTIONS = (
+    "Blood",
+    "Fonts",
+    "General",
+    "Inventory",
+    "Level Up",
+    "Map",
+    "Moons",
+    "Movies",
+    "Question",
+    "Water",
+    "Weather",
+)
+
+# Morrowind.ini predates unicode, so it is read as windows-1252
+INI_ENCODING = "cp1252"
+
+KIND_STRING = 0
+KIND_INT = 1
+KIND_FLOAT = 2
+KIND_COLOUR = 3
+
+INT_VALUE = re.compile(r"[+-]?\d+")
+FLOAT_VALUE = re.compile(r"[+-]?(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?")
+INT_LIMIT = 1 << 63
+
+
+def parse_fallback_value(text: str) -> Tuple[int, object]:
+    """Returns (kind, value) for the text of a fallback value - an 'r,g,b'
+    colour, an int, a float, or otherwise a string"""
+    text = text.strip()
+
+    parts = text.split(",")
+    if len(parts) == 3 and all(part.strip().isdigit() for part in parts):
+        colour = tuple(int(part) for part in parts)
+        if max(colour) <= 255:
+            return KIND_COLOUR, colour
+
+    if INT_VALUE.fullmatch(text) and abs(int(text)) < INT_LIMIT:
+        return KIND_INT, int(text)
+    if FLOAT_VALUE.fullmatch(text):
+        return KIND_FLOAT, float(text)
+
+    return KIND_STRING, sys.intern(text)
+
+
+def format_fallback_value(kind: int, value) -> str:
+    if kind == KIND_COLOUR:
+        return "{},{},{}".format(*value)
+    if kind == KIND_FLOAT:
+        return repr(value)
+    return str(value)
+
+
+class FallbackTable:
+    """fallback= values keyed by name. Rather than an object per value, each
+    value lives in a typed array for its kind (or a list of interned strings)
+    and the table only keeps its kind and position."""
+
+    def __init__(self):
+        # name -> entry number
+        self.entries: Dict[str, int] = {}
+        self.kinds = array("B")
+        self.offsets = array("I")
+
+        self.ints = array("q")
+        self.floats = array("d")
+        # three components per colour
+        self.colours = array("B")
+        self.strings: List[str] = []
+
+    def __repr__(self):
+        return f"FallbackTable[{len(self)} values]"
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, name: str):
+        return name in self.entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.entries)
+
+    def store(self, kind: int, value) -> int:
+        """Adds a value to the array for its kind, returning its offset"""
+        if kind == KIND_INT:
+            self.ints.append(value)
+            return len(self.ints) - 1
+        if kind == KIND_FLOAT:
+            self.floats.append(value)
+            return len(self.floats) - 1
+        if kind == KIND_COLOUR:
+            self.colours.extend(value)
+            return len(self.colours) // 3 - 1
+
+        self.strings.append(value)
+        return len(self.strings) - 1
+
+    def set(self, name: str, text: str):
+        """Sets a value from its text, i.e. from a fallback= line"""
+        self.set_value(name, *parse_fallback_value(text))
+
+    def set_value(self, name: str, kind: int, value):
+        entry = self.entries.get(name)
+        if entry is None:
+            self.entries[sys.intern(name)] = len(self.kinds)
+            self.kinds.append(kind)
+            self.offsets.append(self.store(kind, value))
+            return
+
+        if self.kinds[entry] != kind:
+            # the old value is left behind - changing kind is rare
+            self.kinds[entry] = kind
+            self.offsets[entry] = self.store(kind, value)
+            return
+
+        offset = self.offsets[entry]
+        if kind == KIND_INT:
+            self.ints[offset] = value
+        elif kind == KIND_FLOAT:
+            self.floats[offset] = value
+        elif kind == KIND_COLOUR:
+            self.colours[3 * offset : 3 * offset + 3] = array("B", value)
+        else:
+            self.strings[offset] = value
+
+    def get_kind(self, name: str) -> int:
+        return self.kinds[self.entries[name]]
+
+    def get(self, name: str, default=None):
+        entry = self.entries.get(name)
+        if entry is None:
+            return default
+
+        kind = self.kinds[entry]
+        offset = self.offsets[entry]
+        if kind == KIND_INT:
+            return self.ints[offset]
+        if kind == KIND_FLOAT:
+            return self.floats[offset]
+        if kind == KIND_COLOUR:
+            return tuple(self.colours[3 * offset : 3 * offset + 3])
+        return self.strings[offset]
+
+    def format(self, name: str) -> str:
+        return format_fallback_value(self.get_kind(name), self.get(name))
+
+    def to_line(self, name: str) -> str:
+        return f"{FALLBACK_PREFIX}{name},{self.format(name)}"
+
+    @classmethod
+    def from_cfg_lines(cls, cfg_lines: Iterable[str]) -> "FallbackTable":
+        table = cls()
+        for _, name, text in iter_cfg_fallbacks(cfg_lines):
+            table.set(name, text)
+        return table
+
+
+def iter_cfg_fallbacks(cfg_lines: Iterable[str]) -> Iterator[Tuple[int, str, str]]:
+    """Yields (line number, name, value text) for each fallback= line"""
+    for line_number, line in enumerate(cfg_lines):
+        line = line.strip()
+        if line.startswith(FALLBACK_PREFIX):
+            name, _, text = line[len(FALLBACK_PREFIX) :].partition(",")
+            yield line_number, name.strip(), text
+
+
+def is_fallback_section(section: str, sections: Iterable[str]) -> bool:
+    return any(
+        section == wanted or section.startswith(wanted + " ") for wanted in sections
+    )
+
+
+def iter_ini_fallbacks(
+    ini_lines: Iterable[str], sections: Iterable[str] = FALLBACK_SECTIONS
+) -> Iterator[Tuple[str, str]]:
+    """Yields (fallback name, value text) for each key of the wanted sections
+    of Morrowind.ini, one line at a time. Names are 'Section_Key' with spaces
+    replaced by underscores, as OpenMW expects."""
+    sections = tuple(sections)
+    prefix = None
+    for line in ini_lines:
+        line = line.strip()
+        if not line or line.startswith(";"):
+            continue
+
+        if line.startswith("[") and line.endswith("]"):
+            section = line[1:-1].strip()
+            wanted = is_fallback_section(section, sections)
+            prefix = section.replace(" ", "_") + "_" if wanted else None
+            continue
+
+        if prefix is None or "=" not in line:
+            continue
+
+        key, _, value = line.partition("=")
+        yield prefix + key.strip().replace(" ", "_"), value.strip()
+
+
+def read_ini_fallbacks(
+    ini_path: Path, sections: Iterable[str] = FALLBACK_SECTIONS
+) -> FallbackTable:
+    table = FallbackTable()
+    with open(ini_path, "r", encoding=INI_ENCODING, errors="replace") as ini_file:
+        for name, text in iter_ini_fallbacks(ini_file, sections):
+            table.set(name, text)
+    return table
+
+
+@dataclass
+class FallbackChange:
+    name: str
+    # None for a fallback the config didn't have
+    old: Optional[str]
+    new: str
+
+    def to_record(self) -> Dict:
+        return {"fallback": self.name, "old": self.old, "new": self.new}
+
+
+def merge_fallbacks(
+    cfg_lines: List[str], fallbacks: FallbackTable
+) -> Tuple[List[str], List[FallbackChange]]:
+    """Merges fallbacks into the lines of openmw.cfg. Values that differ are
+    replaced where they are, new ones are added after the last fallback=
+    line, and everything else is left untouched. Values are compared by
+    type, so '0.50' and '0.5' count as the same. Returns the new lines and
+    the changes made."""
+    existing_lines: Dict[str, int] = {}
+    existing = FallbackTable()
+    for line_number, name, text in iter_cfg_fallbacks(cfg_lines):
+        existing_lines[name] = line_number
+        existing.set(name, text)
+
+    merged = list(cfg_lines)
+    added_lines = []
+    changes = []
+    for name in fallbacks:
+        new_text = fallbacks.format(name)
+        line_number = existing_lines.get(name)
+        if line_number is None:
+            added_lines.append(fallbacks.to_line(name))
+            changes.append(FallbackChange(name, None, new_text))
+        elif existing.get(name) != fallbacks.get(name):
+            merged[line_number] = fallbacks.to_line(name)
+            changes.append(FallbackChange(name, existing.format(name), new_text))
+
+    insert_at = max(existing_lines.values()) + 1 if existing_lines else len(merged)
+    merged[insert_at:insert_at] = added_lines
+    return merged, changes
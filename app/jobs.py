@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's function when the job has been cancelled"""
+
+
+def _reraise(error: Exception):
+    raise error
+
+
+class Job:
+    """A unit of work to be run by a JobScheduler worker thread.
+
+    The job's function is called with the job as its first argument, so it
+    can report progress and check for cancellation while it runs."""
+
+    def __init__(
+        self,
+        fn: Callable,
+        args: Tuple = (),
+        kwargs: Dict = None,
+        name: str = None,
+        on_result: Callable = None,
+        on_progress: Callable = None,
+        on_error: Callable = None,
+    ):
+        self.fn = fn
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.name = name or getattr(fn, "__name__", "job")
+
+        self.on_result = on_result
+        self.on_progress = on_progress
+        self.on_error = on_error
+
+        self.done_count = 0
+        self.total_count = None
+        self.is_finished = False
+
+        self._cancel_event = threading.Event()
+        self._scheduler: Optional["JobScheduler"] = None
+
+    def __repr__(self):
+        return f"Job[{self.name}]"
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Call regularly from within long running jobs - stops the job
+        at that point if it has been cancelled"""
+        if self.cancelled:
+            raise JobCancelled(self.name)
+
+    def report_progress(self, done: int, total: int = None, partial: Any = None):
+        """Posts progress back to the UI thread. 'partial' can carry
+        results found so far (i.e. a batch of scanned mods)"""
+        self.check_cancelled()
+
+        self.done_count = done
+        self.total_count = total
+        if self._scheduler is not None and self.on_progress is not None:
+            self._scheduler.post(self.on_progress, self, partial)
+
+    def run(self):
+        try:
+            result = self.fn(self, *self.args, **self.kwargs)
+        except JobCancelled:
+            return
+        except Exception as e:
+            # errors are handed to the UI thread, so they don't kill the worker
+            if self.on_error is not None:
+                self._scheduler.post(self.on_error, self, e)
+            else:
+                self._scheduler.post(_reraise, e)
+        else:
+            if self.on_result is not None and not self.cancelled:
+                self._scheduler.post(self.on_result, result)
+        finally:
+            self._scheduler.finish(self)
+
+
+class JobScheduler:
+    """Runs jobs on background worker threads, and hands their callbacks
+    back to whichever thread calls process_events (normally the UI thread).
+
+    Callbacks are never run on a worker thread, so they are free to call
+    set_state on UI components."""
+
+    def __init__(self, num_workers: int = 2):
+        self._jobs: queue.Queue = queue.Queue()
+        self._events: queue.Queue = queue.Queue()
+        self._active: List[Job] = []
+        # jobs held back until the job they were submitted after finishes
+        self._waiting: Dict[Job, List[Job]] = {}
+        self._lock = threading.Lock()
+
+        self._workers = [
+            threading.Thread(target=self._work, name=f"job-worker-{i}", daemon=True)
+            for i in range(num_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        fn: Callable,
+        args: Tuple = (),
+        kwargs: Dict = None,
+        name: str = None,
+        on_result: Callable = None,
+        on_progress: Callable = None,
+        on_error: Callable = None,
+        after: Job = None,
+    ) -> Job:
+        """Queues fn(job, *args, **kwargs) to run in the background. If after
+        is given, the job is only started once that job has finished (or
+        been cancelled), i.e. to write out the results of a scan."""
+        job = Job(
+            fn,
+            args,
+            kwargs,
+            name=name,
+            on_result=on_result,
+            on_progress=on_progress,
+            on_error=on_error,
+        )
+        job._scheduler = self
+
+        with self._lock:
+            self._active.append(job)
+            if after is not None and not after.is_finished:
+                self._waiting.setdefault(after, []).append(job)
+                return job
+
+        self._jobs.put(job)
+        return job
+
+    def finish(self, job: Job):
+        """Marks a job as finished, and queues any jobs waiting on it"""
+        with self._lock:
+            job.is_finished = True
+            waiting = self._waiting.pop(job, [])
+
+        for waiting_job in waiting:
+            self._jobs.put(waiting_job)
+
+    def post(self, callback: Callable, *args):
+        """Queues a callback to be run by process_events"""
+        self._events.put((callback, args))
+
+    def process_events(self, time_budget: float = 0.01) -> int:
+        """Runs queued callbacks on the calling thread until the queue is
+        empty or time_budget (in seconds) runs out. Returns the number of
+        callbacks run."""
+        deadline = time.perf_counter() + time_budget
+        num_run = 0
+
+        while time.perf_counter() < deadline:
+            try:
+                callback, args = self._events.get_nowait()
+            except queue.Empty:
+                break
+
+            callback(*args)
+            num_run += 1
+
+        return num_run
+
+    @property
+    def active_jobs(self) -> List[Job]:
+        with self._lock:
+            self._active = [job for job in self._active if not job.is_finished]
+            return list(self._active)
+
+    def cancel_all(self):
+        for job in self.active_jobs:
+            job.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        for _ in self._workers:
+            self._jobs.put(None)
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+
+            if job.cancelled:
+                self.finish(job)
+                continue
+
+            job.run()
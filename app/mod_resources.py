@@ -1,39 +1,138 @@
 from pathlib import Path
-from typing import List, Callable, Dict, Tuple, Optional
+from typing import List, Callable, Dict, Tuple, Optional, Iterator, Iterable
+
+import hashlib
+import os
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import cached_property
 
 from string import ascii_letters, digits, ascii_uppercase, ascii_lowercase
 from dataclasses import dataclass
 from datetime import datetime, date
 from app.app_settings import AppSettings
+from app.query import Entry, Query, QueryIndex, filter_entries
+from app.search_index import TrigramIndex
 
 import itertools
 
 settings = AppSettings()
 
 
+# content files - OpenMW loads all of these as TES3 plugins
+ESP_FILE_TYPES = frozenset((".esp", ".esm", ".omwaddon"))
+
+
 def is_valid_dir(dir: Path) -> bool:
     return dir.exists() and dir.is_dir()
 
 
+def fold_name(name: str) -> str:
+    """Case-folded, interned form of a file or directory name. Interning
+    means every file named 'textures' shares the one string."""
+    return sys.intern(name.casefold())
+
+
+def normalize_title(title: str) -> str:
+    """Mod title with case, spacing and punctuation removed, so that
+    'Better Bodies' and 'BetterBodies' match"""
+    return "".join(c for c in title.casefold() if c.isalnum())
+
+
 class ModResource:
     """Generic class to hold any mod resource (file or directory)"""
 
-    def __init__(self, path: Path, parent):
+    def __init__(self, path: Path, parent, folded_name: str = None):
         self.path = path
         self.name = path.stem
         self.parent = parent
 
+        # OpenMW resource lookups are case-insensitive, so all matching is
+        # done against these interned, case-folded keys
+        self.folded_name = folded_name or fold_name(path.name)
+        self.suffix = sys.intern(os.path.splitext(self.folded_name)[1])
+
     def __str__(self):
         return self.name
 
     def __repr__(self):
         return f"ModResource[{self.parent}: {self}]"
 
+    @property
+    def data_dir(self) -> Optional["ModDataDir"]:
+        """The nearest data dir above this resource"""
+        parent = self.parent
+        while isinstance(parent, ModResource):
+            if isinstance(parent, ModDataDir):
+                return parent
+            parent = parent.parent
+
+        return None
+
+    @cached_property
+    def data_key(self) -> str:
+        """Case-folded path relative to the nearest data dir above this
+        resource, i.e. the path OpenMW's VFS would find it at"""
+        parent = self.parent
+        if isinstance(parent, ModDataDir) or not isinstance(parent, ModResource):
+            return self.folded_name
+
+        return sys.intern(f"{parent.data_key}/{self.folded_name}")
+
 
 class ModFile(ModResource):
+    def __init__(
+        self,
+        *args,
+        size: int = None,
+        mtime_ns: int = None,
+        ino: int = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        # normally filled in from the stat data of the scan that found the file
+        self._size = size
+        self._mtime_ns = mtime_ns
+        self._ino = ino
+
     def __repr__(self):
         return f"ModFile[{self.parent}: {self}]"
 
+    def load_stat(self):
+        stat = os.stat(self.path)
+        self._size = stat.st_size
+        self._mtime_ns = stat.st_mtime_ns
+        self._ino = stat.st_ino
+
+    @property
+    def size(self) -> int:
+        if self._size is None:
+            self.load_stat()
+
+        return self._size
+
+    @property
+    def mtime_ns(self) -> int:
+        if self._mtime_ns is None:
+            self.load_stat()
+
+        return self._mtime_ns
+
+    @property
+    def ino(self) -> int:
+        if self._ino is None:
+            self.load_stat()
+
+        return self._ino
+
+    @property
+    def signature(self) -> list:
+        """[size, modified time] as taken by the scan, in the form ScanCache
+        compares files by"""
+        return [self.size, self.mtime_ns]
+
 
 class ESPFile(ModFile):
     def __repr__(self):
@@ -64,20 +163,87 @@ class ModDir(ModResource):
         super().__init__(*args, **kwargs)
 
         self.child_factory = child_factory
-        self.children = self.get_children()
+        self._children = None
+        # (total size, number of files) of everything below this directory
+        self._usage = None
+        self._query_index = None
 
     def __repr__(self):
         return f"ModDir[{self.parent}: {self}]"
 
-    def init_child(self, child_path: Path) -> ModResource:
-        return self.child_factory(path=child_path, parent=self)
+    @property
+    def children(self) -> List[ModResource]:
+        """Children are only scanned the first time they are needed, so
+        building a directory does not walk its whole subtree"""
+        if self._children is None:
+            self._children = self.get_children()
+
+        return self._children
+
+    @children.setter
+    def children(self, children: List[ModResource]):
+        self._children = children
+
+    def init_child(self, entry: os.DirEntry) -> ModResource:
+        return self.child_factory(path=Path(entry.path), parent=self, entry=entry)
 
     def get_children(self) -> List[ModResource]:
-        children = [self.init_child(child) for child in self.path.iterdir()]
+        # scandir hands back file types (and stat data) with the listing, so
+        # classifying children doesn't need a stat call of its own per child
+        with os.scandir(self.path) as entries:
+            children = [self.init_child(entry) for entry in entries]
 
         # wont list unclassified children
         return [child for child in children if child is not None]
 
+    def rescan(self):
+        """Forgets this directory's children, so they are scanned again the
+        next time they are needed. Disk usage and query indexes above it are
+        updated to match."""
+        self._children = None
+        self.invalidate()
+
+    def get_disk_usage(self) -> Tuple[int, int]:
+        """(total size, number of files) below this directory. Worked out
+        from the sizes the scan already has, and kept until something below
+        changes, so only the changed branch is ever added up again."""
+        if self._usage is None:
+            total_size = 0
+            num_files = 0
+            for child in self.children:
+                if isinstance(child, ModDir):
+                    child_size, child_files = child.get_disk_usage()
+                    total_size += child_size
+                    num_files += child_files
+                elif isinstance(child, ModFile):
+                    total_size += child.size
+                    num_files += 1
+
+            self._usage = (total_size, num_files)
+
+        return self._usage
+
+    def invalidate(self):
+        """Clears the disk usage and query index of this directory and every
+        one above it"""
+        mod_dir = self
+        while isinstance(mod_dir, ModDir):
+            mod_dir._usage = None
+            mod_dir._query_index = None
+            mod_dir = mod_dir.parent
+
+    @property
+    def total_size(self) -> int:
+        return self.get_disk_usage()[0]
+
+    @property
+    def num_files(self) -> int:
+        return self.get_disk_usage()[1]
+
+    @property
+    def size(self) -> int:
+        return self.total_size
+
     def get_children_of_type(self, object) -> List[ModResource]:
         return [child for child in self.children if type(child) is object]
 
@@ -90,65 +256,64 @@ class ModDir(ModResource):
     def has_child_of_instance(self, object) -> bool:
         return len(self.get_children_of_instance(object)) > 0
 
-    def search_children(
-        self, condition: Callable, only_of_instance: object = None
-    ) -> List[ModResource]:
-
-        if only_of_instance is not None:
-            valid_children = self.get_children_of_instance(only_of_instance)
-
-        else:
-            valid_children = self.children
-
-        if len(valid_children) == 0:
-            # no more children, so no possible serach results, return empty list
-            return list()
-
-        return [child for child in valid_children if condition(child)]
-
-    def recurse_search_children(
-        self, condition: Callable, only_of_instance=None
-    ) -> List[ModResource]:
-        """Recursively search though children (and children of children etc...)
-        for children that meet the input 'condition'.
-
-        Optional: Limit search to only those of a instance using only_of_instnace"""
-
-        if only_of_instance is not None:
-            children = self.get_children_of_instance(only_of_instance)
-
-        else:
-            children = self.children
-
-        if len(children) == 0:
-            # no more children, so no possible search results, terminate result
-            return None
+    def iter_files(self) -> Iterator[ModFile]:
+        """Yields every file below this directory, depth first"""
+        for child in self.children:
+            if isinstance(child, ModDir):
+                yield from child.iter_files()
+            elif isinstance(child, ModFile):
+                yield child
+
+    def get_content_digest(self) -> str:
+        """Digest of the relative path and size of every file below this
+        directory. Modified times are left out, as copies of a mod rarely
+        keep them."""
+        files = sorted(
+            (mod_file.path.relative_to(self.path).as_posix(), mod_file.size)
+            for mod_file in self.iter_files()
+        )
 
-        # check if any direct children meets condition
-        search_results = [child for child in children if condition(child)]
+        hasher = hashlib.blake2b(digest_size=16)
+        for relative_path, size in files:
+            entry = f"{relative_path}\0{size}\0"
+            hasher.update(entry.encode("utf-8", "surrogateescape"))
+
+        return hasher.hexdigest()
+
+    def iter_tree(
+        self, depth: int = 1, data_dir: "ModDataDir" = None
+    ) -> Iterator[Entry]:
+        """Yields (resource, depth, nearest data dir) for everything below
+        this directory, depth first. Data dirs are only counted from below
+        this directory."""
+        for child in self.children:
+            yield child, depth, data_dir
+            if isinstance(child, ModDir):
+                child_data_dir = child if isinstance(child, ModDataDir) else data_dir
+                yield from child.iter_tree(depth + 1, child_data_dir)
 
-        if len(search_results) > 0:
-            # if we've found results - terminate search here and return results
-            return search_results
+    @property
+    def query_index(self) -> QueryIndex:
+        if self._query_index is None:
+            self._query_index = QueryIndex(self.iter_tree())
 
-        # otherwise, if we havent found results - perform search in all child directories
-        child_dirs = self.get_children_of_instance(ModDir)
+        return self._query_index
 
-        if len(child_dirs) == 0:
-            return None
+    def find(self, query: Query = None, **filters) -> List[ModResource]:
+        """Resources below this directory matching a Query (or the Query
+        fields given as keyword arguments), in depth first order.
 
-        # iterate through child directories, performing same search
-        recurse_results = [
-            child_dir.recurse_search_children(condition, only_of_instance)
-            for child_dir in child_dirs
-        ]
+        Queries of direct children are answered from the children until
+        something deeper has been asked for - after that, every query is
+        planned against the directory's query index."""
+        query = query or Query(**filters)
+        if query.max_depth == 1 and self._query_index is None:
+            return filter_entries(query, self.iter_tree_children())
 
-        recurse_results = [
-            child_dir for child_dir in recurse_results if child_dir is not None
-        ]
+        return self.query_index.find(query)
 
-        # unpacking result list
-        return [result for results in recurse_results for result in results]
+    def iter_tree_children(self) -> Iterator[Entry]:
+        return ((child, 1, None) for child in self.children)
 
 
 class ModSpecialDir(ModDir):
@@ -163,8 +328,16 @@ class ModSpecialDir(ModDir):
         self.path = mod_dir.path
         self.name = mod_dir.name
         self.parent = mod_dir.parent
+        self.folded_name = mod_dir.folded_name
+        self.suffix = mod_dir.suffix
         self.child_factory = mod_dir.child_factory
-        self.children = mod_dir.children
+        self._children = mod_dir._children
+        self._usage = mod_dir._usage
+        self._query_index = mod_dir._query_index
+
+        # children that have already been scanned still point at mod_dir
+        for child in self._children or []:
+            child.parent = self
 
     def from_path(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -176,7 +349,7 @@ class ModResourceDir(ModSpecialDir):
 
     @staticmethod
     def is_mod_resource_dir(mod_dir: ModDir) -> bool:
-        return mod_dir.name.lower() in settings.parsing.resource_dir_names
+        return mod_dir.folded_name in settings.parsing.resource_dir_names
 
 
 class ModDataDir(ModSpecialDir):
@@ -203,6 +376,12 @@ class ModDataDir(ModSpecialDir):
     def __repr__(self):
         return f"ModDataDir[{self.parent}: {self}]"
 
+    def rescan(self):
+        super().rescan()
+        self._esp_files = None
+        self._bsa_files = None
+        self._resource_dirs = None
+
     @staticmethod
     def is_mod_data_dir(mod_dir: ModDir) -> bool:
         return (
@@ -236,9 +415,10 @@ class ModDataDir(ModSpecialDir):
     @property
     def resource_dirs(self) -> List:
         if self._resource_dirs is None:
-            self._resource_dirs = self.search_children(
-                condition=ModResourceDir.is_mod_resource_dir,
-                only_of_instance=ModDir,
+            self._resource_dirs = self.find(
+                type=ModDir,
+                name=settings.parsing.resource_dir_names,
+                max_depth=1,
             )
         return self._resource_dirs
 
@@ -246,27 +426,58 @@ class ModDataDir(ModSpecialDir):
     def has_resource_dirs(self) -> bool:
         return len(self.resource_dirs) > 0
 
-
-def mod_resource_factory(path: Path = None, **kwargs) -> ModResource:
+    def to_record(self) -> Dict:
+        """Plain dict of the data dir's contents, for serialising"""
+        return {
+            "name": self.name,
+            "path": str(self.path),
+            "esps": [esp.path.name for esp in self.esp_files],
+            "bsas": [bsa.path.name for bsa in self.bsa_files],
+            "resource_dirs": [resource.path.name for resource in self.resource_dirs],
+            "size": self.total_size,
+            "num_files": self.num_files,
+            "resource_dir_sizes": {
+                resource.path.name: resource.total_size
+                for resource in self.resource_dirs
+            },
+        }
+
+
+def mod_resource_factory(
+    path: Path = None, entry: os.DirEntry = None, **kwargs
+) -> ModResource:
     """Takes an input path, and returns  an instantiation of ModResource
-    subclass depending on the path characteristics."""
+    subclass depending on the path characteristics.
+
+    If the path came from os.scandir, pass its entry too - its cached file
+    type and stat data are used instead of asking the filesystem again."""
     if path is None:
         raise TypeError("mod_resource_factory requires a path")
 
-    if path.is_file():
-        file_type = path.suffix.lower()
+    folded_name = fold_name(path.name)
+
+    if entry.is_file() if entry is not None else path.is_file():
+        file_type = os.path.splitext(folded_name)[1]
+        if entry is not None:
+            stat = entry.stat()
+            kwargs.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns, ino=stat.st_ino)
 
         if file_type == ".bsa":
-            return BSAFile(path, **kwargs)
+            return BSAFile(path, folded_name=folded_name, **kwargs)
 
-        elif file_type == ".esp":
-            return ESPFile(path, **kwargs)
+        elif file_type in ESP_FILE_TYPES:
+            return ESPFile(path, folded_name=folded_name, **kwargs)
 
         else:
-            return ModFile(path, **kwargs)
-
-    elif path.is_dir():
-        mod_dir = ModDir(path, child_factory=mod_resource_factory, **kwargs)
+            return ModFile(path, folded_name=folded_name, **kwargs)
+
+    elif entry.is_dir() if entry is not None else path.is_dir():
+        mod_dir = ModDir(
+            path,
+            child_factory=mod_resource_factory,
+            folded_name=folded_name,
+            **kwargs,
+        )
 
         # check if dir should be promoted? the constructors feel a little gross
 
@@ -424,45 +635,331 @@ class Mod(ModDataDir):
     def __repr__(self):
         return f"ParentModDir[{self}]"
 
+    @property
+    def identity(self) -> Tuple:
+        """Key for recognising the same mod installed in different places -
+        its nexus id where the folder name has one, otherwise its title"""
+        meta = self.metadata
+        if meta.id is not None:
+            return ("id", meta.id, meta.variant)
+        return ("title", normalize_title(meta.title or ""), meta.variant)
+
+    def rescan(self):
+        super().rescan()
+        self.data_dirs = None
+
     def get_data_dirs(self) -> List[ModDataDir]:
         if ModDataDir.is_mod_data_dir(self):
             self.data_dirs = [self]
 
         else:
-            self.data_dirs = self.recurse_search_children(
-                condition=ModDataDir.is_mod_data_dir, only_of_instance=ModDir
+            # data dirs found when the tree was scanned, leaving out any
+            # nested inside another data dir. Sorted, as scandir order
+            # varies and callers take this order as the load order.
+            self.data_dirs = sorted(
+                self.find(type=ModDataDir, in_data_dir=False),
+                key=lambda data_dir: [fold_name(part) for part in data_dir.path.parts],
             )
 
+        return self.data_dirs
+
+    def to_record(self, with_contents: bool = True) -> Dict:
+        """Plain dict of the mod's metadata and (optionally) its data dirs,
+        for serialising"""
+        meta = self.metadata
+        record = {
+            "name": self.name,
+            "path": str(self.path),
+            "title": meta.title,
+            "id": meta.id,
+            "version": meta.version,
+            "variant": meta.variant,
+            "modified_time": meta.modified_time.isoformat(),
+            "posted_time": meta.posted_time.isoformat() if meta.posted_time else None,
+        }
+
+        if with_contents:
+            if self.data_dirs is None:
+                self.get_data_dirs()
+            # the mod can be its own data dir, so use the data dir record
+            # explicitly rather than whichever to_record it has
+            record["data_dirs"] = [
+                ModDataDir.to_record(data_dir) for data_dir in self.data_dirs or []
+            ]
+            record["size"] = self.total_size
+            record["num_files"] = self.num_files
+
+        return record
+
 
 class ModsFolder(ModDir):
-    """Top-level directory where mods directories are saved/unzipped into."""
+    """Top-level directory where mods directories are saved/unzipped into.
 
-    def __init__(self, path: Path):
-        self.path = path
-        self.name = path.stem
+    Can be given several root directories (i.e. on different disks), which
+    are scanned concurrently and merged into one collection."""
+
+    def __init__(self, path: Path | Iterable[Path], scan: bool = True):
+        self.roots = [path] if isinstance(path, Path) else list(path)
+        if not self.roots:
+            raise ValueError("ModsFolder requires at least one root path")
 
-        self.mods = self.get_mods()
+        self.path = self.roots[0]
+        self.name = self.path.stem
+        self.folded_name = fold_name(self.path.name)
+
+        # mods grouped by Mod.identity, across every root, and a search index
+        # of their titles, plugins and files - both built up as mods are found
+        self.index: Dict[Tuple, List[Mod]] = {}
+        self.search_index = TrigramIndex()
+
+        # when scan is False, mods are expected to be pulled in through iter_mods
+        self.mods = []
+        if scan:
+            self.mods = self.get_mods()
 
     def __repr__(self):
         return f"ModCollectionDir[{self}]"
 
-    def get_mods(self) -> List[Mod]:
+    def get_mods(
+        self, with_data_dirs: bool = False, on_error: Callable = None
+    ) -> List[Mod]:
+        # roots in order, and sorted order within each root
+        return list(self.iter_mods(with_data_dirs, on_error, ordered=True))
+
+    def add_mod(self, mod: Mod):
+        self.index.setdefault(mod.identity, []).append(mod)
+        self.search_index.add_mod(mod)
+
+    def iter_mods(
+        self,
+        with_data_dirs: bool = False,
+        on_error: Callable = None,
+        ordered: bool = False,
+    ) -> Iterator[Mod]:
+        """Yields each mod as soon as its folder is found. Each root is scanned
+        on its own thread, so mods from different roots arrive interleaved.
+
+        With ordered set, mods come in load order instead - roots in order,
+        then by folder name. Each root's thread already finds its mods in
+        that order, so the first unfinished root's mods are still yielded as
+        they are found, and only later roots' mods are held back until the
+        roots before them finish.
+
+        Mod contents are only scanned when they are first accessed, unless
+        with_data_dirs is set, in which case the whole tree walk (data dirs,
+        their contents and disk usage) is also done on the root's thread.
+
+        Mods that fail to load are passed to on_error(mod_path, error) if
+        given, otherwise the error is raised. Either way this happens on the
+        calling thread, so on_error needs no locking of its own."""
+        self.index = {}
+        self.search_index = TrigramIndex()
+
+        # (root number, result) - a mod, a (mod_path, error) pair, or None
+        # once the root is done
+        results: queue.Queue = queue.Queue()
+        # set when the caller stops early, so the roots' threads stop too
+        stopped = threading.Event()
+
+        def scan_root(root_idx: int, root: Path):
+            try:
+                for mod_path in self.get_root_mod_paths(root):
+                    if stopped.is_set():
+                        return
+                    results.put((root_idx, self.load_mod(mod_path, with_data_dirs)))
+            except Exception as e:
+                results.put((root_idx, e))
+            finally:
+                results.put((root_idx, None))
+
+        # results of roots after the one being yielded, when ordered
+        held_back: List[List] = [[] for _ in self.roots]
+
+        with ThreadPoolExecutor(max_workers=len(self.roots)) as executor:
+            for root_idx, root in enumerate(self.roots):
+                executor.submit(scan_root, root_idx, root)
+
+            try:
+                num_done = 0
+                while num_done < len(self.roots):
+                    root_idx, result = results.get()
+                    if isinstance(result, Exception):
+                        raise result
+                    if ordered and root_idx != num_done:
+                        held_back[root_idx].append(result)
+                        continue
+
+                    pending = [result]
+                    while pending:
+                        result = pending.pop(0)
+                        if result is None:
+                            num_done += 1
+                            if ordered and num_done < len(self.roots):
+                                pending.extend(held_back[num_done])
+                                held_back[num_done] = []
+                        elif isinstance(result, tuple):
+                            mod_path, error = result
+                            if on_error is None:
+                                raise error
+                            on_error(mod_path, error)
+                        else:
+                            self.add_mod(result)
+                            yield result
+            finally:
+                stopped.set()
+
+    def load_mod(self, mod_path: Path, with_data_dirs: bool = False):
+        """Builds a mod, and with with_data_dirs walks its whole tree. Run
+        from the root scanning threads - returns (mod_path, error) rather
+        than raising if the folder can't be read as a mod (i.e. a name
+        without a version, or a subtree that can't be read), so one bad
+        folder never stops the rest of the scan."""
+        try:
+            mod = self.init_mod(mod_path)
+            if with_data_dirs:
+                self.scan_tree(mod)
+        except Exception as e:
+            return mod_path, e
+
+        return mod
+
+    @staticmethod
+    def scan_tree(mod: Mod):
+        """Walks a mod's whole tree - its data dirs, their contents and its
+        disk usage"""
+        for data_dir in mod.get_data_dirs() or []:
+            data_dir.esp_files, data_dir.bsa_files, data_dir.resource_dirs
+        mod.get_disk_usage()
+
+    def walk_trees(
+        self, mods: Iterable[Mod], on_error: Callable = None
+    ) -> Iterator[Mod]:
+        """Walks the whole tree of each mod (see scan_tree), with as many
+        threads as there are roots, yielding each mod once its walk is done.
+        Fills in mods found by a header-only scan. Errors are passed to
+        on_error(mod_path, error) on the calling thread, or raised."""
+        executor = ThreadPoolExecutor(max_workers=len(self.roots))
+        try:
+            futures = {executor.submit(self.scan_tree, mod): mod for mod in mods}
+            for future in as_completed(futures):
+                mod = futures[future]
+                error = future.exception()
+                if error is None:
+                    yield mod
+                elif on_error is None:
+                    raise error
+                else:
+                    on_error(mod.path, error)
+        finally:
+            # when the caller stops early, walks that haven't started never do
+            executor.shutdown(cancel_futures=True)
+
+    def rescan_mod(self, mod: Mod, with_data_dirs: bool = False):
+        """Scans a mod's tree again after it has changed on disk, and swaps
+        its entries in the search index for the new ones"""
+        mod.rescan()
+        if with_data_dirs:
+            self.scan_tree(mod)
+        self.search_index.update_mod(mod)
+
+    def get_mod_paths(self) -> List[Path]:
+        return [
+            mod_path
+            for root in self.roots
+            for mod_path in self.get_root_mod_paths(root)
+        ]
+
+    @staticmethod
+    def get_root_mod_paths(root: Path) -> List[Path]:
+        # sorted so that repeated scans list mods in the same order
+        return sorted(dir for dir in root.iterdir() if dir.is_dir())
+
+    def init_mod(self, mod_path: Path) -> Mod:
+        return Mod(
+            mod_path, parent=mod_path.parent.stem, child_factory=mod_resource_factory
+        )
+
+    def find(self, query: Query = None, **filters) -> List[ModResource]:
+        """Runs a query against every mod in the collection (i.e. all ESPs
+        with find(type=ESPFile)). Each mod keeps its own query index, so
+        rescanning one mod leaves the others' indexes in place."""
+        query = query or Query(**filters)
+        return [resource for mod in self.mods for resource in mod.find(query)]
+
+    def get_digest_index(self) -> Dict[str, List[Mod]]:
+        """Mods grouped by content digest, whatever their folder names. Only
+        mods whose total size and file count match another mod's are
+        hashed, so most mods are never digested."""
+        by_usage: Dict[Tuple[int, int], List[Mod]] = {}
+        for mods in self.index.values():
+            for mod in mods:
+                usage = mod.get_disk_usage()
+                # empty mods have nothing to compare
+                if usage[1]:
+                    by_usage.setdefault(usage, []).append(mod)
+
+        by_digest: Dict[str, List[Mod]] = {}
+        for mods in by_usage.values():
+            if len(mods) < 2:
+                continue
+            for mod in mods:
+                by_digest.setdefault(mod.get_content_digest(), []).append(mod)
+
+        return {digest: mods for digest, mods in by_digest.items() if len(mods) > 1}
+
+    def get_duplicates(self) -> List[List[Mod]]:
+        """Groups of mods that are installed under more than one root. Mods
+        match if they share a nexus id, or have the same contents - so copies
+        that were renamed (or have a different title) are still found."""
+        groups = [mods for identity, mods in self.index.items() if identity[0] == "id"]
+        groups.extend(self.get_digest_index().values())
+
         return [
-            Mod(dir, parent=self.name, child_factory=mod_resource_factory)
-            for dir in self.path.iterdir()
-            if dir.is_dir()
+            mods
+            for mods in merge_groups(groups)
+            if len({mod.path.parent for mod in mods}) > 1
         ]
 
 
+def merge_groups(groups: Iterable[List[Mod]]) -> List[List[Mod]]:
+    """Joins up groups of mods that share a mod, i.e. a nexus id match and
+    a content match that have one install in common"""
+    members: Dict[str, Mod] = {}
+    parents: Dict[str, str] = {}
+
+    def find_root(key: str) -> str:
+        while parents[key] != key:
+            parents[key] = parents[parents[key]]
+            key = parents[key]
+        return key
+
+    for mods in groups:
+        keys = [str(mod.path) for mod in mods]
+        for key, mod in zip(keys, mods):
+            members.setdefault(key, mod)
+            parents.setdefault(key, key)
+        for key in keys[1:]:
+            parents[find_root(key)] = find_root(keys[0])
+
+    merged: Dict[str, List[Mod]] = {}
+    for key, mod in members.items():
+        merged.setdefault(find_root(key), []).append(mod)
+    return [mods for mods in merged.values() if len(mods) > 1]
+
+
 if __name__ == "__main__":
-    print(f"scanning path {settings.core.mods_path[0]} for Morrowind Mod Resources")
-    mod_dir = ModsFolder(settings.core.mods_path[0])
+    mods_paths = ", ".join(map(str, settings.core.mods_path))
+    print(f"scanning paths {mods_paths} for Morrowind Mod Resources")
+    mods_folder = ModsFolder(settings.core.mods_path)
 
     print(
         f"finished scanning directory - printing parent mod dirs and their child data folders"
     )
-    for parent_mod_dir in mod_dir.children:
+    for parent_mod_dir in mods_folder.mods:
         print(parent_mod_dir)
-        for data_dir in parent_mod_dir.data_dirs:
+        for data_dir in parent_mod_dir.get_data_dirs() or []:
             print(f"\t{data_dir}")
         print()
+
+    for duplicate_mods in mods_folder.get_duplicates():
+        print(f"installed more than once: {', '.join(map(repr, duplicate_mods))}")
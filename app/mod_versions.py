@@ -0,0 +1,144 @@
+import hashlib
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from app.mod_resources import Mod, ModsFolder
+from app.scan_cache import ScanCache
+
+CACHE_NAMESPACE = "mod_versions"
+
+VERSION_PART = re.compile(r"\d+|[^\W\d_]+")
+
+
+def get_version_key(version: str) -> Tuple:
+    """Sort key for a version parsed from a folder name, i.e. '4.0.2', 'v101'
+    or '21.01.01'. Numbers compare as numbers, and sort after any letters in
+    the same place, so '1.0b' < '1.0.1' < '1.0.10'."""
+    parts = VERSION_PART.findall((version or "").casefold())
+    if parts and parts[0] == "v":
+        parts = parts[1:]
+
+    return tuple((1, int(part)) if part.isdigit() else (0, part) for part in parts)
+
+
+def get_install_sort_key(mod: Mod) -> Tuple:
+    """Oldest install first - by version, then posted time, then name"""
+    meta = mod.metadata
+    posted = meta.posted_time.timestamp() if meta.posted_time else 0
+    return (get_version_key(meta.version), posted, mod.name)
+
+
+@dataclass
+class Install:
+    name: str
+    path: str
+    version: str
+
+    @classmethod
+    def from_mod(cls, mod: Mod) -> "Install":
+        return cls(mod.name, str(mod.path), mod.metadata.version)
+
+    def to_record(self) -> Dict:
+        return {"name": self.name, "path": self.path, "version": self.version}
+
+
+@dataclass
+class VersionGroup:
+    """The installs of one mod (matched by Mod.identity) - the newest one,
+    any others of the same version, and any older versions"""
+
+    identity: Tuple
+    latest: Install
+    duplicates: List[Install] = field(default_factory=list)
+    superseded: List[Install] = field(default_factory=list)
+
+    def __repr__(self):
+        return f"VersionGroup[{self.latest.name}]"
+
+    @classmethod
+    def from_mods(cls, identity: Tuple, mods: List[Mod]) -> "VersionGroup":
+        sort_keys = [get_install_sort_key(mod) for mod in mods]
+        order = sorted(range(len(mods)), key=sort_keys.__getitem__)
+
+        latest_idx = order[-1]
+        latest_version = sort_keys[latest_idx][0]
+        group = cls(identity, Install.from_mod(mods[latest_idx]))
+        for idx in order[:-1]:
+            if sort_keys[idx][0] == latest_version:
+                group.duplicates.append(Install.from_mod(mods[idx]))
+            else:
+                group.superseded.append(Install.from_mod(mods[idx]))
+
+        return group
+
+    def to_record(self) -> Dict:
+        return {
+            "identity": list(self.identity),
+            "latest": self.latest.to_record(),
+            "duplicates": [install.to_record() for install in self.duplicates],
+            "superseded": [install.to_record() for install in self.superseded],
+        }
+
+    @classmethod
+    def from_record(cls, record: Dict) -> "VersionGroup":
+        return cls(
+            identity=tuple(record["identity"]),
+            latest=Install(**record["latest"]),
+            duplicates=[Install(**install) for install in record["duplicates"]],
+            superseded=[Install(**install) for install in record["superseded"]],
+        )
+
+
+def group_versions(index: Dict[Tuple, List[Mod]]) -> List[VersionGroup]:
+    """Groups from a ModsFolder.index (mods by Mod.identity), returning the
+    ones with more than one install. The index is built as mods are scanned
+    and each group is sorted on its own, so this is O(n log n) over the
+    collection."""
+    groups = [
+        VersionGroup.from_mods(identity, mods)
+        for identity, mods in index.items()
+        if len(mods) > 1
+    ]
+    groups.sort(key=lambda group: group.latest.name)
+    return groups
+
+
+def get_paths_signature(mod_paths: Sequence[Path]) -> str:
+    """Everything the grouping uses comes from the folder names, so the
+    groups only need working out again when the set of folders changes"""
+    joined = "\n".join(sorted(str(mod_path) for mod_path in mod_paths))
+    return hashlib.blake2b(joined.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def find_version_groups(
+    mods_folder: ModsFolder, cache: ScanCache = None
+) -> List[VersionGroup]:
+    """Duplicate and superseded installs across every root of mods_folder.
+    Taken from the cache if no mod folders have been added, removed or
+    renamed since it was last worked out."""
+    mod_paths = mods_folder.get_mod_paths()
+    signature = get_paths_signature(mod_paths)
+    cache_key = "|".join(str(root) for root in mods_folder.roots)
+
+    cached = cache.get_value(CACHE_NAMESPACE, cache_key) if cache else None
+    if cached is not None and cached["signature"] == signature:
+        return [VersionGroup.from_record(record) for record in cached["groups"]]
+
+    # a header-only scan is enough to fill in the index, as the grouping
+    # only reads folder names. Folder names that can't be parsed have no
+    # version to compare, so their errors are dropped.
+    mods_folder.mods = mods_folder.get_mods(on_error=lambda mod_path, error: None)
+    groups = group_versions(mods_folder.index)
+    if cache is not None:
+        cache.put_value(
+            CACHE_NAMESPACE,
+            cache_key,
+            {
+                "signature": signature,
+                "groups": [group.to_record() for group in groups],
+            },
+        )
+
+    return groups
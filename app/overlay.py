@@ -0,0 +1,224 @@
+import json
+import os
+import stat
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.conflicts import get_data_key
+from app.mod_resources import ModDataDir, ModFile
+
+# records which source file every overlay link points at, so a redeploy
+# only has to touch links whose winner changed. Kept next to the overlay
+# rather than in it, so OpenMW's VFS never sees it.
+MANIFEST_SUFFIX = ".manifest.json"
+MANIFEST_FORMAT = 1
+
+# manifest entry for a link: [source path, size, mtime_ns, inode] of the
+# source when it was linked
+SOURCE, SIZE, MTIME_NS, INO = range(4)
+
+
+@dataclass
+class DeployResult:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    # links that were missing or replaced in the overlay, and were relinked
+    repaired: int = 0
+    hardlinks: int = 0
+    symlinks: int = 0
+
+    def to_record(self) -> Dict:
+        return dict(self.__dict__)
+
+
+def resolve_winners(data_dirs: Iterable[ModDataDir]) -> Dict[str, ModFile]:
+    """Maps each data-relative file to the file OpenMW would load for it -
+    the one from the last of data_dirs that has it"""
+    winners = {}
+    for data_dir in data_dirs:
+        for mod_file in data_dir.iter_files():
+            winners[get_data_key(data_dir, mod_file)] = mod_file
+
+    return winners
+
+
+def get_link_entry(mod_file: ModFile) -> List:
+    """Manifest entry for a link to mod_file, from the stat data the scan
+    already has. A source that is re-extracted in place gets a new entry,
+    so its link is redone."""
+    return [str(mod_file.path), mod_file.size, mod_file.mtime_ns, mod_file.ino]
+
+
+def get_manifest_path(overlay_path: Path) -> Path:
+    return overlay_path.with_name(overlay_path.name + MANIFEST_SUFFIX)
+
+
+def read_manifest(overlay_path: Path) -> Optional[Dict[str, List]]:
+    """The links of the last deploy, or None if the overlay has never been
+    deployed (or was deployed in a format this can't read)"""
+    manifest_path = get_manifest_path(overlay_path)
+    if not manifest_path.exists():
+        return None
+
+    with open(manifest_path, "r", encoding="utf-8") as manifest_file:
+        manifest = json.load(manifest_file)
+
+    if manifest.get("format") != MANIFEST_FORMAT:
+        return None
+    return manifest["links"]
+
+
+def write_manifest(overlay_path: Path, links: Dict[str, List]):
+    manifest_path = get_manifest_path(overlay_path)
+    tmp_path = manifest_path.with_name(manifest_path.name + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+        json.dump(
+            {"format": MANIFEST_FORMAT, "links": links},
+            manifest_file,
+            separators=(",", ":"),
+        )
+
+    os.replace(tmp_path, manifest_path)
+
+
+class OverlayLinker:
+    """Creates the links of an overlay. Hardlinks are preferred as OpenMW
+    treats them as plain files, but they can't cross disks - once a hardlink
+    from a disk fails, files from that disk are symlinked instead."""
+
+    def __init__(self, overlay_path: Path):
+        self.overlay_path = overlay_path
+        self.created_dirs = set()
+        self.symlink_devices = set()
+
+    def link(self, data_key: str, source: str, result: DeployResult):
+        target = os.path.join(self.overlay_path, data_key)
+
+        target_dir = os.path.dirname(target)
+        if target_dir not in self.created_dirs:
+            os.makedirs(target_dir, exist_ok=True)
+            self.created_dirs.add(target_dir)
+
+        source_device = os.stat(source).st_dev if self.symlink_devices else None
+        if source_device not in self.symlink_devices:
+            try:
+                replace_link(os.link, source, target)
+                result.hardlinks += 1
+                return
+            except OSError:
+                self.symlink_devices.add(os.stat(source).st_dev)
+
+        replace_link(os.symlink, source, target)
+        result.symlinks += 1
+
+
+def replace_link(make_link: Callable, source: str, target: str):
+    """Links target to source, replacing any file already at target (i.e.
+    one left behind in the overlay by hand). Only ever called inside an
+    overlay this module deployed - see check_overlay_path."""
+    try:
+        make_link(source, target)
+    except FileExistsError:
+        os.unlink(target)
+        make_link(source, target)
+
+
+def is_link_intact(target: str, entry: List) -> bool:
+    """Whether the overlay still has the link a manifest entry describes -
+    links can be deleted, or replaced with other files, by hand"""
+    try:
+        target_stat = os.lstat(target)
+    except FileNotFoundError:
+        return False
+
+    if stat.S_ISLNK(target_stat.st_mode):
+        return os.readlink(target) == entry[SOURCE]
+    return target_stat.st_ino == entry[INO]
+
+
+def unlink_if_exists(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_empty_dirs(overlay_path: Path, data_keys: Iterable[str]):
+    """Removes directories left empty after removing the given links"""
+    dirs = {os.path.dirname(data_key) for data_key in data_keys}
+    for data_dir in sorted(dirs, key=len, reverse=True):
+        while data_dir:
+            try:
+                os.rmdir(os.path.join(overlay_path, data_dir))
+            except OSError:
+                # not empty (or already gone)
+                break
+            data_dir = os.path.dirname(data_dir)
+
+
+def check_overlay_path(overlay_path: Path):
+    """Raises ValueError if overlay_path is a directory with files in it that
+    no deploy put there (i.e. Morrowind's Data Files by mistake) - linking
+    into it would replace them"""
+    if not overlay_path.is_dir():
+        return
+
+    with os.scandir(overlay_path) as entries:
+        if next(entries, None) is not None:
+            raise ValueError(
+                f"{overlay_path} is not empty and has no overlay manifest "
+                f"({get_manifest_path(overlay_path).name}) - refusing to "
+                "deploy into it"
+            )
+
+
+def deploy_overlay(data_dirs: Iterable[ModDataDir], overlay_path: Path) -> DeployResult:
+    """Builds a single directory of links to the winning file for every
+    data-relative path across data_dirs (given in load order), so OpenMW
+    only needs one data= entry for all of them.
+
+    If the overlay has been deployed before, only links whose winner has
+    changed (or been re-extracted) are redone, along with any that have
+    gone missing from the overlay. Raises ValueError rather than deploy into
+    a directory that already has other files in it."""
+    deployed = read_manifest(overlay_path)
+    if deployed is None:
+        check_overlay_path(overlay_path)
+        deployed = {}
+    overlay_path.mkdir(parents=True, exist_ok=True)
+
+    winners = resolve_winners(data_dirs)
+
+    result = DeployResult()
+    linker = OverlayLinker(overlay_path)
+
+    removed_keys = deployed.keys() - winners.keys()
+    for data_key in removed_keys:
+        unlink_if_exists(os.path.join(overlay_path, data_key))
+        result.removed += 1
+    remove_empty_dirs(overlay_path, removed_keys)
+
+    links = {}
+    for data_key, mod_file in winners.items():
+        entry = links[data_key] = get_link_entry(mod_file)
+        target = os.path.join(overlay_path, data_key)
+
+        deployed_entry = deployed.get(data_key)
+        if deployed_entry is None:
+            result.added += 1
+        elif deployed_entry != entry:
+            unlink_if_exists(target)
+            result.changed += 1
+        elif is_link_intact(target, entry):
+            result.unchanged += 1
+            continue
+        else:
+            result.repaired += 1
+
+        linker.link(data_key, entry[SOURCE], result)
+
+    write_manifest(overlay_path, links)
+    return result
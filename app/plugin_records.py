@@ -0,0 +1,212 @@
+import struct
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.scan_cache import ScanCache
+
+CACHE_NAMESPACE = "plugin_record_keys"
+
+# type (4 chars), size of the record's data, unused, flags
+RECORD_HEADER = struct.Struct("<4sIII")
+# name (4 chars), size of the subrecord's data
+SUBRECORD_HEADER = struct.Struct("<4sI")
+GRID = struct.Struct("<ii")
+CELL_DATA = struct.Struct("<Iii")
+
+CELL_IS_INTERIOR = 0x01
+
+# only this much of an id subrecord is ever read
+MAX_ID_SIZE = 256
+
+# records which don't take their id from the NAME subrecord
+ID_SUBRECORDS = {
+    b"INFO": b"INAM",
+    b"LAND": b"INTV",
+    b"MGEF": b"INDX",
+    b"SKIL": b"INDX",
+    b"SCPT": b"SCHD",
+}
+
+# the file header record, which isn't a game record
+HEADER_RECORD = b"TES3"
+
+READ_BUFFER_SIZE = 1 << 16
+
+# (record type, record id)
+RecordKey = Tuple[str, str]
+
+
+def decode_id(data: bytes) -> str:
+    """Morrowind ids are null terminated, windows-1252 and case-insensitive"""
+    return data.split(b"\0", 1)[0].decode("cp1252", "replace").casefold()
+
+
+def iter_subrecords(
+    plugin_file: BinaryIO, record_end: int, wanted: Sequence[bytes]
+) -> Iterator[Tuple[bytes, bytes]]:
+    """Yields (name, data) for the wanted subrecords of the current record,
+    skipping over the data of every other subrecord"""
+    while plugin_file.tell() < record_end:
+        header = plugin_file.read(SUBRECORD_HEADER.size)
+        if len(header) < SUBRECORD_HEADER.size:
+            return
+
+        name, size = SUBRECORD_HEADER.unpack(header)
+        if name in wanted:
+            data = plugin_file.read(min(size, MAX_ID_SIZE))
+            plugin_file.seek(size - len(data), 1)
+            yield name, data
+        else:
+            plugin_file.seek(size, 1)
+
+
+def read_record_id(
+    plugin_file: BinaryIO, record_type: bytes, record_end: int, topic: str
+) -> Optional[str]:
+    """Reads just enough of a record to work out its id"""
+    if record_type == b"CELL":
+        # interior cells are named, exterior cells are found by grid position
+        name = None
+        subrecords = iter_subrecords(plugin_file, record_end, (b"NAME", b"DATA"))
+        for sub_name, data in subrecords:
+            if sub_name == b"NAME":
+                name = decode_id(data)
+            elif len(data) >= CELL_DATA.size:
+                flags, x, y = CELL_DATA.unpack_from(data)
+                return name if flags & CELL_IS_INTERIOR else f"{x},{y}"
+        return name
+
+    if record_type == b"PGRD":
+        grid = None
+        subrecords = iter_subrecords(plugin_file, record_end, (b"DATA", b"NAME"))
+        for sub_name, data in subrecords:
+            if sub_name == b"DATA" and len(data) >= GRID.size:
+                grid = "{},{}".format(*GRID.unpack_from(data))
+            elif sub_name == b"NAME":
+                return f"{decode_id(data)}|{grid}"
+        return grid
+
+    id_subrecord = ID_SUBRECORDS.get(record_type, b"NAME")
+    for sub_name, data in iter_subrecords(plugin_file, record_end, (id_subrecord,)):
+        if record_type == b"LAND" and len(data) >= GRID.size:
+            return "{},{}".format(*GRID.unpack_from(data))
+        if record_type in (b"MGEF", b"SKIL") and len(data) >= 4:
+            return str(int.from_bytes(data[:4], "little"))
+        if record_type == b"SCPT":
+            return decode_id(data[:32])
+        if record_type == b"INFO":
+            # dialogue responses belong to the DIAL record before them
+            return f"{topic}|{decode_id(data)}"
+        return decode_id(data)
+
+    return None
+
+
+def iter_record_keys(plugin_file: BinaryIO) -> Iterator[RecordKey]:
+    """Walks the records of a TES3 plugin (ESP/ESM/omwaddon), yielding the
+    (type, id) of each. Only the id subrecords are read - everything else
+    is skipped over, so memory use doesn't depend on the size of the plugin."""
+    topic = ""
+    while True:
+        header = plugin_file.read(RECORD_HEADER.size)
+        if len(header) < RECORD_HEADER.size:
+            return
+
+        record_type, size, _, _ = RECORD_HEADER.unpack(header)
+        record_end = plugin_file.tell() + size
+
+        if record_type != HEADER_RECORD:
+            record_id = read_record_id(plugin_file, record_type, record_end, topic)
+            if record_id is not None:
+                if record_type == b"DIAL":
+                    topic = record_id
+                yield (record_type.decode("ascii", "replace"), record_id)
+
+        plugin_file.seek(record_end)
+
+
+def read_record_keys(plugin_path: Path) -> List[RecordKey]:
+    """Returns the (type, id) of every record in a plugin. Run in worker
+    processes, so it only takes and returns plain values."""
+    with open(plugin_path, "rb", buffering=READ_BUFFER_SIZE) as plugin_file:
+        return list(iter_record_keys(plugin_file))
+
+
+def get_record_keys(
+    plugin_paths: Sequence[Path],
+    cache: ScanCache = None,
+    max_workers: int = None,
+) -> Dict[Path, List[RecordKey]]:
+    """Gets the record keys of each plugin - from the cache where the plugin
+    hasn't changed, otherwise by reading the plugins across a process pool"""
+    record_keys = {}
+    to_read = []
+    for plugin_path in plugin_paths:
+        cached = cache.get(CACHE_NAMESPACE, plugin_path) if cache else None
+        if cached is None:
+            to_read.append(plugin_path)
+        else:
+            record_keys[plugin_path] = [tuple(key) for key in cached]
+
+    if to_read:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # largest plugins first, so a big master doesn't start last
+            to_read.sort(key=lambda path: path.stat().st_size, reverse=True)
+            for plugin_path, keys in zip(
+                to_read, executor.map(read_record_keys, to_read)
+            ):
+                record_keys[plugin_path] = keys
+                if cache is not None:
+                    cache.put(CACHE_NAMESPACE, plugin_path, keys)
+
+    return record_keys
+
+
+@dataclass
+class RecordConflict:
+    record_type: str
+    record_id: str
+    # every plugin that edits the record, in load order - the last one wins
+    plugins: List[Path]
+
+    @property
+    def winner(self) -> Path:
+        return self.plugins[-1]
+
+    def to_record(self) -> Dict:
+        return {
+            "type": self.record_type,
+            "id": self.record_id,
+            "plugins": [plugin.name for plugin in self.plugins],
+            "winner": self.winner.name,
+        }
+
+
+def find_record_conflicts(
+    plugin_paths: Sequence[Path],
+    cache: ScanCache = None,
+    max_workers: int = None,
+) -> List[RecordConflict]:
+    """Finds records edited by more than one of plugin_paths, which should
+    be given in load order. Conflicts are ordered by the load order position
+    of the plugin that wins them."""
+    record_keys = get_record_keys(plugin_paths, cache, max_workers)
+
+    editors: Dict[RecordKey, List[int]] = {}
+    for load_idx, plugin_path in enumerate(plugin_paths):
+        for key in set(record_keys[plugin_path]):
+            editors.setdefault(key, []).append(load_idx)
+
+    conflicts = [
+        (load_idxs[-1], key, load_idxs)
+        for key, load_idxs in editors.items()
+        if len(load_idxs) > 1
+    ]
+    conflicts.sort()
+
+    return [
+        RecordConflict(record_type, record_id, [plugin_paths[i] for i in load_idxs])
+        for _, (record_type, record_id), load_idxs in conflicts
+    ]
@@ -0,0 +1,253 @@
+import json
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from app.auto_datafiles import (
+    format_data_line,
+    read_cfg_lines,
+    read_content_order,
+    read_data_paths,
+    write_cfg_lines,
+)
+from app.conflicts import find_file_conflicts
+from app.mod_resources import ModDataDir, mod_resource_factory
+from app.snapshot import snapshot_dir
+
+PROFILE_FORMAT = 1
+PROFILE_SUFFIX = ".profile.json"
+
+# the lines a profile adds to openmw.cfg sit between these, so switching
+# profile can find and swap them out
+BLOCK_START = "# py_openmw_modder profile: {}"
+BLOCK_END = "# end of py_openmw_modder profile"
+BLOCK_START_PREFIX = BLOCK_START.format("")
+# fallback= lines that a profile overrides are kept, commented out with this
+OVERRIDDEN_PREFIX = "# overridden by py_openmw_modder profile: "
+
+# profile names end up in file names and openmw.cfg comments, so they are
+# kept to letters, digits, spaces, '_', '-' and '.', starting with a letter
+# or digit
+PROFILE_NAME = re.compile(r"[^\W_][\w .-]{0,63}")
+
+
+def validate_profile_name(name: str) -> str:
+    if not PROFILE_NAME.fullmatch(name):
+        raise ValueError(
+            f"Invalid profile name {name!r} - use up to 64 letters, digits, "
+            "spaces, '_', '-' or '.', starting with a letter or digit"
+        )
+    return name
+
+
+def is_inside(path: Path, parents: Iterable[Path]) -> bool:
+    return any(path == parent or parent in path.parents for parent in parents)
+
+
+def replace_mod_data_paths(
+    data_paths: List[Path], mod_data_paths: List[Path], mods_roots: Iterable[Path]
+) -> List[Path]:
+    """Swaps the data paths that are inside the mods folders for
+    mod_data_paths. Data paths from anywhere else (i.e. Morrowind's Data
+    Files) are kept, ahead of the mods."""
+    mods_roots = list(mods_roots)
+    return [
+        path for path in data_paths if not is_inside(path, mods_roots)
+    ] + mod_data_paths
+
+
+def get_data_dir_digest(data_dir: ModDataDir) -> Optional[str]:
+    """Digest of everything below a data dir (names, sizes and modified
+    times), or None if it doesn't exist"""
+    if not data_dir.path.is_dir():
+        return None
+    return snapshot_dir(data_dir)["h"]
+
+
+@dataclass
+class Profile:
+    """A named setup - which data dirs are active, the content= load order,
+    and any fallback= values to override"""
+
+    name: str
+    data_paths: List[Path]
+    content: List[str]
+    fallbacks: Dict[str, str] = field(default_factory=dict)
+
+    # precomputed by compile(), so switching profile doesn't need a rescan
+    cfg_lines: Optional[List[str]] = None
+    conflicts: Optional[Dict[str, str]] = None
+    data_signature: Optional[List] = None
+
+    def __post_init__(self):
+        validate_profile_name(self.name)
+
+    def __repr__(self):
+        return f"Profile[{self.name}]"
+
+    @classmethod
+    def from_cfg(cls, name: str, cfg_path: Path) -> "Profile":
+        """Captures the data= and content= entries of an existing config"""
+        return cls(name, read_data_paths(cfg_path), read_content_order(cfg_path))
+
+    def load_data_dirs(self) -> List[ModDataDir]:
+        return [
+            ModDataDir(path, parent=self.name, child_factory=mod_resource_factory)
+            for path in self.data_paths
+        ]
+
+    def get_data_signature(self, data_dirs: List[ModDataDir] = None) -> List:
+        """Digest of each data dir's whole tree (see snapshot_dir) - changes
+        when any file below it is added, removed or modified"""
+        data_dirs = data_dirs if data_dirs is not None else self.load_data_dirs()
+        return [
+            [str(data_dir.path), get_data_dir_digest(data_dir)]
+            for data_dir in data_dirs
+        ]
+
+    @property
+    def is_stale(self) -> bool:
+        """True if the conflicts need working out again"""
+        return (
+            self.conflicts is None or self.data_signature != self.get_data_signature()
+        )
+
+    def build_cfg_lines(self) -> List[str]:
+        return (
+            [BLOCK_START.format(self.name)]
+            + [format_data_line(path) for path in self.data_paths]
+            + [f"content={name}" for name in self.content]
+            + [f"fallback={name},{value}" for name, value in self.fallbacks.items()]
+            + [BLOCK_END]
+        )
+
+    def find_conflicts(self):
+        # one walk of each data dir covers both the conflicts and the signature
+        data_dirs = self.load_data_dirs()
+        self.data_signature = self.get_data_signature(data_dirs)
+        existing = [data_dir for data_dir in data_dirs if data_dir.path.is_dir()]
+        self.conflicts = {
+            data_key: str(providers[-1].path)
+            for data_key, providers in find_file_conflicts(existing).items()
+        }
+
+    def compile(self):
+        """Works out the profile's openmw.cfg lines, and its file conflicts if
+        the data dirs have changed since they were last worked out"""
+        self.cfg_lines = self.build_cfg_lines()
+        if self.is_stale:
+            self.find_conflicts()
+
+    def to_dict(self) -> Dict:
+        return {
+            "format": PROFILE_FORMAT,
+            "name": self.name,
+            "data_paths": [str(path) for path in self.data_paths],
+            "content": self.content,
+            "fallbacks": self.fallbacks,
+            "cfg_lines": self.cfg_lines,
+            "conflicts": self.conflicts,
+            "data_signature": self.data_signature,
+        }
+
+    @classmethod
+    def from_dict(cls, profile_dict: Dict) -> "Profile":
+        return cls(
+            name=profile_dict["name"],
+            data_paths=[Path(path) for path in profile_dict["data_paths"]],
+            content=profile_dict["content"],
+            fallbacks=profile_dict["fallbacks"],
+            cfg_lines=profile_dict["cfg_lines"],
+            conflicts=profile_dict["conflicts"],
+            data_signature=profile_dict["data_signature"],
+        )
+
+
+def strip_profile_lines(cfg_lines: List[str], fallback_names=()) -> List[str]:
+    """Removes everything a profile manages from cfg_lines - any previous
+    profile block and loose data= and content= lines. fallback= lines for the
+    given names are commented out (and ones commented out by an earlier
+    profile are restored), so the profile's own values take their place."""
+    fallback_prefixes = tuple(f"fallback={name}," for name in fallback_names)
+
+    kept_lines = []
+    in_block = False
+    for line in cfg_lines:
+        stripped = line.strip()
+        if stripped.startswith(OVERRIDDEN_PREFIX):
+            line = stripped = stripped[len(OVERRIDDEN_PREFIX) :]
+
+        if stripped.startswith(BLOCK_START_PREFIX):
+            in_block = True
+        elif stripped == BLOCK_END:
+            in_block = False
+        elif in_block or stripped.startswith(("data=", "content=")):
+            continue
+        elif fallback_prefixes and stripped.startswith(fallback_prefixes):
+            kept_lines.append(OVERRIDDEN_PREFIX + line)
+        else:
+            kept_lines.append(line)
+
+    return kept_lines
+
+
+class ProfileStore:
+    """Profiles saved as one JSON file each in a directory"""
+
+    def __init__(self, path: Path):
+        self.path = path
+
+    def __repr__(self):
+        return f"ProfileStore[{self.path}]"
+
+    def get_profile_path(self, name: str) -> Path:
+        return self.path / f"{validate_profile_name(name)}{PROFILE_SUFFIX}"
+
+    def list_names(self) -> List[str]:
+        if not self.path.exists():
+            return []
+        return sorted(
+            profile_path.name[: -len(PROFILE_SUFFIX)]
+            for profile_path in self.path.glob(f"*{PROFILE_SUFFIX}")
+        )
+
+    def load(self, name: str) -> Profile:
+        with open(self.get_profile_path(name), "r", encoding="utf-8") as profile_file:
+            profile_dict = json.load(profile_file)
+
+        if profile_dict.get("format") != PROFILE_FORMAT:
+            raise ValueError(f"Unsupported format for profile {name}")
+        return Profile.from_dict(profile_dict)
+
+    def save(self, profile: Profile):
+        """Compiles the profile, then saves it"""
+        profile.compile()
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        profile_path = self.get_profile_path(profile.name)
+        tmp_path = profile_path.with_name(profile_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as profile_file:
+            json.dump(profile.to_dict(), profile_file, separators=(",", ":"))
+
+        os.replace(tmp_path, profile_path)
+
+    def switch(self, name: str, cfg_path: Path) -> Profile:
+        """Swaps the profile's precomputed lines into openmw.cfg in one atomic
+        write. Nothing is rescanned - if the profile's data dirs have changed
+        since it was compiled, call refresh to bring its conflicts up to date."""
+        profile = self.load(name)
+        if profile.cfg_lines is None:
+            self.save(profile)
+
+        cfg_lines = strip_profile_lines(read_cfg_lines(cfg_path), profile.fallbacks)
+        write_cfg_lines(cfg_path, cfg_lines + profile.cfg_lines)
+        return profile
+
+    def refresh(self, name: str) -> Profile:
+        """Recompiles a profile if its data dirs have changed"""
+        profile = self.load(name)
+        if profile.is_stale:
+            self.save(profile)
+        return profile
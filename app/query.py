@@ -0,0 +1,229 @@
+import re
+from array import array
+from dataclasses import dataclass
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
+
+# a glob like '*.esp' can be answered from the extension index
+EXTENSION_GLOB = re.compile(r"^\*(\.[^*?\[\]]+)$")
+
+# (resource, depth below the queried directory, nearest data dir above it
+# but below the queried directory)
+Entry = Tuple[object, int, Optional[object]]
+
+
+@dataclass(frozen=True)
+class Query:
+    """The resources to find below a directory. Every filter given has to
+    match, and names, globs and extensions match case-insensitively."""
+
+    type: Union[type, Tuple[type, ...]] = None
+    # full name (with extension), or a set of names
+    name: Union[str, FrozenSet[str]] = None
+    glob: str = None
+    extension: str = None
+    # direct children are depth 1
+    min_depth: int = 1
+    max_depth: int = None
+    # only resources whose nearest data dir is this one
+    data_dir: Path = None
+    # only resources inside (True) or outside (False) of any data dir
+    in_data_dir: bool = None
+    # file size, or total size of everything below a directory
+    min_size: int = None
+    max_size: int = None
+
+    def get_names(self) -> FrozenSet[str]:
+        names = [self.name] if isinstance(self.name, str) else self.name
+        return frozenset(name.casefold() for name in names)
+
+    def get_extension(self) -> Optional[str]:
+        if self.extension is not None:
+            return self.extension.casefold()
+
+        match = EXTENSION_GLOB.match(self.glob or "")
+        return match.group(1).casefold() if match else None
+
+
+def compile_filters(query: Query, skip: str = None) -> List[Callable]:
+    """Turns a query into checks of (resource, depth, data_dir). skip names
+    a filter already answered by the index the query is planned on."""
+    filters = []
+
+    if query.type is not None and skip != "type":
+        filters.append(lambda r, depth, data_dir: isinstance(r, query.type))
+
+    if query.name is not None and skip != "name":
+        names = query.get_names()
+        filters.append(lambda r, depth, data_dir: r.folded_name in names)
+
+    extension = query.get_extension()
+    if extension is not None and skip != "extension":
+        filters.append(lambda r, depth, data_dir: r.suffix == extension)
+
+    if query.glob is not None:
+        pattern = query.glob.casefold()
+        filters.append(lambda r, depth, data_dir: fnmatchcase(r.folded_name, pattern))
+
+    if query.min_depth > 1:
+        filters.append(lambda r, depth, data_dir: depth >= query.min_depth)
+    if query.max_depth is not None:
+        filters.append(lambda r, depth, data_dir: depth <= query.max_depth)
+
+    if query.data_dir is not None and skip != "data_dir":
+        filters.append(
+            lambda r, depth, data_dir: data_dir is not None
+            and data_dir.path == query.data_dir
+        )
+    if query.in_data_dir is not None and skip != "in_data_dir":
+        filters.append(
+            lambda r, depth, data_dir: (data_dir is not None) == query.in_data_dir
+        )
+
+    if query.min_size is not None:
+        filters.append(lambda r, depth, data_dir: r.size >= query.min_size)
+    if query.max_size is not None:
+        filters.append(lambda r, depth, data_dir: r.size <= query.max_size)
+
+    return filters
+
+
+def filter_entries(query: Query, entries: Iterable[Entry]) -> List:
+    """Runs a query against entries directly, without an index"""
+    filters = compile_filters(query)
+    return [
+        resource
+        for resource, depth, data_dir in entries
+        if all(check(resource, depth, data_dir) for check in filters)
+    ]
+
+
+def get_data_dir_key(resource, data_dir) -> Optional[str]:
+    return str(data_dir.path) if data_dir is not None else None
+
+
+# how each index is keyed
+INDEX_KEYS = {
+    "type": lambda resource, data_dir: type(resource),
+    "name": lambda resource, data_dir: resource.folded_name,
+    "extension": lambda resource, data_dir: resource.suffix,
+    "data_dir": get_data_dir_key,
+}
+
+
+@dataclass
+class QueryPlan:
+    # None for a full scan
+    index: Optional[str]
+    keys: List
+    filters: List[Callable]
+
+    def __repr__(self):
+        return f"QueryPlan[{self.index or 'scan'}: {len(self.filters)} filters]"
+
+
+class QueryIndex:
+    """Every resource below a directory, with type, name, extension and data
+    dir indexes over them. Each index is only built the first time a query
+    can use it, and query results are kept, so repeating a query is a dict
+    lookup."""
+
+    def __init__(self, entries: Iterable[Entry]):
+        self.resources = []
+        self.depths = array("H")
+        self.data_dirs = []
+        for resource, depth, data_dir in entries:
+            self.resources.append(resource)
+            self.depths.append(depth)
+            self.data_dirs.append(data_dir)
+
+        self._indexes: Dict[str, Dict] = {}
+        self._results: Dict[Query, List] = {}
+
+    def __len__(self):
+        return len(self.resources)
+
+    def get_index(self, index_name: str) -> Dict:
+        index = self._indexes.get(index_name)
+        if index is None:
+            key_func = INDEX_KEYS[index_name]
+            index = {}
+            for position, (resource, data_dir) in enumerate(
+                zip(self.resources, self.data_dirs)
+            ):
+                key = key_func(resource, data_dir)
+                positions = index.get(key)
+                if positions is None:
+                    positions = index[key] = array("I")
+                positions.append(position)
+
+            self._indexes[index_name] = index
+
+        return index
+
+    def plan(self, query: Query) -> QueryPlan:
+        """Picks the index that narrows the query down the most, falling back
+        to a full scan if no index applies"""
+        options = []
+        if query.name is not None:
+            options.append(("name", "name", list(query.get_names())))
+
+        extension = query.get_extension()
+        if extension is not None:
+            options.append(("extension", "extension", [extension]))
+
+        if query.type is not None:
+            type_index = self.get_index("type")
+            types = [cls for cls in type_index if issubclass(cls, query.type)]
+            options.append(("type", "type", types))
+
+        if query.data_dir is not None:
+            options.append(("data_dir", "data_dir", [str(query.data_dir)]))
+        elif query.in_data_dir is False:
+            options.append(("in_data_dir", "data_dir", [None]))
+
+        best = None
+        for filter_name, index_name, keys in options:
+            index = self.get_index(index_name)
+            cost = sum(len(index.get(key, ())) for key in keys)
+            if best is None or cost < best[0]:
+                best = (cost, filter_name, index_name, keys)
+
+        if best is None:
+            return QueryPlan(None, [], compile_filters(query))
+
+        _, filter_name, index_name, keys = best
+        return QueryPlan(index_name, keys, compile_filters(query, skip=filter_name))
+
+    def find(self, query: Query) -> List:
+        results = self._results.get(query)
+        if results is not None:
+            return list(results)
+
+        plan = self.plan(query)
+        if plan.index is None:
+            positions = range(len(self.resources))
+        else:
+            index = self.get_index(plan.index)
+            postings = [index[key] for key in plan.keys if key in index]
+            if len(postings) == 1:
+                positions = postings[0]
+            else:
+                # keep results in tree order when several keys are used
+                positions = sorted(
+                    position for posting in postings for position in posting
+                )
+
+        resources, depths, data_dirs = self.resources, self.depths, self.data_dirs
+        results = [
+            resources[position]
+            for position in positions
+            if all(
+                check(resources[position], depths[position], data_dirs[position])
+                for check in plan.filters
+            )
+        ]
+
+        self._results[query] = results
+        return list(results)
@@ -0,0 +1,105 @@
+import gzip
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+CACHE_FORMAT = 1
+
+
+class ScanCache:
+    """Results worked out from files (plugin record keys, asset headers...)
+    saved between runs. Entries are grouped by namespace and keyed by file
+    path, and are only returned while the file's size and modified time
+    are unchanged."""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = path
+        self._entries: Dict[str, Dict[str, list]] = {}
+        self._is_dirty = False
+
+        if path is not None and path.exists():
+            self.load()
+
+    def __repr__(self):
+        return f"ScanCache[{self.path}]"
+
+    @staticmethod
+    def get_file_signature(file_path: Path, stat: os.stat_result = None) -> list:
+        stat = stat or os.stat(file_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def get(
+        self,
+        namespace: str,
+        file_path: Path,
+        stat: os.stat_result = None,
+        signature: list = None,
+    ) -> Optional[Any]:
+        """Returns the cached value for file_path, or None if there isn't one
+        or the file has changed since it was cached. Pass the file's stat, or
+        its signature (i.e. ModFile.signature), if it is already known."""
+        entry = self._entries.get(namespace, {}).get(str(file_path))
+        if entry is None:
+            return None
+
+        cached_signature, value = entry
+        if signature is None:
+            signature = self.get_file_signature(file_path, stat)
+        if cached_signature != signature:
+            return None
+
+        return value
+
+    def put(
+        self,
+        namespace: str,
+        file_path: Path,
+        value: Any,
+        stat: os.stat_result = None,
+        signature: list = None,
+    ):
+        """Caches a (JSON serialisable) value for file_path"""
+        if signature is None:
+            signature = self.get_file_signature(file_path, stat)
+        self._entries.setdefault(namespace, {})[str(file_path)] = [signature, value]
+        self._is_dirty = True
+
+    def get_value(self, namespace: str, key: str) -> Optional[Any]:
+        """Returns a cached value that isn't tied to a single file"""
+        return self._entries.get(namespace, {}).get(key)
+
+    def put_value(self, namespace: str, key: str, value: Any):
+        self._entries.setdefault(namespace, {})[key] = value
+        self._is_dirty = True
+
+    def clear(self, namespace: str = None):
+        if namespace is None:
+            self._entries = {}
+        else:
+            self._entries.pop(namespace, None)
+        self._is_dirty = True
+
+    def load(self):
+        with gzip.open(self.path, "rt", encoding="utf-8") as cache_file:
+            cached = json.load(cache_file)
+
+        # caches from older versions are thrown away rather than migrated
+        if cached.get("format") == CACHE_FORMAT:
+            self._entries = cached["entries"]
+
+    def save(self):
+        if self.path is None or not self._is_dirty:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as cache_file:
+            json.dump(
+                {"format": CACHE_FORMAT, "entries": self._entries},
+                cache_file,
+                separators=(",", ":"),
+            )
+
+        os.replace(tmp_path, self.path)
+        self._is_dirty = False
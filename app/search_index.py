@@ -0,0 +1,304 @@
+import heapq
+import threading
+from array import array
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+# documents are ranked by kind when their scores tie
+KIND_RANKS = {"title": 0, "variant": 1, "plugin": 2, "file": 3}
+
+# posting lists longer than this are skipped when fuzzy matching - a trigram
+# that common says little about which document was meant
+MAX_FUZZY_POSTINGS = 20_000
+
+# fraction of the query's trigrams a document needs for a fuzzy match
+MIN_FUZZY_SCORE = 0.5
+
+
+def get_trigrams(text: str) -> Set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def fold_text(text: str) -> str:
+    return " ".join(text.casefold().replace("_", " ").split())
+
+
+@dataclass
+class SearchDocument:
+    kind: str
+    text: str
+    folded: str
+    mod_path: str
+
+
+@dataclass
+class SearchResult:
+    score: float
+    document: SearchDocument
+
+    @property
+    def kind(self) -> str:
+        return self.document.kind
+
+    @property
+    def text(self) -> str:
+        return self.document.text
+
+    @property
+    def mod_path(self) -> str:
+        return self.document.mod_path
+
+    def to_record(self) -> Dict:
+        return {
+            "score": round(self.score, 3),
+            "kind": self.kind,
+            "text": self.text,
+            "mod": self.mod_path,
+        }
+
+
+class TrigramIndex:
+    """Inverted index from the trigrams of mod titles, variants, plugin names
+    and data-relative file paths to the documents that contain them.
+
+    Posting lists are append-only arrays of document ids. Removed documents
+    are only marked as deleted, and are dropped from the posting lists once
+    enough of them build up. Safe to update from a scanning thread while
+    another thread searches."""
+
+    def __init__(self):
+        self.documents: Dict[int, SearchDocument] = {}
+        self.postings: Dict[str, array] = {}
+        self.mod_documents: Dict[str, List[int]] = {}
+        # every document other than files - there are few enough of these to
+        # look through one by one
+        self.named_documents: Set[int] = set()
+
+        self._deleted: Set[int] = set()
+        self._next_id = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def add_document(self, kind: str, text: str, mod_path: str) -> int:
+        with self._lock:
+            doc_id = self._next_id
+            self._next_id += 1
+            self.merge(self.build_postings(doc_id, [(kind, text)], mod_path))
+
+        return doc_id
+
+    @staticmethod
+    def iter_mod_texts(mod) -> Iterator[Tuple[str, str]]:
+        """(kind, text) of each document for a mod - its title and variant,
+        plus its plugins and files if its data dirs have already been found"""
+        meta = mod.metadata
+        yield "title", meta.title or mod.name
+        if meta.variant:
+            yield "variant", meta.variant
+
+        for data_dir in mod.data_dirs or []:
+            for plugin in data_dir.esp_files + data_dir.bsa_files:
+                yield "plugin", plugin.path.name
+            for mod_file in data_dir.iter_files():
+                yield "file", mod_file.data_key
+
+    @staticmethod
+    def build_postings(
+        first_id: int, texts: List[Tuple[str, str]], mod_path: str
+    ) -> Tuple[Dict[int, SearchDocument], Dict[str, array]]:
+        """Documents and posting lists for texts, numbered from first_id"""
+        documents = {}
+        postings: Dict[str, array] = {}
+        for doc_id, (kind, text) in enumerate(texts, first_id):
+            folded = fold_text(text)
+            documents[doc_id] = SearchDocument(kind, text, folded, mod_path)
+
+            for trigram in get_trigrams(folded):
+                posting = postings.get(trigram)
+                if posting is None:
+                    posting = postings[trigram] = array("I")
+                posting.append(doc_id)
+
+        return documents, postings
+
+    def prepare_mod(self, mod) -> Tuple[Dict[int, SearchDocument], Dict[str, array]]:
+        """Builds a mod's documents and posting lists. Only reserving their
+        ids takes the lock, so searches aren't held up while the mod's
+        files are folded and split into trigrams."""
+        texts = list(self.iter_mod_texts(mod))
+        with self._lock:
+            first_id = self._next_id
+            self._next_id += len(texts)
+
+        return self.build_postings(first_id, texts, str(mod.path))
+
+    def merge(self, prepared: Tuple[Dict[int, SearchDocument], Dict[str, array]]):
+        """Adds documents and posting lists built by build_postings"""
+        documents, postings = prepared
+        with self._lock:
+            self.documents.update(documents)
+            for doc_id, document in documents.items():
+                self.mod_documents.setdefault(document.mod_path, []).append(doc_id)
+                if document.kind != "file":
+                    self.named_documents.add(doc_id)
+
+            for trigram, doc_ids in postings.items():
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    self.postings[trigram] = doc_ids
+                else:
+                    posting.extend(doc_ids)
+
+    def add_mod(self, mod):
+        """Indexes a mod's title and variant, plus its plugins and files if
+        its data dirs have already been found"""
+        self.merge(self.prepare_mod(mod))
+
+    def remove_mod(self, mod_path: str):
+        with self._lock:
+            for doc_id in self.mod_documents.pop(mod_path, []):
+                del self.documents[doc_id]
+                self.named_documents.discard(doc_id)
+                self._deleted.add(doc_id)
+
+            if len(self._deleted) > len(self.documents):
+                self.compact()
+
+    def update_mod(self, mod):
+        """Re-indexes a mod after it has changed (or its contents were
+        scanned). The new documents are built first, then swapped in for the
+        old ones in one step."""
+        prepared = self.prepare_mod(mod)
+        with self._lock:
+            self.remove_mod(str(mod.path))
+            self.merge(prepared)
+
+    def compact(self):
+        """Drops deleted documents from the posting lists"""
+        deleted = self._deleted
+        for trigram, posting in list(self.postings.items()):
+            kept = array("I", (doc_id for doc_id in posting if doc_id not in deleted))
+            if kept:
+                self.postings[trigram] = kept
+            else:
+                del self.postings[trigram]
+        self._deleted = set()
+
+    def search(
+        self, query: str, limit: int = 20, kinds: Iterable[str] = None
+    ) -> List[SearchResult]:
+        """Ranked substring and fuzzy search. Substring matches come first
+        (matches at the start of the text or a word rank higher), then
+        documents sharing most of the query's trigrams."""
+        folded_query = fold_text(query)
+        if not folded_query:
+            return []
+        kinds = set(kinds) if kinds is not None else None
+
+        with self._lock:
+            if len(folded_query) < 3:
+                # too short for trigrams - only look through titles and plugins
+                return self.rank_substring_matches(
+                    folded_query, self.named_documents, limit, kinds
+                )
+
+            query_trigrams = get_trigrams(folded_query)
+            posting_lists = sorted(
+                (self.postings.get(trigram, array("I")) for trigram in query_trigrams),
+                key=len,
+            )
+
+            # every substring match is in the shortest posting list - all of
+            # it is ranked, keeping only the best limit on a heap as it goes
+            results = self.rank_substring_matches(
+                folded_query, posting_lists[0], limit, kinds
+            )
+            if len(results) >= limit:
+                return results
+
+            fuzzy_results = self.rank_fuzzy_matches(
+                query_trigrams, posting_lists, limit, kinds
+            )
+            found = {id(result.document) for result in results}
+            results.extend(
+                result for result in fuzzy_results if id(result.document) not in found
+            )
+            return results[:limit]
+
+    def get_document(self, doc_id: int, kinds: Optional[Set[str]]):
+        document = self.documents.get(doc_id)
+        if document is None or (kinds is not None and document.kind not in kinds):
+            return None
+        return document
+
+    def rank_substring_matches(
+        self, folded_query: str, candidates, limit: int, kinds: Optional[Set[str]]
+    ) -> List[SearchResult]:
+        documents = self.documents
+        query_length = len(folded_query)
+
+        def iter_scored():
+            for doc_id in candidates:
+                document = documents.get(doc_id)
+                if document is None or (
+                    kinds is not None and document.kind not in kinds
+                ):
+                    continue
+
+                folded = document.folded
+                position = folded.find(folded_query)
+                if position < 0:
+                    continue
+
+                # up to 2.0 for a whole-text match, less for longer texts
+                score = 1.0 + query_length / len(folded)
+                if position == 0:
+                    score += 0.75
+                elif not folded[position - 1].isalnum():
+                    score += 0.5
+                yield score, document
+
+        return self.top_results(iter_scored(), limit)
+
+    def rank_fuzzy_matches(
+        self,
+        query_trigrams: Set[str],
+        posting_lists: List[array],
+        limit: int,
+        kinds: Optional[Set[str]],
+    ) -> List[SearchResult]:
+        matches = Counter()
+        for posting in posting_lists:
+            if len(posting) <= MAX_FUZZY_POSTINGS:
+                matches.update(posting)
+
+        min_matches = MIN_FUZZY_SCORE * len(query_trigrams)
+        scored = []
+        for doc_id, num_matches in matches.items():
+            if num_matches < min_matches:
+                continue
+
+            document = self.get_document(doc_id, kinds)
+            if document is not None:
+                scored.append((num_matches / len(query_trigrams), document))
+
+        return self.top_results(scored, limit)
+
+    @staticmethod
+    def top_results(scored: Iterable, limit: int) -> List[SearchResult]:
+        """The best limit of (score, document) pairs - highest score, then by
+        kind and text. Common queries can match most of the index, so rather
+        than sorting every match, only a heap of the best limit is kept."""
+        top = heapq.nsmallest(
+            limit,
+            scored,
+            key=lambda pair: (
+                -pair[0],
+                KIND_RANKS.get(pair[1].kind, len(KIND_RANKS)),
+                pair[1].folded,
+            ),
+        )
+        return [SearchResult(score, document) for score, document in top]
@@ -0,0 +1,245 @@
+import gzip
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.mod_resources import ESP_FILE_TYPES, Mod, ModDir, ModFile
+
+SNAPSHOT_FORMAT = 1
+
+# file types that are reported when added or removed between snapshots
+PLUGIN_SUFFIXES = tuple(sorted(ESP_FILE_TYPES | {".bsa"}))
+
+DIGEST_SIZE = 8
+
+# Snapshot layout - kept to short keys as a collection can have 100k's of files
+#   {"format": 1, "digest": ..., "mods": {mod_path: mod_node}}
+#   mod_node = {"name": ..., "identity": [...], "meta": {...}, "tree": dir_node}
+#   dir_node = {"h": digest, "c": {child_name: dir_node | file_node}}
+#   file_node = [size, mtime_ns]
+
+
+def hash_entries(entries: Iterable[str]) -> str:
+    hasher = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    for entry in entries:
+        hasher.update(entry.encode("utf-8", "surrogateescape"))
+        hasher.update(b"\0")
+    return hasher.hexdigest()
+
+
+def is_dir_node(node) -> bool:
+    return isinstance(node, dict)
+
+
+def node_digest(node) -> str:
+    if is_dir_node(node):
+        return node["h"]
+
+    size, mtime_ns = node
+    return f"{size}:{mtime_ns}"
+
+
+def snapshot_dir(mod_dir: ModDir) -> Dict:
+    """Builds the node for a directory. Its digest covers the names and
+    digests of all its children, so two directories with the same digest
+    have the same contents (by name, size and modified time)."""
+    children = {}
+    for child in mod_dir.children:
+        if isinstance(child, ModDir):
+            children[child.path.name] = snapshot_dir(child)
+        elif isinstance(child, ModFile):
+            # the size and modified time the scan found the file with
+            children[child.path.name] = child.signature
+
+    digest = hash_entries(
+        f"{name}/{node_digest(node)}" for name, node in sorted(children.items())
+    )
+    return {"h": digest, "c": children}
+
+
+def snapshot_mod(mod: Mod) -> Dict:
+    meta = mod.metadata
+    return {
+        "name": mod.name,
+        "identity": list(mod.identity),
+        "meta": {
+            "title": meta.title,
+            "id": meta.id,
+            "version": meta.version,
+            "variant": meta.variant,
+        },
+        "tree": snapshot_dir(mod),
+    }
+
+
+def take_snapshot(mods: Iterable[Mod]) -> Dict:
+    # keyed by path, as mods under different roots can share a folder name
+    mod_nodes = {str(mod.path): snapshot_mod(mod) for mod in mods}
+    digest = hash_entries(
+        f"{path}/{node['tree']['h']}" for path, node in sorted(mod_nodes.items())
+    )
+    return {"format": SNAPSHOT_FORMAT, "digest": digest, "mods": mod_nodes}
+
+
+def save_snapshot(snapshot: Dict, path: Path):
+    with gzip.open(path, "wt", encoding="utf-8") as snapshot_file:
+        json.dump(snapshot, snapshot_file, separators=(",", ":"))
+
+
+def load_snapshot(path: Path) -> Dict:
+    with gzip.open(path, "rt", encoding="utf-8") as snapshot_file:
+        snapshot = json.load(snapshot_file)
+
+    if snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(
+            f"Unsupported snapshot format {snapshot.get('format')} in {path}"
+        )
+    return snapshot
+
+
+@dataclass
+class SnapshotDiff:
+    # mods are listed by path
+    added_mods: List[str] = field(default_factory=list)
+    removed_mods: List[str] = field(default_factory=list)
+    # (old mod path, new mod path, old version, new version)
+    version_changes: List[Tuple[str, str, str, str]] = field(default_factory=list)
+    # (mod path, path within the mod)
+    added_files: List[Tuple[str, str]] = field(default_factory=list)
+    removed_files: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def is_empty(self) -> bool:
+        return not (
+            self.added_mods
+            or self.removed_mods
+            or self.version_changes
+            or self.added_files
+            or self.removed_files
+        )
+
+    def to_records(self) -> List[Dict]:
+        return (
+            [{"change": "added_mod", "mod": path} for path in self.added_mods]
+            + [{"change": "removed_mod", "mod": path} for path in self.removed_mods]
+            + [
+                {
+                    "change": "version",
+                    "old_mod": old_path,
+                    "mod": new_path,
+                    "old_version": old_version,
+                    "version": new_version,
+                }
+                for old_path, new_path, old_version, new_version in self.version_changes
+            ]
+            + [
+                {"change": "added_file", "mod": path, "file": file}
+                for path, file in self.added_files
+            ]
+            + [
+                {"change": "removed_file", "mod": path, "file": file}
+                for path, file in self.removed_files
+            ]
+        )
+
+
+def iter_plugin_files(node: Dict, prefix: str = "") -> Iterable[str]:
+    for name, child in node["c"].items():
+        if is_dir_node(child):
+            yield from iter_plugin_files(child, f"{prefix}{name}/")
+        elif name.lower().endswith(PLUGIN_SUFFIXES):
+            yield f"{prefix}{name}"
+
+
+def diff_plugin_files(
+    old_node: Optional[Dict], new_node: Optional[Dict], prefix: str = ""
+) -> Tuple[List[str], List[str]]:
+    """Returns the (added, removed) plugin files between two dir nodes,
+    only descending into directories whose digests differ"""
+    if old_node is None:
+        return list(iter_plugin_files(new_node, prefix)), []
+    if new_node is None:
+        return [], list(iter_plugin_files(old_node, prefix))
+    if old_node["h"] == new_node["h"]:
+        return [], []
+
+    added, removed = [], []
+    old_children, new_children = old_node["c"], new_node["c"]
+
+    for name in old_children.keys() | new_children.keys():
+        old_child = old_children.get(name)
+        new_child = new_children.get(name)
+
+        if is_dir_node(old_child) or is_dir_node(new_child):
+            child_added, child_removed = diff_plugin_files(
+                old_child if is_dir_node(old_child) else None,
+                new_child if is_dir_node(new_child) else None,
+                f"{prefix}{name}/",
+            )
+            added.extend(child_added)
+            removed.extend(child_removed)
+
+        if name.lower().endswith(PLUGIN_SUFFIXES):
+            old_is_file = old_child is not None and not is_dir_node(old_child)
+            new_is_file = new_child is not None and not is_dir_node(new_child)
+            if new_is_file and not old_is_file:
+                added.append(f"{prefix}{name}")
+            if old_is_file and not new_is_file:
+                removed.append(f"{prefix}{name}")
+
+    return sorted(added), sorted(removed)
+
+
+def get_mod_identity(mod_node: Dict) -> Tuple:
+    """Mods are renamed when updated (the folder name holds the version), so
+    they are matched across snapshots by the Mod.identity saved with them"""
+    return tuple(mod_node["identity"])
+
+
+def diff_snapshots(old: Dict, new: Dict) -> SnapshotDiff:
+    """Compares two snapshots. Mods with matching digests are skipped
+    without looking at their contents."""
+    diff = SnapshotDiff()
+    if old["digest"] == new["digest"]:
+        return diff
+
+    old_mods, new_mods = old["mods"], new["mods"]
+
+    # pairs of (old path, new path) whose contents need comparing
+    pairs = [
+        (path, path)
+        for path in old_mods.keys() & new_mods.keys()
+        if old_mods[path]["tree"]["h"] != new_mods[path]["tree"]["h"]
+    ]
+
+    # the same mod can be installed more than once (i.e. under two roots), so
+    # each identity keeps every removed path, to be matched up in order
+    removed: Dict[Tuple, List[str]] = {}
+    for path in sorted(old_mods.keys() - new_mods.keys()):
+        removed.setdefault(get_mod_identity(old_mods[path]), []).append(path)
+
+    for path in sorted(new_mods.keys() - old_mods.keys()):
+        old_paths = removed.get(get_mod_identity(new_mods[path]))
+        if not old_paths:
+            diff.added_mods.append(path)
+            continue
+
+        old_path = old_paths.pop(0)
+        old_version = old_mods[old_path]["meta"]["version"]
+        new_version = new_mods[path]["meta"]["version"]
+        if old_version != new_version:
+            diff.version_changes.append((old_path, path, old_version, new_version))
+        pairs.append((old_path, path))
+
+    diff.removed_mods = sorted(path for paths in removed.values() for path in paths)
+
+    for old_path, new_path in sorted(pairs):
+        added, removed_files = diff_plugin_files(
+            old_mods[old_path]["tree"], new_mods[new_path]["tree"]
+        )
+        diff.added_files.extend((new_path, file) for file in added)
+        diff.removed_files.extend((new_path, file) for file in removed_files)
+
+    return diff
@@ -0,0 +1,652 @@
+import json
+import sys
+from pathlib import Path
+from typing import Dict, IO, Iterable, Iterator, List
+
+import click
+
+from app.app_settings import AppSettings
+from app.asset_inspector import inspect_mod
+from app.auto_datafiles import (
+    read_cfg_lines,
+    read_content_order,
+    read_data_paths,
+    write_cfg_lines,
+    write_data_dirs,
+)
+from app.cfg_validator import validate_cfg_lines
+from app.conflicts import find_file_conflicts, get_plugin_load_order
+from app.fallbacks import merge_fallbacks, read_ini_fallbacks
+from app.plugin_records import find_record_conflicts
+from app.scan_cache import ScanCache
+from app.mod_resources import (
+    BSAFile,
+    ESPFile,
+    Mod,
+    ModDataDir,
+    ModDir,
+    ModFile,
+    ModResourceDir,
+    ModsFolder,
+    mod_resource_factory,
+)
+from app.mod_versions import find_version_groups
+from app.overlay import deploy_overlay
+from app.profiles import (
+    Profile,
+    ProfileStore,
+    replace_mod_data_paths,
+    validate_profile_name,
+)
+from app.query import Query
+from app.search_index import KIND_RANKS
+from app.snapshot import diff_snapshots, load_snapshot, save_snapshot, take_snapshot
+
+settings = AppSettings()
+
+# resource types the find command can filter on
+RESOURCE_TYPES = {
+    "file": ModFile,
+    "esp": ESPFile,
+    "bsa": BSAFile,
+    "dir": ModDir,
+    "data-dir": ModDataDir,
+    "resource-dir": ModResourceDir,
+}
+
+# records are flushed in groups, so output streams without paying for a
+# flush on every line
+FLUSH_EVERY = 64
+
+
+class RecordWriter:
+    """Writes dicts to a stream as newline delimited JSON"""
+
+    def __init__(self, stream: IO = None, flush_every: int = FLUSH_EVERY):
+        self.stream = stream or sys.stdout
+        self.flush_every = flush_every
+        self._encoder = json.JSONEncoder(separators=(",", ":"), default=str)
+        self._pending = []
+
+    def write(self, record: Dict):
+        self._pending.append(self._encoder.encode(record))
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self.stream.write("\n".join(self._pending) + "\n")
+            self._pending = []
+        self.stream.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def read_records(stream: IO) -> Iterator[Dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+def iter_folder_mods(
+    mods_folder: ModsFolder,
+    writer: RecordWriter,
+    with_data_dirs: bool = False,
+    ordered: bool = True,
+) -> Iterator[Mod]:
+    """Folders that can't be read as a mod are reported as error records
+    rather than stopping the run"""
+    return mods_folder.iter_mods(
+        with_data_dirs,
+        on_error=lambda mod_path, e: writer.write(
+            {"path": str(mod_path), "error": str(e)}
+        ),
+        ordered=ordered,
+    )
+
+
+def get_mods(
+    mods_paths: Iterable[Path], writer: RecordWriter, with_data_dirs: bool = False
+) -> Iterator[Mod]:
+    """The mods in the mods folders, scanning each folder concurrently. Mods
+    are yielded in load order - folders in the order given, then by name -
+    so records never depend on the order the filesystem lists folders in,
+    but are still written as the mods are found."""
+    return iter_folder_mods(
+        ModsFolder(list(mods_paths), scan=False), writer, with_data_dirs
+    )
+
+
+def get_mods_roots(mods_paths: Iterable[Path], mod_records: List[Dict]) -> List[Path]:
+    """The mods folders given (or the mods_path setting), plus the folder of
+    every mod in mod_records"""
+    return [
+        *(mods_paths or settings.core.mods_path),
+        *(Path(record["path"]).parent for record in mod_records),
+    ]
+
+
+def get_record_data_paths(mod_records: Iterable[Dict]) -> List[Path]:
+    return [
+        Path(data_dir["path"])
+        for record in mod_records
+        for data_dir in record.get("data_dirs", [])
+    ]
+
+
+def data_dirs_from_records(records: Iterable[Dict]) -> List[ModDataDir]:
+    """Rebuilds the data dirs listed in records written by the scan command"""
+    return [
+        ModDataDir(
+            Path(data_dir["path"]),
+            parent=record["name"],
+            child_factory=mod_resource_factory,
+        )
+        for record in records
+        for data_dir in record.get("data_dirs", [])
+    ]
+
+
+def scan_data_dirs(
+    mods_paths: Iterable[Path], writer: RecordWriter
+) -> List[ModDataDir]:
+    return [
+        data_dir
+        for mod in get_mods(mods_paths, writer, with_data_dirs=True)
+        for data_dir in mod.data_dirs or []
+    ]
+
+
+mods_path_option = click.option(
+    "--mods-path",
+    "mods_paths",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="Mods folder to scan (can be repeated). Defaults to the mods_path setting.",
+)
+
+
+def make_cfg_option(exists: bool = False):
+    return click.option(
+        "--cfg",
+        "cfg_path",
+        type=click.Path(exists=exists, dir_okay=False, path_type=Path),
+        default=lambda: settings.core.open_mw_conf_path,
+        help="openmw.cfg to use. Defaults to the open_mw_conf_path setting.",
+    )
+
+
+cfg_option = make_cfg_option()
+# for commands that have nothing to do without an existing config
+existing_cfg_option = make_cfg_option(exists=True)
+
+
+@click.group()
+def cli():
+    """Non-interactive tools for a folder of OpenMW mods. Every command writes
+    newline delimited JSON (one record per line) to stdout, so results can be
+    piped into other tools or saved and diffed between runs."""
+
+
+@cli.command()
+@mods_path_option
+@click.option(
+    "--sort-by-size",
+    is_flag=True,
+    help="Write the biggest mods first, once every mod has been scanned.",
+)
+def scan(mods_paths, sort_by_size):
+    """Scan mods folders, writing one record per mod with its data dirs and
+    its size on disk"""
+    with RecordWriter() as writer:
+        records = (
+            mod.to_record(with_contents=True)
+            for mod in get_mods(
+                mods_paths or settings.core.mods_path, writer, with_data_dirs=True
+            )
+        )
+        if sort_by_size:
+            # the only case where records wait for the whole scan. Sizes come
+            # from the scan itself, so sorting needs no extra pass.
+            records = sorted(records, key=lambda record: record["size"], reverse=True)
+
+        for record in records:
+            writer.write(record)
+
+
+@cli.command(name="list")
+@mods_path_option
+def list_mods(mods_paths):
+    """List mods and their metadata, without scanning their contents"""
+    with RecordWriter() as writer:
+        for mod in get_mods(mods_paths or settings.core.mods_path, writer):
+            writer.write(mod.to_record(with_contents=False))
+
+
+@cli.command()
+@mods_path_option
+@click.option("--type", "type_name", type=click.Choice(list(RESOURCE_TYPES)))
+@click.option("--name", "names", multiple=True, help="Exact name (can be repeated).")
+@click.option("--glob", help="Name pattern, i.e. 'tx_*_road*.dds'.")
+@click.option("--ext", "extension", help="Extension, i.e. '.esp'.")
+@click.option("--max-depth", type=int, help="Depth below the mod folder.")
+@click.option("--min-size", type=int, help="Bytes (directories use their total).")
+@click.option("--max-size", type=int, help="Bytes (directories use their total).")
+def find(mods_paths, type_name, names, glob, extension, max_depth, min_size, max_size):
+    """Write one record per file or folder in the mods that matches every
+    filter given. Names, globs and extensions ignore case."""
+    query = Query(
+        type=RESOURCE_TYPES.get(type_name),
+        name=frozenset(names) or None,
+        glob=glob,
+        extension=extension,
+        max_depth=max_depth,
+        min_size=min_size,
+        max_size=max_size,
+    )
+
+    with RecordWriter() as writer:
+        for mod in get_mods(mods_paths or settings.core.mods_path, writer):
+            for resource in mod.find(query):
+                writer.write(
+                    {
+                        "mod": mod.name,
+                        "path": str(resource.path),
+                        "data_key": resource.data_key,
+                        "size": resource.size,
+                    }
+                )
+
+
+@cli.command()
+@mods_path_option
+def versions(mods_paths):
+    """Write one record per mod that is installed more than once, with the
+    newest install and any duplicate or superseded ones. Mods are matched by
+    nexus id, or by title for mods without one."""
+    cache = ScanCache(settings.core.cache_path)
+    mods_folder = ModsFolder(list(mods_paths or settings.core.mods_path), scan=False)
+
+    with RecordWriter() as writer:
+        for group in find_version_groups(mods_folder, cache):
+            writer.write(group.to_record())
+
+    cache.save()
+
+
+@cli.command()
+@mods_path_option
+@click.option(
+    "--records",
+    type=click.File("r"),
+    help="Output of 'scan' to read data dirs (in load order) from, '-' for stdin.",
+)
+@click.option(
+    "--plugins",
+    "plugin_records",
+    is_flag=True,
+    help="Report ESP/ESM records edited by more than one plugin, instead of files.",
+)
+@cfg_option
+def conflicts(mods_paths, records, plugin_records, cfg_path):
+    """Write one record per file that is provided by more than one data dir.
+    The last data dir listed for a file is the one OpenMW will use.
+
+    With --plugins, write one record per game record edited by more than one
+    plugin, in load order. The last plugin listed is the one that wins."""
+    with RecordWriter() as writer:
+        if records is not None:
+            data_dirs = data_dirs_from_records(read_records(records))
+        else:
+            data_dirs = scan_data_dirs(mods_paths or settings.core.mods_path, writer)
+
+        if plugin_records:
+            content_names = read_content_order(cfg_path) if cfg_path.exists() else []
+            cache = ScanCache(settings.core.cache_path)
+
+            load_order = get_plugin_load_order(data_dirs, content_names)
+            for conflict in find_record_conflicts(load_order, cache=cache):
+                writer.write(conflict.to_record())
+
+            cache.save()
+            return
+
+        for data_key, providers in sorted(find_file_conflicts(data_dirs).items()):
+            writer.write(
+                {
+                    "file": data_key,
+                    "providers": [str(data_dir.path) for data_dir in providers],
+                    "winner": str(providers[-1].path),
+                }
+            )
+
+
+@cli.command()
+@existing_cfg_option
+@click.pass_context
+def validate(ctx, cfg_path):
+    """Check the data= and content= entries of openmw.cfg, writing one record
+    per problem - missing or repeated data dirs, and plugins that are
+    missing, repeated or shadowed by a copy in a later data dir. Exits with
+    status 1 if any problems are found."""
+    issues = validate_cfg_lines(read_cfg_lines(cfg_path), base_path=cfg_path.parent)
+
+    with RecordWriter() as writer:
+        for issue in issues:
+            writer.write(issue.to_record())
+
+    if issues:
+        ctx.exit(1)
+
+
+@cli.command()
+@click.argument("records", type=click.File("r"))
+@mods_path_option
+@existing_cfg_option
+@click.option("--dry-run", is_flag=True, help="Only write out the data= entries.")
+def apply(records, mods_paths, cfg_path, dry_run):
+    """Replace the data= entries in openmw.cfg that are inside the mods folders
+    with the data dirs listed in RECORDS (output of 'scan', possibly
+    filtered), in the order given. Entries from anywhere else (i.e.
+    Morrowind's Data Files) are kept, ahead of the mods. Writes one record
+    per data= entry the config ends up with."""
+    mod_records = list(read_records(records))
+    data_paths = replace_mod_data_paths(
+        read_data_paths(cfg_path),
+        get_record_data_paths(mod_records),
+        get_mods_roots(mods_paths, mod_records),
+    )
+
+    with RecordWriter() as writer:
+        if not dry_run:
+            write_data_dirs(cfg_path, data_paths)
+
+        for data_path in data_paths:
+            writer.write({"data": str(data_path), "cfg": str(cfg_path)})
+
+
+@cli.command()
+@click.argument("records", type=click.File("r"))
+@click.option(
+    "--overlay",
+    "overlay_path",
+    required=True,
+    type=click.Path(file_okay=False, path_type=Path),
+    help="Directory to build the merged overlay in (new or empty the first time).",
+)
+@click.option(
+    "--base-data",
+    "base_data_paths",
+    multiple=True,
+    type=click.Path(exists=True, file_okay=False, path_type=Path),
+    help="data= entries to put ahead of the overlay, in place of the config's "
+    "own entries from outside the mods folders.",
+)
+@mods_path_option
+@cfg_option
+@click.option("--no-cfg", is_flag=True, help="Build the overlay only.")
+def deploy(records, overlay_path, base_data_paths, mods_paths, cfg_path, no_cfg):
+    """Link the winning file of every data dir listed in RECORDS (output of
+    'scan', in load order) into one overlay directory, and point openmw.cfg
+    at it. Redeploying only touches links whose winner changed.
+
+    The config's data= entries inside the mods folders are replaced by the
+    overlay, and the rest (i.e. Morrowind's Data Files) are kept ahead of
+    it, unless --base-data is given."""
+    if not no_cfg and not cfg_path.exists():
+        raise click.BadParameter(f"{cfg_path} does not exist.", param_hint="'--cfg'")
+
+    mod_records = list(read_records(records))
+    data_dirs = data_dirs_from_records(mod_records)
+
+    with RecordWriter() as writer:
+        try:
+            result = deploy_overlay(data_dirs, overlay_path)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="'--overlay'")
+
+        if not no_cfg:
+            if base_data_paths:
+                data_paths = [*base_data_paths, overlay_path]
+            else:
+                # an overlay from an earlier deploy is replaced, like the mods
+                mods_roots = get_mods_roots(mods_paths, mod_records) + [overlay_path]
+                data_paths = replace_mod_data_paths(
+                    read_data_paths(cfg_path), [overlay_path], mods_roots
+                )
+            write_data_dirs(cfg_path, data_paths)
+
+        writer.write({"overlay": str(overlay_path), **result.to_record()})
+
+
+@cli.command()
+@mods_path_option
+@click.argument("out", type=click.Path(dir_okay=False, path_type=Path))
+def snapshot(mods_paths, out):
+    """Save a snapshot of the mods folders to OUT, to diff against later"""
+    with RecordWriter() as writer:
+        mods_snapshot = take_snapshot(
+            get_mods(mods_paths or settings.core.mods_path, writer)
+        )
+        save_snapshot(mods_snapshot, out)
+        writer.write(
+            {
+                "snapshot": str(out),
+                "digest": mods_snapshot["digest"],
+                "mods": len(mods_snapshot["mods"]),
+            }
+        )
+
+
+@cli.command()
+@mods_path_option
+@click.argument("old", type=click.Path(exists=True, dir_okay=False, path_type=Path))
+@click.argument(
+    "new", required=False, type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+def diff(mods_paths, old, new):
+    """Write one record per change between snapshot OLD and snapshot NEW (or
+    the mods folders as they are now): added and removed mods, version
+    changes, and added or removed plugins (ESP/ESM/OMWADDON) and BSAs"""
+    with RecordWriter() as writer:
+        if new is not None:
+            new_snapshot = load_snapshot(new)
+        else:
+            new_snapshot = take_snapshot(
+                get_mods(mods_paths or settings.core.mods_path, writer)
+            )
+
+        for record in diff_snapshots(load_snapshot(old), new_snapshot).to_records():
+            writer.write(record)
+
+
+@cli.command()
+@mods_path_option
+@click.option(
+    "--largest", default=5, show_default=True, help="Biggest textures to list per mod."
+)
+def assets(mods_paths, largest):
+    """Write one record per mod with its texture and mesh counts, estimated
+    texture VRAM and biggest textures, broken down by data dir. Only file
+    headers are read, and unchanged files are taken from the scan cache."""
+    cache = ScanCache(settings.core.cache_path)
+
+    with RecordWriter() as writer:
+        for mod in get_mods(mods_paths or settings.core.mods_path, writer):
+            mod_report, data_dir_reports = inspect_mod(mod, cache, largest)
+            record = mod_report.to_record()
+            record["data_dirs"] = [report.to_record() for report in data_dir_reports]
+            writer.write(record)
+
+    cache.save()
+
+
+@cli.command()
+@mods_path_option
+@click.argument("query")
+@click.option("--limit", default=20, show_default=True, help="Most results to write.")
+@click.option(
+    "--kind",
+    "kinds",
+    multiple=True,
+    type=click.Choice(list(KIND_RANKS)),
+    help="Only search these (can be repeated). Defaults to everything.",
+)
+def search(mods_paths, query, limit, kinds):
+    """Search mod titles, variants, plugin names and data-relative file paths,
+    writing one record per match, best match first. Substring matches come
+    before close (fuzzy) ones."""
+    mods_folder = ModsFolder(list(mods_paths or settings.core.mods_path), scan=False)
+
+    with RecordWriter() as writer:
+        # each root's mod trees are walked on its own thread, and every mod
+        # goes into the folder's search index as it arrives
+        for _ in iter_folder_mods(
+            mods_folder, writer, with_data_dirs=True, ordered=False
+        ):
+            pass
+
+        for result in mods_folder.search_index.search(query, limit, kinds or None):
+            writer.write(result.to_record())
+
+
+@cli.command(name="import-ini")
+@click.argument(
+    "ini_path", type=click.Path(exists=True, dir_okay=False, path_type=Path)
+)
+@existing_cfg_option
+@click.option("--dry-run", is_flag=True, help="Only write out the changes.")
+def import_ini(ini_path, cfg_path, dry_run):
+    """Import the fallback values of a Morrowind.ini into openmw.cfg. Only
+    values that are new or different are written, one record per change,
+    and the rest of the config is left as it is."""
+    fallbacks = read_ini_fallbacks(ini_path)
+    cfg_lines, changes = merge_fallbacks(read_cfg_lines(cfg_path), fallbacks)
+
+    with RecordWriter() as writer:
+        for change in changes:
+            writer.write(change.to_record())
+
+    if changes and not dry_run:
+        write_cfg_lines(cfg_path, cfg_lines)
+
+
+def profile_record(profile: Profile) -> Dict:
+    # no "stale" - checking walks every data dir, see refresh --check
+    return {
+        "profile": profile.name,
+        "data_dirs": len(profile.data_paths),
+        "content": len(profile.content),
+        "fallbacks": len(profile.fallbacks),
+        "conflicts": len(profile.conflicts or {}),
+    }
+
+
+def check_profile_name(ctx, param, name: str) -> str:
+    try:
+        return validate_profile_name(name)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+profile_name_argument = click.argument("name", callback=check_profile_name)
+
+
+def parse_fallback_overrides(ctx, param, fallbacks: Iterable[str]) -> Dict[str, str]:
+    overrides = {}
+    for fallback in fallbacks:
+        name, comma, value = fallback.partition(",")
+        if not comma or not name.strip():
+            raise click.BadParameter(f"expected NAME,VALUE, got {fallback!r}")
+        overrides[name.strip()] = value
+    return overrides
+
+
+@cli.group()
+def profile():
+    """Named load order profiles that can be switched between instantly"""
+
+
+@profile.command(name="list")
+def list_profiles():
+    """List the saved profiles"""
+    store = ProfileStore(settings.core.profiles_path)
+    with RecordWriter() as writer:
+        for name in store.list_names():
+            writer.write(profile_record(store.load(name)))
+
+
+@profile.command(name="save")
+@profile_name_argument
+@mods_path_option
+@existing_cfg_option
+@click.option(
+    "--records",
+    type=click.File("r"),
+    help="Take the mods' data dirs from the output of 'scan' instead of openmw.cfg.",
+)
+@click.option(
+    "--fallback",
+    "fallbacks",
+    multiple=True,
+    callback=parse_fallback_overrides,
+    help="fallback override, as NAME,VALUE (can be repeated).",
+)
+def save_profile(name, mods_paths, cfg_path, records, fallbacks):
+    """Save the current data= and content= entries of openmw.cfg as profile
+    NAME, working out its config lines and file conflicts up front.
+
+    With --records, the data= entries inside the mods folders are swapped for
+    the data dirs listed, and the rest (i.e. Morrowind's Data Files) are kept
+    ahead of them."""
+    new_profile = Profile.from_cfg(name, cfg_path)
+    if records is not None:
+        mod_records = list(read_records(records))
+        new_profile.data_paths = replace_mod_data_paths(
+            new_profile.data_paths,
+            get_record_data_paths(mod_records),
+            get_mods_roots(mods_paths, mod_records),
+        )
+    new_profile.fallbacks = fallbacks
+
+    ProfileStore(settings.core.profiles_path).save(new_profile)
+    with RecordWriter() as writer:
+        writer.write(profile_record(new_profile))
+
+
+@profile.command(name="switch")
+@profile_name_argument
+@existing_cfg_option
+def switch_profile(name, cfg_path):
+    """Swap profile NAME's precomputed lines into openmw.cfg"""
+    switched = ProfileStore(settings.core.profiles_path).switch(name, cfg_path)
+    with RecordWriter() as writer:
+        writer.write({**profile_record(switched), "cfg": str(cfg_path)})
+
+
+@profile.command(name="refresh")
+@profile_name_argument
+@click.option(
+    "--check",
+    is_flag=True,
+    help="Only report whether the data dirs have changed, without recompiling.",
+)
+def refresh_profile(name, check):
+    """Work out profile NAME's conflicts again if its data dirs have changed.
+    Either way, every data dir of the profile is walked to find out."""
+    store = ProfileStore(settings.core.profiles_path)
+    with RecordWriter() as writer:
+        if check:
+            checked = store.load(name)
+            writer.write({**profile_record(checked), "stale": checked.is_stale})
+        else:
+            writer.write(profile_record(store.refresh(name)))
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,11 +1,36 @@
-from typing import List
+from contextlib import closing
+from typing import Callable, List, Set
 
 import edifice as ed
-from app.mod_resources import Mod, ModDir, ModsFolder
+from edifice.qt import QtCore
+from app.auto_datafiles import read_data_paths, write_data_dirs
+from app.jobs import Job, JobScheduler
+from app.mod_resources import Mod, ModDataDir, ModsFolder
 from app.app_settings import AppSettings
+from app.profiles import replace_mod_data_paths
+from app.ui.virtual_list import get_row_key, get_visible_window
 
 settings = AppSettings()
 
+# number of mod rows that get widgets built at any one time
+VISIBLE_ROWS = 30
+
+# number of scanned mods handed to the UI at a time
+SCAN_BATCH_SIZE = 60
+
+# most search results looked at when filtering the mod list
+SEARCH_LIMIT = 500
+
+# how often finished background work is picked up by the UI thread - kept
+# well below the 50ms it takes for input lag to be noticeable
+EVENT_POLL_INTERVAL_MS = 16
+
+STYLES = {
+    "toggle_button": {"width": 24},
+    "data_dir": {"margin-left": 28},
+    "data_dir_item": {"margin-left": 44},
+}
+
 
 class ModWidget(ed.Component):
     @ed.register_props
@@ -14,31 +39,405 @@ class ModWidget(ed.Component):
         self.name = mod.name
 
 
+class DataDirWidget(ed.Component):
+    @ed.register_props
+    def __init__(self, data_dir: ModDataDir):
+        self.data_dir = data_dir
+
+    def render(self):
+        data_dir = self.data_dir
+        items = (
+            [f"ESP: {esp}" for esp in data_dir.esp_files]
+            + [f"BSA: {bsa}" for bsa in data_dir.bsa_files]
+            + [f"Resources: {resource}" for resource in data_dir.resource_dirs]
+        )
+
+        return ed.View(layout="column")(
+            ed.Label(data_dir.name, style=STYLES["data_dir"]),
+            *[ed.Label(item, style=STYLES["data_dir_item"]) for item in items],
+        )
+
+
 class FolderWidget(ed.Component):
+    """A single row of the mod list. The mod's data dirs are only
+    searched for once the row is expanded, by a background job - until it
+    finishes the row shows as loading."""
+
     @ed.register_props
-    def __init__(self, mod_dir: ModDir):
-        self.mod_dir = ModDir
-        self.name = mod_dir.name
-        self.path = mod_dir.path
+    def __init__(
+        self,
+        mod: Mod,
+        expanded: bool = False,
+        loading: bool = False,
+        on_toggle: Callable = None,
+        on_activate: Callable = None,
+    ):
+        self.mod = mod
+        self.name = mod.name
+        self.path = mod.path
+
+    def toggle(self, _event=None):
+        if self.props.on_toggle is not None:
+            self.props.on_toggle(self.mod)
+
+    def activate(self, checked: bool):
+        if self.props.on_activate is not None:
+            self.props.on_activate(self.mod, checked)
 
     def render(self):
-        return ed.View(layout="row")(ed.Label(self.name))
+        row = ed.View(layout="row")(
+            ed.Button(
+                "-" if self.props.expanded else "+",
+                style=STYLES["toggle_button"],
+                on_click=self.toggle,
+            ),
+            ed.CheckBox(checked=self.mod.to_activate, on_change=self.activate),
+            ed.Label(self.name),
+        )
+
+        if not self.props.expanded:
+            return row
+
+        if self.props.loading or self.mod.data_dirs is None:
+            return ed.View(layout="column")(
+                row, ed.Label("loading...", style=STYLES["data_dir"])
+            )
+
+        return ed.View(layout="column")(
+            row,
+            *[
+                DataDirWidget(data_dir).set_key(str(data_dir.path))
+                for data_dir in self.mod.data_dirs or []
+            ],
+        )
+
+
+class VirtualModList(ed.Component):
+    """Mod list which only builds widgets for the rows in view, so render
+    cost depends on the viewport rather than the size of the collection"""
+
+    @ed.register_props
+    def __init__(
+        self,
+        mods: List[Mod],
+        loading: Set[str] = frozenset(),
+        num_rows: int = VISIBLE_ROWS,
+        on_need_more: Callable = None,
+        on_expand: Callable = None,
+        on_activate: Callable = None,
+    ):
+        super().__init__()
+        self.offset = 0
+        # row keys (mod paths) of the expanded rows
+        self.expanded: Set[str] = set()
+
+    def max_offset(self) -> int:
+        return max(0, len(self.props.mods) - self.props.num_rows)
+
+    def scroll_to(self, offset: int):
+        offset = max(0, min(int(offset), self.max_offset()))
+        self.set_state(offset=offset)
+
+        # ask for more mods before the user reaches the end of what is loaded
+        if (
+            self.props.on_need_more is not None
+            and offset + 2 * self.props.num_rows >= len(self.props.mods)
+        ):
+            self.props.on_need_more()
+
+    def scroll_by(self, num_rows: int):
+        self.scroll_to(self.offset + num_rows)
+
+    def is_expanded(self, mod: Mod) -> bool:
+        # rows expanded before a rescan stay closed until their new mod's
+        # data dirs are asked for again
+        key = get_row_key(mod)
+        return key in self.expanded and (
+            mod.data_dirs is not None or key in self.props.loading
+        )
+
+    def on_toggle(self, mod: Mod):
+        key = get_row_key(mod)
+        if self.is_expanded(mod):
+            self.set_state(expanded=self.expanded - {key})
+            return
+
+        self.set_state(expanded=self.expanded | {key})
+        if mod.data_dirs is None and self.props.on_expand is not None:
+            self.props.on_expand(mod)
+
+    def render(self):
+        mods = self.props.mods
+        window = get_visible_window(self.offset, self.props.num_rows, len(mods))
+
+        rows = []
+        for idx in window:
+            key = get_row_key(mods[idx])
+            rows.append(
+                FolderWidget(
+                    mods[idx],
+                    expanded=self.is_expanded(mods[idx]),
+                    loading=key in self.props.loading,
+                    on_toggle=self.on_toggle,
+                    on_activate=self.props.on_activate,
+                ).set_key(key)
+            )
+
+        return ed.View(layout="row")(
+            ed.View(layout="column")(*rows),
+            ed.View(layout="column")(
+                ed.Button("▲", on_click=lambda _: self.scroll_by(-self.props.num_rows)),
+                ed.Slider(
+                    self.max_offset() - self.offset,
+                    min_value=0,
+                    max_value=self.max_offset(),
+                    dtype=int,
+                    orientation="vertical",
+                    on_change=lambda value: self.scroll_to(self.max_offset() - value),
+                ),
+                ed.Button("▼", on_click=lambda _: self.scroll_by(self.props.num_rows)),
+            ),
+        )
+
+
+def scan_mods(job: Job, mods_folder: ModsFolder, batch_size: int = SCAN_BATCH_SIZE):
+    """Background job - finds the mods in every root (each root on its own
+    thread), posting them back to the UI in batches. Only the mod folders
+    are read here - a mod's contents are scanned when its row is expanded.
+    Mods are added to the folder's index and search index as they are found."""
+    # mods_folder.mods fills up as the scan goes, so jobs queued after this
+    # one see everything it found, even if it is cancelled
+    mods = mods_folder.mods = []
+    batch = []
+    for mod in mods_folder.iter_mods():
+        job.check_cancelled()
+
+        batch.append(mod)
+        if len(batch) >= batch_size:
+            mods.extend(batch)
+            job.report_progress(len(mods), partial=batch)
+            batch = []
+
+    mods.extend(batch)
+    job.report_progress(len(mods), partial=batch)
+    return mods
+
+
+def load_data_dirs(job: Job, mods_folder: ModsFolder, mod: Mod) -> Mod:
+    """Background job - finds a mod's data dirs and their contents, so its
+    expanded row can be drawn without touching the disk. The scan only
+    indexed the mod's title, so its plugins and files are indexed here."""
+    for data_dir in mod.get_data_dirs() or []:
+        job.check_cancelled()
+        data_dir.esp_files, data_dir.bsa_files, data_dir.resource_dirs
+    mods_folder.search_index.update_mod(mod)
+    return mod
+
+
+def index_mods(job: Job, mods_folder: ModsFolder) -> int:
+    """Background job - queued after the scan, which only reads mod folders.
+    Walks every mod's tree on the root threads and indexes its plugins and
+    files, so searches find them in every mod rather than only in the rows
+    that have been expanded. Returns the number of mods indexed."""
+    mods = list(mods_folder.mods)
+    num_indexed = 0
+    # a mod that can't be walked keeps its title in the index, and reports
+    # its error if its row is expanded. Closed explicitly, so a cancelled
+    # job has stopped its walks by the time jobs queued after it start.
+    walked = mods_folder.walk_trees(mods, on_error=lambda mod_path, e: None)
+    with closing(walked):
+        for mod in walked:
+            job.check_cancelled()
+            mods_folder.search_index.update_mod(mod)
+            num_indexed += 1
+            job.report_progress(num_indexed, len(mods))
+    return num_indexed
+
+
+def write_active_data_dirs(job: Job, mods_folder: ModsFolder):
+    """Background job - writes the data dirs of the active mods to openmw.cfg,
+    in place of the data= entries inside the mods folders. Entries from
+    anywhere else (i.e. Morrowind's Data Files) are kept. Queued after the
+    scan, so it never reads mods the scan is still adding."""
+    data_paths = []
+    for mod in mods_folder.mods:
+        job.check_cancelled()
+        if not mod.to_activate:
+            continue
+
+        if mod.data_dirs is None:
+            mod.get_data_dirs()
+        data_paths.extend(data_dir.path for data_dir in mod.data_dirs or [])
+
+    cfg_path = settings.core.open_mw_conf_path
+    write_data_dirs(
+        cfg_path,
+        replace_mod_data_paths(
+            read_data_paths(cfg_path), data_paths, mods_folder.roots
+        ),
+    )
+    return len(data_paths)
 
 
 class MWModHelper(ed.Component):
     def __init__(self, **kwargs):
         super(MWModHelper, self).__init__(**kwargs)
 
-        self.parent_mod_dirs = self.get_parent_mod_dirs()
-        self.parent_mod_widgets = [
-            FolderWidget(mod_dir) for mod_dir in self.parent_mod_dirs
-        ]
+        self.mods_folder = ModsFolder(settings.core.mods_path, scan=False)
+        self.scheduler = JobScheduler()
+
+        self.parent_mod_dirs: List[Mod] = []
+        # row keys of mods whose data dirs are being loaded
+        self.loading_rows: Set[str] = set()
+        self.scan_job: Job = None
+        self.index_job: Job = None
+        self.status = ""
+        self.search_text = ""
+
+    def did_mount(self):
+        # background jobs post their results to the scheduler, which is
+        # drained here on the UI thread
+        self._event_timer = QtCore.QTimer()
+        self._event_timer.timeout.connect(self.scheduler.process_events)
+        self._event_timer.start(EVENT_POLL_INTERVAL_MS)
+
+        self.rescan()
+
+    def will_unmount(self):
+        self._event_timer.stop()
+        self.scheduler.shutdown()
+
+    def rescan(self, _event=None):
+        # the new scan resets the folder's indexes, so it waits for the old
+        # scan and indexing to stop - otherwise they could still add to them
+        old_job = self.index_job or self.scan_job
+        self.cancel_jobs()
+
+        self.set_state(parent_mod_dirs=[], status="scanning...")
+        self.scan_job = self.scheduler.submit(
+            scan_mods,
+            (self.mods_folder,),
+            name="scan",
+            on_progress=self.on_scan_progress,
+            on_result=self.on_scan_done,
+            on_error=self.on_job_error,
+            after=old_job,
+        )
+        self.index_job = self.scheduler.submit(
+            index_mods,
+            (self.mods_folder,),
+            name="index",
+            on_result=self.on_index_done,
+            on_error=self.on_job_error,
+            after=self.scan_job,
+        )
+
+    def cancel_jobs(self):
+        for job in [self.scan_job, self.index_job]:
+            if job is not None:
+                job.cancel()
+
+    def cancel_scan(self, _event=None):
+        if self.scan_job is not None:
+            self.cancel_jobs()
+            self.set_state(status=f"scan cancelled: {self.scan_progress_text()}")
+
+    def scan_progress_text(self) -> str:
+        # roots are scanned as they are listed, so there's no total up front
+        return f"{self.scan_job.done_count} mods"
+
+    def on_scan_progress(self, job: Job, batch: List[Mod]):
+        if job is not self.scan_job or job.cancelled:
+            return
+
+        self.set_state(
+            parent_mod_dirs=self.parent_mod_dirs + batch,
+            status=f"scanning... {self.scan_progress_text()}",
+        )
+
+    def on_scan_done(self, mods: List[Mod]):
+        self.set_state(status=f"{len(mods)} mods, indexing their files...")
+
+    def on_index_done(self, num_indexed: int):
+        self.set_state(
+            status=f"{len(self.parent_mod_dirs)} mods, {num_indexed} with files indexed"
+        )
+
+    def on_search(self, text: str):
+        self.set_state(search_text=text)
+
+    def get_shown_mods(self) -> List[Mod]:
+        """Mods matching the search text, best match first"""
+        if not self.search_text.strip():
+            return self.parent_mod_dirs
+
+        mods_by_path = {str(mod.path): mod for mod in self.parent_mod_dirs}
+        results = self.mods_folder.search_index.search(self.search_text, SEARCH_LIMIT)
+
+        shown = {}
+        for result in results:
+            mod = mods_by_path.get(result.mod_path)
+            if mod is not None:
+                shown.setdefault(result.mod_path, mod)
+        return list(shown.values())
+
+    def on_expand(self, mod: Mod):
+        key = get_row_key(mod)
+        if key in self.loading_rows:
+            return
+
+        self.set_state(loading_rows=self.loading_rows | {key})
+        self.scheduler.submit(
+            load_data_dirs,
+            (self.mods_folder, mod),
+            name=f"load {mod.name}",
+            on_result=self.on_data_dirs_loaded,
+            on_error=self.on_load_error,
+        )
+
+    def on_data_dirs_loaded(self, mod: Mod):
+        self.set_state(loading_rows=self.loading_rows - {get_row_key(mod)})
+
+    def on_load_error(self, job: Job, error: Exception):
+        _, mod = job.args
+        self.set_state(loading_rows=self.loading_rows - {get_row_key(mod)})
+        self.on_job_error(job, error)
+
+    def on_activate(self, mod: Mod, checked: bool):
+        mod.to_activate = checked
+
+    def save_config(self, _event=None):
+        self.set_state(status="writing openmw.cfg...")
+        self.scheduler.submit(
+            write_active_data_dirs,
+            (self.mods_folder,),
+            name="write config",
+            on_result=lambda num_dirs: self.set_state(
+                status=f"wrote {num_dirs} data dirs to openmw.cfg"
+            ),
+            on_error=self.on_job_error,
+            after=self.scan_job,
+        )
 
-    def get_parent_mod_dirs(self) -> List[Mod]:
-        return [Mod(d) for d in settings.core.mods_path.iterdir() if d.is_dir()]
+    def on_job_error(self, job: Job, error: Exception):
+        self.set_state(status=f"{job.name} failed: {error}")
 
     def render(self):
-        return ed.View(layout="column")(*self.parent_mod_widgets)
+        return ed.View(layout="column")(
+            ed.View(layout="row")(
+                ed.Button("Rescan", on_click=self.rescan),
+                ed.Button("Cancel", on_click=self.cancel_scan),
+                ed.Button("Write openmw.cfg", on_click=self.save_config),
+            ),
+            ed.TextInput(self.search_text, on_change=self.on_search),
+            VirtualModList(
+                self.get_shown_mods(),
+                loading=frozenset(self.loading_rows),
+                on_expand=self.on_expand,
+                on_activate=self.on_activate,
+            ),
+            ed.Label(self.status),
+        )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,14 @@
+from app.mod_resources import Mod
+
+
+def get_visible_window(offset: int, num_rows: int, num_items: int) -> range:
+    """Returns the range of item indexes that should be rendered for a
+    viewport of num_rows starting at offset"""
+    start = max(0, min(offset, num_items - num_rows))
+    return range(start, min(start + num_rows, num_items))
+
+
+def get_row_key(mod: Mod) -> str:
+    """Key for a mod's row - mods under different roots can share a folder
+    name, so rows are keyed by path"""
+    return str(mod.path)
@@ -0,0 +1,99 @@
+# Times overlay deploys over a synthetic collection. Run from the repo root:
+#   python -m benchmarks.bench_overlay [--files 400000] [--data-dirs 400]
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from app.mod_resources import ModDataDir, mod_resource_factory
+from app.overlay import deploy_overlay
+
+RESOURCE_DIRS = ["textures", "meshes", "icons", "sound", "bookart"]
+
+
+def make_collection(root: Path, num_files: int, num_data_dirs: int, overlap: float):
+    """Creates num_data_dirs data dirs holding num_files empty files between
+    them. Roughly 'overlap' of each data dir's files also exist in an
+    earlier data dir, so they override it."""
+    files_per_dir = num_files // num_data_dirs
+    num_shared = int(files_per_dir * overlap)
+
+    data_dir_paths = []
+    created_dirs = set()
+    for dir_idx in range(num_data_dirs):
+        data_dir = root / f"mod_{dir_idx:04}"
+        data_dir_paths.append(data_dir)
+
+        for file_idx in range(files_per_dir):
+            # the first num_shared files use names shared by every data dir
+            owner = "shared" if file_idx < num_shared else f"m{dir_idx}"
+            resource_dir = RESOURCE_DIRS[file_idx % len(RESOURCE_DIRS)]
+            file_dir = data_dir / resource_dir / owner / f"{file_idx // 500:03}"
+            if file_dir not in created_dirs:
+                file_dir.mkdir(parents=True, exist_ok=True)
+                created_dirs.add(file_dir)
+
+            os.close(os.open(file_dir / f"f{file_idx}.dds", os.O_CREAT | os.O_WRONLY))
+
+    return data_dir_paths
+
+
+def load_data_dirs(paths):
+    data_dirs = [
+        ModDataDir(path, parent=None, child_factory=mod_resource_factory)
+        for path in paths
+    ]
+
+    # children are scanned lazily - walk them now so deploys are timed alone
+    for data_dir in data_dirs:
+        for _ in data_dir.iter_files():
+            pass
+
+    return data_dirs
+
+
+def timed(label: str, fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    print(f"{label:<32} {time.perf_counter() - start:8.2f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time overlay deploys")
+    parser.add_argument("--files", type=int, default=400_000)
+    parser.add_argument("--data-dirs", type=int, default=400)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = timed(
+            f"create {args.files} files",
+            make_collection,
+            root / "mods",
+            args.files,
+            args.data_dirs,
+            args.overlap,
+        )
+        overlay = root / "overlay"
+
+        data_dirs = timed("scan data dirs", load_data_dirs, paths)
+        result = timed("full deploy", deploy_overlay, data_dirs, overlay)
+        print(f"  {result}")
+
+        result = timed("redeploy, nothing changed", deploy_overlay, data_dirs, overlay)
+        print(f"  {result}")
+
+        # move a handful of data dirs to the end of the load order
+        reordered = data_dirs[5:] + data_dirs[:5]
+        result = timed(
+            "redeploy, 5 data dirs moved", deploy_overlay, reordered, overlay
+        )
+        print(f"  {result}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+from pathlib import Path
+
+
+def make_file(path: Path, contents: str | bytes = ""):
+    """Writes a file, along with any folders above it that are missing"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if isinstance(contents, bytes):
+        path.write_bytes(contents)
+    else:
+        path.write_text(contents)
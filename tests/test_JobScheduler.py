@@ -0,0 +1,111 @@
+import threading
+import time
+
+import pytest
+
+from app.jobs import Job, JobScheduler
+
+
+def wait_for_events(scheduler: JobScheduler, condition, timeout: float = 2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline, "timed out waiting for job"
+        scheduler.process_events()
+        time.sleep(0.001)
+
+
+@pytest.fixture(scope="function")
+def scheduler() -> JobScheduler:
+    scheduler = JobScheduler(num_workers=1)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_results_are_posted_to_calling_thread(scheduler: JobScheduler):
+    results = []
+
+    def work(job: Job, x: int, scale: int = 1):
+        return (x * scale, threading.current_thread())
+
+    scheduler.submit(work, (21,), {"scale": 2}, on_result=results.append)
+    wait_for_events(scheduler, lambda: results)
+
+    value, worker_thread = results[0]
+    assert value == 42
+    assert worker_thread is not threading.current_thread()
+
+
+def test_progress_reports_partial_results(scheduler: JobScheduler):
+    batches = []
+
+    def work(job: Job):
+        for i in range(3):
+            job.report_progress(i + 1, 3, partial=[i])
+        return "done"
+
+    results = []
+    scheduler.submit(
+        work,
+        on_progress=lambda job, batch: batches.append(batch),
+        on_result=results.append,
+    )
+    wait_for_events(scheduler, lambda: results)
+
+    assert batches == [[0], [1], [2]]
+
+
+def test_cancelled_job_stops_without_result(scheduler: JobScheduler):
+    started = threading.Event()
+    results = []
+
+    def work(job: Job):
+        started.set()
+        while True:
+            job.check_cancelled()
+            time.sleep(0.001)
+
+    job = scheduler.submit(work, on_result=results.append)
+    started.wait(timeout=2.0)
+    job.cancel()
+    wait_for_events(scheduler, lambda: job.is_finished)
+
+    assert results == []
+
+
+def test_errors_are_posted_to_on_error(scheduler: JobScheduler):
+    errors = []
+
+    def work(job: Job):
+        raise ValueError("bad mod folder")
+
+    scheduler.submit(work, on_error=lambda job, e: errors.append(e))
+    wait_for_events(scheduler, lambda: errors)
+
+    assert isinstance(errors[0], ValueError)
+
+
+def test_job_waits_for_the_job_it_is_submitted_after():
+    # two workers, so only the dependency keeps the jobs in order
+    scheduler = JobScheduler(num_workers=2)
+    release = threading.Event()
+    order = []
+
+    def scan(job: Job):
+        release.wait(timeout=2.0)
+        order.append("scan")
+
+    def write(job: Job):
+        order.append("write")
+        return order
+
+    results = []
+    scan_job = scheduler.submit(scan)
+    scheduler.submit(write, after=scan_job, on_result=results.append)
+    time.sleep(0.05)
+    assert order == []
+
+    release.set()
+    wait_for_events(scheduler, lambda: results)
+    scheduler.shutdown()
+
+    assert order == ["scan", "write"]
@@ -0,0 +1,76 @@
+import struct
+from pathlib import Path
+
+from app.asset_inspector import inspect_mod, read_dds_header, read_nif_header
+from app.mod_resources import ModsFolder
+from app.scan_cache import ScanCache
+
+DDSD_MIPMAPCOUNT = 0x20000
+DDPF_FOURCC = 0x4
+
+
+def dds_header(width: int, height: int, mipmaps: int, four_cc: bytes) -> bytes:
+    header = bytearray(128)
+    header[0:4] = b"DDS "
+    struct.pack_into("<II", header, 4, 124, DDSD_MIPMAPCOUNT)
+    struct.pack_into("<5I", header, 12, height, width, 0, 0, mipmaps)
+    struct.pack_into("<II4sI", header, 76, 32, DDPF_FOURCC, four_cc, 0)
+    return bytes(header)
+
+
+def nif_header(num_blocks: int) -> bytes:
+    return b"NetImmerse File Format, Version 4.0.0.2\n" + struct.pack(
+        "<II", 0x04000002, num_blocks
+    )
+
+
+def test_dds_header():
+    info = read_dds_header(dds_header(1024, 512, 1, b"DXT1"))
+
+    assert (info["width"], info["height"], info["format"]) == (1024, 512, "DXT1")
+    # DXT1 is half a byte per pixel
+    assert info["vram"] == 1024 * 512 // 2
+
+
+def test_dds_mipmaps_add_a_third():
+    info = read_dds_header(dds_header(256, 256, 9, b"DXT5"))
+
+    assert info["mipmaps"] == 9
+    assert info["vram"] == sum(max(1, (256 >> i) // 4) ** 2 * 16 for i in range(9))
+
+
+def test_nif_header():
+    info = read_nif_header(nif_header(12))
+
+    assert info["version"] == "4.0.0.2"
+    assert info["num_blocks"] == 12
+
+
+def test_inspect_mod(tmp_path: Path, monkeypatch):
+    data_dir = tmp_path / "mods" / "Better Bodies_v2" / "Data Files"
+    (data_dir / "Textures").mkdir(parents=True)
+    (data_dir / "Meshes").mkdir()
+    (data_dir / "Textures" / "big.dds").write_bytes(dds_header(2048, 2048, 1, b"DXT5"))
+    (data_dir / "Textures" / "small.dds").write_bytes(dds_header(64, 64, 1, b"DXT1"))
+    (data_dir / "Textures" / "broken.dds").write_bytes(b"not a dds")
+    (data_dir / "Meshes" / "body.nif").write_bytes(nif_header(3))
+
+    (mod,) = ModsFolder(tmp_path / "mods").mods
+    cache = ScanCache()
+    mod_report, (data_dir_report,) = inspect_mod(mod, cache, num_largest=1)
+
+    assert mod_report.num_textures == 2
+    assert mod_report.num_meshes == 1
+    assert mod_report.num_invalid == 1
+    assert mod_report.texture_vram == 2048 * 2048 + 64 * 64 // 2
+    assert [t[-1] for t in mod_report.largest_textures] == ["textures/big.dds"]
+    assert data_dir_report.name == "Data Files"
+
+    # a second pass is served from the cache, without reading or even
+    # stat'ing any files - the scan's sizes and modified times are used
+    def fail(path, *args, **kwargs):
+        raise AssertionError(f"{path} was read again")
+
+    monkeypatch.setattr("app.asset_inspector.inspect_file", fail)
+    monkeypatch.setattr("os.stat", fail)
+    assert inspect_mod(mod, cache)[0].texture_vram == mod_report.texture_vram
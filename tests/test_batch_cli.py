@@ -0,0 +1,186 @@
+import io
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from app.ui.batch_cli import RecordWriter, cli, read_records
+
+from conftest import make_file
+
+
+def make_mods(root: Path):
+    make_file(root / "ModB_v1" / "Textures" / "tx_a.dds")
+    make_file(root / "ModA_v1" / "01 Options" / "textures" / "TX_A.dds")
+    make_file(root / "ModA_v1" / "00 Core" / "ModA.esp")
+    # no version in the name, so it can't be read as a mod
+    (root / "Unversioned").mkdir()
+
+
+def parse_output(output: str):
+    return list(read_records(io.StringIO(output)))
+
+
+def run(*args) -> str:
+    result = CliRunner().invoke(cli, [str(arg) for arg in args])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+
+def test_record_writer_batches_lines():
+    stream = io.StringIO()
+    with RecordWriter(stream, flush_every=2) as writer:
+        writer.write({"a": 1})
+        assert stream.getvalue() == ""
+        writer.write({"b": Path("x")})
+        assert stream.getvalue() == '{"a":1}\n{"b":"x"}\n'
+        writer.write({"c": None})
+
+    assert stream.getvalue().splitlines()[-1] == '{"c":null}'
+    assert parse_output(stream.getvalue() + "\n\n") == [
+        {"a": 1},
+        {"b": "x"},
+        {"c": None},
+    ]
+
+
+def test_scan_writes_mods_in_load_order(tmp_path: Path):
+    make_mods(tmp_path / "mods")
+
+    records = parse_output(run("scan", "--mods-path", tmp_path / "mods"))
+
+    # errors are written in load order too, as the scan reaches them
+    mod_a, mod_b, error = records
+    assert error == {
+        "path": str(tmp_path / "mods" / "Unversioned"),
+        "error": error["error"],
+    }
+    assert (mod_a["name"], mod_b["name"]) == ("ModA_v1", "ModB_v1")
+    assert [data_dir["name"] for data_dir in mod_a["data_dirs"]] == [
+        "00 Core",
+        "01 Options",
+    ]
+    assert mod_a["data_dirs"][0]["esps"] == ["ModA.esp"]
+
+
+def test_unreadable_folders_do_not_stop_the_run(tmp_path: Path):
+    make_mods(tmp_path / "mods")
+    (tmp_path / "mods" / "_").mkdir()
+
+    records = parse_output(run("list", "--mods-path", tmp_path / "mods"))
+
+    assert [record.get("name") for record in records] == [
+        "ModA_v1",
+        "ModB_v1",
+        None,
+        None,
+    ]
+    assert records[3]["path"] == str(tmp_path / "mods" / "_")
+
+
+def test_conflicts_from_scan_and_from_records(tmp_path: Path):
+    make_mods(tmp_path / "mods")
+    scan_output = run("scan", "--mods-path", tmp_path / "mods")
+
+    error, conflict = parse_output(run("conflicts", "--mods-path", tmp_path / "mods"))
+    assert error["path"] == str(tmp_path / "mods" / "Unversioned")
+    assert conflict == {
+        "file": "textures/tx_a.dds",
+        "providers": [
+            str(tmp_path / "mods" / "ModA_v1" / "01 Options"),
+            str(tmp_path / "mods" / "ModB_v1"),
+        ],
+        "winner": str(tmp_path / "mods" / "ModB_v1"),
+    }
+
+    records_path = tmp_path / "scan.ndjson"
+    records_path.write_text(scan_output)
+    assert parse_output(run("conflicts", "--records", records_path)) == [conflict]
+
+
+def test_apply_replaces_only_mod_data_lines(tmp_path: Path):
+    make_mods(tmp_path / "mods")
+    records_path = tmp_path / "scan.ndjson"
+    records_path.write_text(run("scan", "--mods-path", tmp_path / "mods"))
+
+    base = tmp_path / "Morrowind" / "Data Files"
+    cfg_path = tmp_path / "openmw.cfg"
+    cfg_path.write_text(
+        f'data="{base}"\n'
+        f'data="{tmp_path / "mods" / "Removed_v1"}"\n'
+        "content=Morrowind.esm\ncontent=ModA.esp\n"
+    )
+
+    dry_run = parse_output(run("apply", records_path, "--cfg", cfg_path, "--dry-run"))
+    assert len(dry_run) == 4
+    assert "Removed_v1" in cfg_path.read_text()
+
+    applied = parse_output(run("apply", records_path, "--cfg", cfg_path))
+    assert applied == dry_run
+    assert applied[0] == {"data": str(base), "cfg": str(cfg_path)}
+    # the base data dir stays, so Morrowind.esm can still be found
+    assert cfg_path.read_text().splitlines() == [
+        f'data="{base}"',
+        f'data="{tmp_path / "mods" / "ModA_v1" / "00 Core"}"',
+        f'data="{tmp_path / "mods" / "ModA_v1" / "01 Options"}"',
+        f'data="{tmp_path / "mods" / "ModB_v1"}"',
+        "content=Morrowind.esm",
+        "content=ModA.esp",
+    ]
+
+
+def test_deploy_keeps_data_lines_outside_the_mods(tmp_path: Path):
+    make_mods(tmp_path / "mods")
+    records_path = tmp_path / "scan.ndjson"
+    records_path.write_text(run("scan", "--mods-path", tmp_path / "mods"))
+
+    base = tmp_path / "Morrowind" / "Data Files"
+    overlay = tmp_path / "overlay"
+    cfg_path = tmp_path / "openmw.cfg"
+    cfg_path.write_text(
+        f'data="{base}"\ndata="{tmp_path / "mods" / "ModB_v1"}"\n'
+        "content=Morrowind.esm\n"
+    )
+
+    for _ in range(2):
+        (record,) = parse_output(
+            run("deploy", records_path, "--overlay", overlay, "--cfg", cfg_path)
+        )
+    assert record["unchanged"] == 2
+    assert cfg_path.read_text().splitlines() == [
+        f'data="{base}"',
+        f'data="{overlay}"',
+        "content=Morrowind.esm",
+    ]
+
+    # Data Files has files no deploy put there, so it is left alone
+    make_file(base / "Morrowind.esm")
+    result = CliRunner().invoke(
+        cli, ["deploy", str(records_path), "--overlay", str(base), "--no-cfg"]
+    )
+    assert result.exit_code == 2
+    assert "refusing to deploy" in result.output
+
+
+def test_search_finds_files_across_roots(tmp_path: Path):
+    make_mods(tmp_path / "disk_a")
+    make_file(tmp_path / "disk_b" / "ModC_v1" / "Textures" / "tx_a_road.dds")
+
+    error, *records = parse_output(
+        run(
+            "search",
+            "tx_a",
+            "--kind",
+            "file",
+            "--mods-path",
+            tmp_path / "disk_a",
+            "--mods-path",
+            tmp_path / "disk_b",
+        )
+    )
+
+    assert error["path"] == str(tmp_path / "disk_a" / "Unversioned")
+    assert [(record["mod"], record["text"]) for record in records] == [
+        (str(tmp_path / "disk_a" / "ModA_v1"), "textures/tx_a.dds"),
+        (str(tmp_path / "disk_a" / "ModB_v1"), "textures/tx_a.dds"),
+        (str(tmp_path / "disk_b" / "ModC_v1"), "textures/tx_a_road.dds"),
+    ]
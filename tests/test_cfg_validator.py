@@ -0,0 +1,58 @@
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from app.cfg_validator import validate_cfg_lines
+from app.ui.batch_cli import cli
+
+from conftest import make_file
+
+
+def test_reports_missing_duplicate_and_shadowed(tmp_path: Path):
+    make_file(tmp_path / "Morrowind" / "Data Files" / "Morrowind.esm")
+    make_file(tmp_path / "mods" / "ModA" / "ModA.esp")
+    make_file(tmp_path / "mods" / "Patch" / "MODA.ESP")
+
+    cfg_lines = [
+        "# a comment",
+        f'data="{tmp_path / "Morrowind" / "Data Files"}"',
+        f"data={tmp_path / 'mods' / 'ModA'}",
+        "data=mods/Patch",
+        f"data={tmp_path / 'mods' / 'Gone'}",
+        f"data={tmp_path / 'mods' / 'ModA'}",
+        "content=Morrowind.esm",
+        "content=moda.esp",
+        "content=Missing.esp",
+        "content=MORROWIND.ESM",
+    ]
+    issues = validate_cfg_lines(cfg_lines, base_path=tmp_path)
+
+    assert [(issue.kind, issue.entry.key, issue.entry.value) for issue in issues] == [
+        ("missing", "data", str(tmp_path / "mods" / "Gone")),
+        ("duplicate", "data", str(tmp_path / "mods" / "ModA")),
+        ("shadowed", "content", "moda.esp"),
+        ("missing", "content", "Missing.esp"),
+        ("duplicate", "content", "MORROWIND.ESM"),
+    ]
+    shadowed = issues[2].to_record()
+    assert shadowed["line"] == 8
+    assert shadowed["detail"].startswith(f"loaded from {tmp_path / 'mods' / 'Patch'}")
+
+
+def test_long_config_has_no_issues(tmp_path: Path):
+    cfg_lines = []
+    for idx in range(250):
+        make_file(tmp_path / f"mod_{idx}" / f"plugin_{idx}.esp")
+        cfg_lines.append(f"data={tmp_path / f'mod_{idx}'}")
+    cfg_lines += [f"content=plugin_{idx}.esp" for idx in range(250)]
+
+    assert validate_cfg_lines(cfg_lines) == []
+
+
+def test_validate_needs_an_existing_cfg(tmp_path: Path):
+    result = CliRunner().invoke(
+        cli, ["validate", "--cfg", str(tmp_path / "openmw.cfg")]
+    )
+
+    assert result.exit_code == 2
+    assert "does not exist" in result.output
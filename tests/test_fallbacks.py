@@ -0,0 +1,175 @@
+from pathlib import Path
+
+from click.testing import CliRunner
+
+from app.auto_datafiles import (
+    BoolValue,
+    ColourValue,
+    Value,
+    detect_fallback_type,
+    parse_fallback_line,
+    read_cfg,
+)
+from app.fallbacks import (
+    KIND_COLOUR,
+    KIND_FLOAT,
+    KIND_INT,
+    KIND_STRING,
+    FallbackTable,
+    merge_fallbacks,
+    read_ini_fallbacks,
+)
+from app.ui import batch_cli
+
+MORROWIND_INI = """\
+; comment
+[Game Files]
+GameFile0=Morrowind.esm
+
+[General]
+Werewolf FOV=100
+Stats Timer=0.50
+
+[Weather Clear]
+Sky Sunrise Color=117,141,164
+Ambient Loop Sound ID=None
+
+[Fonts]
+Font 0=magic_cards_regular
+"""
+
+
+def test_table_stores_typed_values():
+    table = FallbackTable()
+    table.set("A", "117, 141,164")
+    table.set("B", "100")
+    table.set("C", "0.50")
+    table.set("D", "magic_cards_regular")
+
+    assert [table.get_kind(name) for name in table] == [
+        KIND_COLOUR,
+        KIND_INT,
+        KIND_FLOAT,
+        KIND_STRING,
+    ]
+    assert table.get("A") == (117, 141, 164)
+    assert table.format("C") == "0.5"
+    assert table.get("missing") is None
+
+    table.set("B", "101")
+    table.set("A", "1,2,3")
+    table.set("D", "2.5")
+    assert (table.get("A"), table.get("B"), table.get("D")) == ((1, 2, 3), 101, 2.5)
+    assert len(table.ints) == 1 and len(table.colours) == 3
+
+
+def test_ini_import_merges_as_diff(tmp_path: Path):
+    ini_path = tmp_path / "Morrowind.ini"
+    ini_path.write_text(MORROWIND_INI, encoding="cp1252")
+    fallbacks = read_ini_fallbacks(ini_path)
+
+    assert list(fallbacks) == [
+        "General_Werewolf_FOV",
+        "General_Stats_Timer",
+        "Weather_Clear_Sky_Sunrise_Color",
+        "Weather_Clear_Ambient_Loop_Sound_ID",
+        "Fonts_Font_0",
+    ]
+
+    cfg_lines = [
+        "data=/games/Morrowind/Data Files",
+        "fallback=General_Stats_Timer,0.5",
+        "fallback=General_Werewolf_FOV,80",
+        "content=Morrowind.esm",
+    ]
+    merged, changes = merge_fallbacks(cfg_lines, fallbacks)
+
+    assert [change.to_record() for change in changes] == [
+        {"fallback": "General_Werewolf_FOV", "old": "80", "new": "100"},
+        {
+            "fallback": "Weather_Clear_Sky_Sunrise_Color",
+            "old": None,
+            "new": "117,141,164",
+        },
+        {"fallback": "Weather_Clear_Ambient_Loop_Sound_ID", "old": None, "new": "None"},
+        {"fallback": "Fonts_Font_0", "old": None, "new": "magic_cards_regular"},
+    ]
+    assert merged == [
+        "data=/games/Morrowind/Data Files",
+        "fallback=General_Stats_Timer,0.5",
+        "fallback=General_Werewolf_FOV,100",
+        "fallback=Weather_Clear_Sky_Sunrise_Color,117,141,164",
+        "fallback=Weather_Clear_Ambient_Loop_Sound_ID,None",
+        "fallback=Fonts_Font_0,magic_cards_regular",
+        "content=Morrowind.esm",
+    ]
+
+    # merging again changes nothing
+    assert merge_fallbacks(merged, fallbacks) == (merged, [])
+
+
+def test_merges_thousands(tmp_path: Path):
+    ini_lines = []
+    for section in range(50):
+        ini_lines.append(f"[Weather Test {section}]")
+        ini_lines += [f"Key {key}={key},{key},{key}" for key in range(100)]
+    ini_path = tmp_path / "Morrowind.ini"
+    ini_path.write_text("\n".join(ini_lines), encoding="cp1252")
+
+    merged, changes = merge_fallbacks([], read_ini_fallbacks(ini_path))
+
+    assert len(changes) == len(merged) == 5000
+
+
+def test_parse_fallback_line():
+    assert detect_fallback_type("117, 141,164") is ColourValue
+    assert detect_fallback_type(" 1") is BoolValue
+    assert detect_fallback_type("0.5") is Value
+    # too big for a colour component
+    assert detect_fallback_type("256,0,0") is Value
+
+    name, colour = parse_fallback_line("Weather_Clear_Sky_Sunrise_Color,117,141,164")
+    assert name == "Weather_Clear_Sky_Sunrise_Color"
+    assert str(colour) == "117,141,164"
+    assert (colour.red.value, colour.blue.value) == (117, 164)
+
+    name, flag = parse_fallback_line("Water_NearWaterRadius_Enabled,0")
+    assert isinstance(flag, BoolValue)
+    assert flag.value is False and str(flag) == "0"
+
+    # everything after the name is the value, commas and all
+    name, value = parse_fallback_line("Fonts_Font_0,magic,cards")
+    assert (name, str(value)) == ("Fonts_Font_0", "magic,cards")
+
+
+def test_read_cfg_keeps_fallbacks_in_a_table(tmp_path: Path):
+    cfg_path = tmp_path / "openmw.cfg"
+    cfg_path.write_text(
+        "# comment\n\ndata=/games/Morrowind/Data Files\n"
+        "fallback=General_Stats_Timer,0.5\n"
+        "fallback=Weather_Clear_Sky_Sunrise_Color,117,141,164\n"
+        "content=Morrowind.esm\n"
+    )
+
+    options, fallbacks = read_cfg(cfg_path)
+
+    assert [str(option) for option in options] == [
+        "data=/games/Morrowind/Data Files",
+        "content=Morrowind.esm",
+    ]
+    assert options[1].order == 5
+    assert fallbacks.get("Weather_Clear_Sky_Sunrise_Color") == (117, 141, 164)
+    assert fallbacks.get_kind("General_Stats_Timer") == KIND_FLOAT
+
+
+def test_import_ini_needs_an_existing_cfg(tmp_path: Path):
+    ini_path = tmp_path / "Morrowind.ini"
+    ini_path.write_text(MORROWIND_INI, encoding="cp1252")
+
+    result = CliRunner().invoke(
+        batch_cli.cli,
+        ["import-ini", str(ini_path), "--cfg", str(tmp_path / "openmw.cfg")],
+    )
+
+    assert result.exit_code == 2
+    assert "does not exist" in result.output
@@ -0,0 +1,177 @@
+import threading
+from pathlib import Path
+
+from app.mod_resources import (
+    ESPFile,
+    ModDataDir,
+    ModResourceDir,
+    ModsFolder,
+)
+from app.conflicts import find_file_conflicts
+
+from conftest import make_file
+
+
+def test_keys_are_case_folded_and_data_relative(tmp_path: Path):
+    make_file(tmp_path / "mods" / "Mod_v1" / "Data Files" / "TEXTURES" / "Tx_A.DDS")
+    make_file(tmp_path / "mods" / "Mod_v1" / "Data Files" / "Mod.ESP")
+
+    (mod,) = ModsFolder(tmp_path / "mods").mods
+    (data_dir,) = mod.get_data_dirs()
+
+    assert isinstance(data_dir, ModDataDir)
+    (resource_dir,) = data_dir.resource_dirs
+    assert isinstance(resource_dir, ModResourceDir)
+    assert resource_dir.folded_name == "textures"
+
+    (esp,) = data_dir.esp_files
+    assert isinstance(esp, ESPFile)
+    assert esp.data_key == "mod.esp"
+
+    (texture,) = resource_dir.children
+    assert texture.parent is resource_dir
+    assert texture.data_key == "textures/tx_a.dds"
+
+
+def test_conflicts_ignore_case(tmp_path: Path):
+    make_file(tmp_path / "mods" / "ModA_v1" / "Textures" / "tx_a.dds")
+    make_file(tmp_path / "mods" / "ModB_v1" / "textures" / "TX_A.dds")
+
+    mod_a, mod_b = ModsFolder(tmp_path / "mods").mods
+    data_dirs = mod_a.get_data_dirs() + mod_b.get_data_dirs()
+
+    assert list(find_file_conflicts(data_dirs)) == ["textures/tx_a.dds"]
+
+
+def test_multiple_roots_are_merged(tmp_path: Path):
+    make_file(tmp_path / "disk_a" / "Expansion Delay-47588-1-3-1612481103" / "a.esp")
+    make_file(tmp_path / "disk_a" / "Pickpocket_Fix_v101" / "pp.esp")
+    make_file(tmp_path / "disk_b" / "Tamriel_Data_v8 - HD" / "td.esm")
+
+    mods_folder = ModsFolder([tmp_path / "disk_a", tmp_path / "disk_b"])
+
+    assert [mod.name for mod in mods_folder.mods] == [
+        "Expansion Delay-47588-1-3-1612481103",
+        "Pickpocket_Fix_v101",
+        "Tamriel_Data_v8 - HD",
+    ]
+    assert mods_folder.get_duplicates() == []
+
+
+def test_ordered_scan_streams_in_root_order(tmp_path: Path):
+    for root, name in [
+        ("disk_a", "Pickpocket_Fix_v101"),
+        ("disk_a", "Expansion Delay-47588-1-3-1612481103"),
+        ("disk_b", "Tamriel_Data_v8 - HD"),
+    ]:
+        make_file(tmp_path / root / name / "plugin.esp")
+
+    mods_folder = ModsFolder([tmp_path / "disk_b", tmp_path / "disk_a"], scan=False)
+    mods = mods_folder.iter_mods(ordered=True)
+
+    assert next(mods).name == "Tamriel_Data_v8 - HD"
+    assert [mod.name for mod in mods] == [
+        "Expansion Delay-47588-1-3-1612481103",
+        "Pickpocket_Fix_v101",
+    ]
+
+
+def test_duplicates_across_roots(tmp_path: Path):
+    # same nexus id, different versions
+    make_file(tmp_path / "disk_a" / "Expansion Delay-47588-1-3-1612481103" / "a.esp")
+    make_file(tmp_path / "disk_b" / "Expansion Delay-47588-1-4-1612481103" / "a.esp")
+    # no nexus id - same title, but only one copy has the same contents
+    for root in ("disk_a", "disk_b"):
+        make_file(tmp_path / root / "Pickpocket_Fix_v101" / "pp.esp")
+    make_file(tmp_path / "disk_b" / "Pickpocket_Fix_v102" / "other.esp")
+
+    mods_folder = ModsFolder([tmp_path / "disk_a", tmp_path / "disk_b"])
+    duplicates = sorted(
+        sorted(str(mod.path.relative_to(tmp_path)) for mod in mods)
+        for mods in mods_folder.get_duplicates()
+    )
+
+    assert duplicates == [
+        [
+            "disk_a/Expansion Delay-47588-1-3-1612481103",
+            "disk_b/Expansion Delay-47588-1-4-1612481103",
+        ],
+        ["disk_a/Pickpocket_Fix_v101", "disk_b/Pickpocket_Fix_v101"],
+    ]
+
+
+def test_renamed_copies_are_duplicates(tmp_path: Path):
+    make_file(tmp_path / "disk_a" / "Pickpocket_Fix_v101" / "Data" / "pp.esp")
+    make_file(tmp_path / "disk_b" / "PP Fix Backup_v1" / "Data" / "pp.esp")
+    # same size and file count, but different contents
+    make_file(tmp_path / "disk_b" / "Other Mod_v1" / "Data" / "xx.esp")
+
+    mods_folder = ModsFolder([tmp_path / "disk_a", tmp_path / "disk_b"])
+    (duplicates,) = mods_folder.get_duplicates()
+
+    assert sorted(mod.name for mod in duplicates) == [
+        "PP Fix Backup_v1",
+        "Pickpocket_Fix_v101",
+    ]
+
+
+def test_scan_errors_are_reported_on_the_calling_thread(tmp_path: Path, monkeypatch):
+    make_file(tmp_path / "disk_a" / "ModA_v1" / "a.esp")
+    make_file(tmp_path / "disk_a" / "Unreadable_v1" / "a.esp")
+    (tmp_path / "disk_b" / "Unversioned").mkdir(parents=True)
+    # a name the folder name parser can't split up
+    (tmp_path / "disk_b" / "_").mkdir()
+
+    scan_tree = ModsFolder.scan_tree
+
+    def failing_scan_tree(mod):
+        if mod.name == "Unreadable_v1":
+            raise PermissionError(f"can't read {mod.path}")
+        scan_tree(mod)
+
+    monkeypatch.setattr(ModsFolder, "scan_tree", staticmethod(failing_scan_tree))
+
+    errors = []
+    mods_folder = ModsFolder([tmp_path / "disk_a", tmp_path / "disk_b"], scan=False)
+    mods = mods_folder.get_mods(
+        with_data_dirs=True,
+        on_error=lambda mod_path, e: errors.append(
+            (mod_path, threading.current_thread())
+        ),
+    )
+
+    (mod,) = mods
+    assert [data_dir.name for data_dir in mod.data_dirs] == ["ModA_v1"]
+    assert errors == [
+        (mod_path, threading.current_thread())
+        for mod_path in [
+            tmp_path / "disk_a" / "Unreadable_v1",
+            tmp_path / "disk_b" / "Unversioned",
+            tmp_path / "disk_b" / "_",
+        ]
+    ]
+
+
+def test_disk_usage_rolls_up_and_updates(tmp_path: Path):
+    mod_path = tmp_path / "mods" / "ModA_v1"
+    (mod_path / "Data Files" / "Textures").mkdir(parents=True)
+    (mod_path / "Data Files" / "Textures" / "tx_a.dds").write_bytes(b"a" * 100)
+    (mod_path / "Data Files" / "moda.esp").write_bytes(b"e" * 10)
+    (mod_path / "readme.txt").write_bytes(b"r" * 5)
+
+    (mod,) = ModsFolder(tmp_path / "mods").mods
+    (data_dir,) = mod.get_data_dirs()
+    (textures,) = data_dir.resource_dirs
+    (esp,) = data_dir.esp_files
+
+    assert textures.get_disk_usage() == (100, 1)
+    assert data_dir.get_disk_usage() == (110, 2)
+    assert mod.get_disk_usage() == (115, 3)
+
+    (textures.path / "tx_b.dds").write_bytes(b"b" * 50)
+    textures.rescan()
+
+    # only the changed branch is added up again
+    assert data_dir.esp_files == [esp]
+    assert mod.get_disk_usage() == (165, 4)
+    assert data_dir.to_record()["resource_dir_sizes"] == {"Textures": 150}
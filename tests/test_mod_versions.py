@@ -0,0 +1,53 @@
+from pathlib import Path
+
+from app.mod_resources import ModsFolder
+from app.mod_versions import find_version_groups, get_version_key
+from app.scan_cache import ScanCache
+
+
+def test_version_keys_compare_numerically():
+    assert get_version_key("4.0.2") < get_version_key("4.0.10")
+    assert get_version_key("v101") > get_version_key("v99")
+    assert get_version_key("v1.2") == get_version_key("1.2")
+    assert get_version_key("21.01.01") < get_version_key("21.02")
+    assert get_version_key("1.0b") < get_version_key("1.0.1")
+    assert get_version_key(None) == ()
+
+
+def test_duplicate_and_superseded_installs(tmp_path: Path):
+    for name in [
+        "Expansion Delay-47588-1-3-1612481103",
+        "Expansion Delay-47588-1-10-1612481200",
+        "Expansion_Delay-47588-1-10",
+        "Pickpocket_Fix_v101",
+        "PickpocketFix_v99",
+        "Tamriel_Data_v8 - HD",
+        "Tamriel_Data_v8 - LD",
+    ]:
+        (tmp_path / "mods" / name).mkdir(parents=True)
+
+    cache = ScanCache(tmp_path / "cache.json.gz")
+    mods_folder = ModsFolder(tmp_path / "mods", scan=False)
+    expansion, pickpocket = find_version_groups(mods_folder, cache)
+
+    assert expansion.identity == ("id", 47588, None)
+    assert expansion.latest.name == "Expansion Delay-47588-1-10-1612481200"
+    assert [install.name for install in expansion.duplicates] == [
+        "Expansion_Delay-47588-1-10"
+    ]
+    assert [install.name for install in expansion.superseded] == [
+        "Expansion Delay-47588-1-3-1612481103"
+    ]
+
+    # no nexus id, so matched on title
+    assert pickpocket.latest.name == "Pickpocket_Fix_v101"
+    assert [install.name for install in pickpocket.superseded] == ["PickpocketFix_v99"]
+
+    # unchanged folders are answered from the cache
+    cache.save()
+    warm_groups = find_version_groups(mods_folder, ScanCache(cache.path))
+    assert warm_groups == [expansion, pickpocket]
+
+    (tmp_path / "mods" / "PickpocketFix_v99").rmdir()
+    (expansion,) = find_version_groups(mods_folder, ScanCache(cache.path))
+    assert expansion.latest.name == "Expansion Delay-47588-1-10-1612481200"
@@ -0,0 +1,95 @@
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from app.mod_resources import ModDataDir, mod_resource_factory
+from app.overlay import deploy_overlay
+
+
+def make_data_dir(path: Path, files: List[str]) -> Path:
+    for file in files:
+        (path / file).parent.mkdir(parents=True, exist_ok=True)
+        (path / file).write_text(f"{path.name}/{file}")
+    return path
+
+
+def load(*paths: Path) -> List[ModDataDir]:
+    return [
+        ModDataDir(path, parent=None, child_factory=mod_resource_factory)
+        for path in paths
+    ]
+
+
+def test_later_data_dirs_win(tmp_path: Path):
+    base = make_data_dir(tmp_path / "base", ["Textures/a.dds", "Meshes/b.nif"])
+    patch = make_data_dir(tmp_path / "patch", ["textures/A.dds", "patch.esp"])
+    overlay = tmp_path / "overlay"
+
+    result = deploy_overlay(load(base, patch), overlay)
+
+    assert result.added == 3
+    assert (overlay / "textures" / "a.dds").read_text() == "patch/textures/A.dds"
+    assert (overlay / "meshes" / "b.nif").read_text() == "base/Meshes/b.nif"
+    assert (overlay / "patch.esp").exists()
+
+
+def test_redeploy_only_touches_changed_winners(tmp_path: Path):
+    base = make_data_dir(tmp_path / "base", ["Textures/a.dds", "Meshes/b.nif"])
+    patch = make_data_dir(tmp_path / "patch", ["textures/A.dds", "patch.esp"])
+    overlay = tmp_path / "overlay"
+    deploy_overlay(load(base, patch), overlay)
+
+    # with patch deactivated, base wins a.dds again and patch.esp goes
+    result = deploy_overlay(load(base), overlay)
+
+    assert (result.added, result.changed, result.removed) == (0, 1, 1)
+    assert result.unchanged == 1
+    assert (overlay / "textures" / "a.dds").read_text() == "base/Textures/a.dds"
+    assert not (overlay / "patch.esp").exists()
+
+    assert deploy_overlay(load(base), overlay).unchanged == 2
+
+
+def test_manifest_is_kept_outside_the_overlay(tmp_path: Path):
+    base = make_data_dir(tmp_path / "base", ["Textures/a.dds"])
+    overlay = tmp_path / "overlay"
+    deploy_overlay(load(base), overlay)
+
+    assert sorted(path.name for path in overlay.iterdir()) == ["textures"]
+    assert (tmp_path / "overlay.manifest.json").exists()
+
+
+def test_redeploy_repairs_deleted_links_and_relinks_reextracted_files(
+    tmp_path: Path,
+):
+    base = make_data_dir(tmp_path / "base", ["Textures/a.dds", "Meshes/b.nif"])
+    overlay = tmp_path / "overlay"
+    deploy_overlay(load(base), overlay)
+
+    (overlay / "meshes" / "b.nif").unlink()
+    # re-extracting replaces the file, so a hardlink would keep the old one
+    (base / "Textures" / "a.dds").unlink()
+    (base / "Textures" / "a.dds").write_text("new a.dds")
+
+    result = deploy_overlay(load(base), overlay)
+
+    assert (result.changed, result.repaired, result.unchanged) == (1, 1, 0)
+    assert (overlay / "textures" / "a.dds").read_text() == "new a.dds"
+    assert (overlay / "meshes" / "b.nif").read_text() == "base/Meshes/b.nif"
+    assert deploy_overlay(load(base), overlay).unchanged == 2
+
+
+def test_refuses_a_non_empty_directory_it_did_not_deploy(tmp_path: Path):
+    base = make_data_dir(tmp_path / "base", ["Textures/a.dds"])
+    data_files = make_data_dir(tmp_path / "Data Files", ["textures/a.dds"])
+
+    with pytest.raises(ValueError):
+        deploy_overlay(load(base), data_files)
+    assert (
+        data_files / "textures" / "a.dds"
+    ).read_text() == "Data Files/textures/a.dds"
+
+    # an empty directory is fine to start an overlay in
+    (tmp_path / "empty").mkdir()
+    assert deploy_overlay(load(base), tmp_path / "empty").added == 1
@@ -0,0 +1,96 @@
+import struct
+from pathlib import Path
+from typing import List, Tuple
+
+from app.plugin_records import (
+    CACHE_NAMESPACE,
+    find_record_conflicts,
+    read_record_keys,
+)
+from app.scan_cache import ScanCache
+
+
+def subrecord(name: bytes, data: bytes) -> bytes:
+    return struct.pack("<4sI", name, len(data)) + data
+
+
+def record(record_type: bytes, *subrecords: bytes) -> bytes:
+    data = b"".join(subrecords)
+    return struct.pack("<4sIII", record_type, len(data), 0, 0) + data
+
+
+def make_plugin(path: Path, records: List[bytes]) -> Path:
+    header = record(b"TES3", subrecord(b"HEDR", b"\0" * 300))
+    path.write_bytes(header + b"".join(records))
+    return path
+
+
+def npc(npc_id: str) -> bytes:
+    return record(
+        b"NPC_",
+        subrecord(b"NAME", npc_id.encode() + b"\0"),
+        subrecord(b"FNAM", b"Some Name\0"),
+        subrecord(b"NPDT", b"\0" * 52),
+    )
+
+
+def exterior_cell(x: int, y: int) -> bytes:
+    return record(
+        b"CELL",
+        subrecord(b"NAME", b"\0"),
+        subrecord(b"DATA", struct.pack("<Iii", 0, x, y)),
+    )
+
+
+def test_read_record_keys(tmp_path: Path):
+    plugin = make_plugin(
+        tmp_path / "a.esp",
+        [
+            npc("Fargoth"),
+            exterior_cell(-2, 5),
+            record(b"DIAL", subrecord(b"NAME", b"Background\0")),
+            record(b"INFO", subrecord(b"INAM", b"12345\0")),
+            record(b"SKIL", subrecord(b"INDX", struct.pack("<I", 8))),
+        ],
+    )
+
+    assert read_record_keys(plugin) == [
+        ("NPC_", "fargoth"),
+        ("CELL", "-2,5"),
+        ("DIAL", "background"),
+        ("INFO", "background|12345"),
+        ("SKIL", "8"),
+    ]
+
+
+def test_conflicts_are_reported_in_load_order(tmp_path: Path):
+    master = make_plugin(
+        tmp_path / "Morrowind.esm", [npc("fargoth"), npc("caius"), exterior_cell(0, 0)]
+    )
+    patch = make_plugin(tmp_path / "patch.esp", [npc("Fargoth"), exterior_cell(0, 0)])
+    other = make_plugin(tmp_path / "other.esp", [npc("FARGOTH"), npc("jiub")])
+
+    conflicts = find_record_conflicts([master, patch, other], max_workers=1)
+
+    found: List[Tuple] = [
+        (c.record_type, c.record_id, [p.name for p in c.plugins]) for c in conflicts
+    ]
+    assert found == [
+        ("CELL", "0,0", ["Morrowind.esm", "patch.esp"]),
+        ("NPC_", "fargoth", ["Morrowind.esm", "patch.esp", "other.esp"]),
+    ]
+    assert conflicts[1].winner == other
+
+
+def test_record_keys_are_cached(tmp_path: Path):
+    plugin = make_plugin(tmp_path / "a.esp", [npc("fargoth")])
+    cache = ScanCache(tmp_path / "cache.json.gz")
+
+    find_record_conflicts([plugin], cache=cache, max_workers=1)
+    cache.save()
+
+    reloaded = ScanCache(tmp_path / "cache.json.gz")
+    assert reloaded.get(CACHE_NAMESPACE, plugin) == [["NPC_", "fargoth"]]
+
+    make_plugin(plugin, [npc("fargoth"), npc("jiub")])
+    assert reloaded.get(CACHE_NAMESPACE, plugin) is None
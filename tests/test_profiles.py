@@ -0,0 +1,171 @@
+from pathlib import Path
+
+import pytest
+from click.testing import CliRunner
+
+from app import profiles
+from app.profiles import (
+    BLOCK_END,
+    OVERRIDDEN_PREFIX,
+    Profile,
+    ProfileStore,
+    replace_mod_data_paths,
+)
+from app.ui import batch_cli
+
+from conftest import make_file
+
+
+@pytest.fixture(scope="function")
+def setup(tmp_path: Path):
+    base = tmp_path / "Morrowind" / "Data Files"
+    make_file(base / "Morrowind.esm")
+    mods = tmp_path / "mods"
+    make_file(mods / "ModA_v1" / "Textures" / "tx_a.dds")
+    make_file(mods / "ModB_v1" / "textures" / "TX_A.dds")
+    make_file(mods / "ModB_v1" / "ModB.esp")
+
+    cfg_path = tmp_path / "openmw.cfg"
+    cfg_path.write_text(
+        "\n".join(
+            [
+                "fallback=Water_Map_Alpha,0.4",
+                f'data="{base}"',
+                f'data="{mods / "ModA_v1"}"',
+                f'data="{mods / "ModB_v1"}"',
+                "content=Morrowind.esm",
+                "content=ModB.esp",
+            ]
+        )
+        + "\n"
+    )
+    return tmp_path, cfg_path
+
+
+def test_save_and_switch(setup):
+    tmp_path, cfg_path = setup
+    store = ProfileStore(tmp_path / "profiles")
+
+    profile = Profile.from_cfg("Vanilla Plus", cfg_path)
+    profile.fallbacks = {"Water_Map_Alpha": "0.7"}
+    store.save(profile)
+
+    assert store.list_names() == ["Vanilla Plus"]
+    saved = store.load("Vanilla Plus")
+    assert saved.conflicts == {"textures/tx_a.dds": str(tmp_path / "mods" / "ModB_v1")}
+    assert not saved.is_stale
+
+    store.switch("Vanilla Plus", cfg_path)
+    store.switch("Vanilla Plus", cfg_path)
+    cfg_lines = cfg_path.read_text().splitlines()
+
+    # switching twice swaps the block, rather than adding another
+    assert cfg_lines[0] == OVERRIDDEN_PREFIX + "fallback=Water_Map_Alpha,0.4"
+    assert cfg_lines[1:] == saved.cfg_lines
+    assert cfg_lines[-2:] == ["fallback=Water_Map_Alpha,0.7", BLOCK_END]
+    assert sum(line.startswith("data=") for line in cfg_lines) == 3
+
+
+def test_changes_deep_in_a_data_dir_make_the_profile_stale(setup):
+    tmp_path, cfg_path = setup
+    store = ProfileStore(tmp_path / "profiles")
+    store.save(Profile.from_cfg("main", cfg_path))
+    assert not store.load("main").is_stale
+
+    # nested below the data dir, so its own modified time doesn't change
+    make_file(tmp_path / "mods" / "ModA_v1" / "Textures" / "tx_b.dds")
+    make_file(tmp_path / "mods" / "ModB_v1" / "Textures" / "tx_b.dds")
+    assert store.load("main").is_stale
+
+    refreshed = store.refresh("main")
+    assert not refreshed.is_stale
+    assert "textures/tx_b.dds" in refreshed.conflicts
+
+
+@pytest.mark.parametrize("name", ["", "../main", "a/b", ".hidden", "a\nb", "x" * 65])
+def test_invalid_profile_names(tmp_path: Path, name: str):
+    with pytest.raises(ValueError):
+        Profile(name, [], [])
+    with pytest.raises(ValueError):
+        ProfileStore(tmp_path).get_profile_path(name)
+
+
+def test_replace_mod_data_paths_keeps_other_entries():
+    data_paths = [Path("/games/Data Files"), Path("/mods/Old_v1"), Path("/other")]
+
+    assert replace_mod_data_paths(
+        data_paths, [Path("/mods/New_v2")], [Path("/mods")]
+    ) == [Path("/games/Data Files"), Path("/other"), Path("/mods/New_v2")]
+
+
+def test_save_from_records_keeps_base_data(setup, monkeypatch):
+    tmp_path, cfg_path = setup
+    monkeypatch.setattr(batch_cli.settings.core, "profiles_path", tmp_path / "p")
+    runner = CliRunner()
+
+    scan = runner.invoke(batch_cli.cli, ["scan", "--mods-path", str(tmp_path / "mods")])
+    records_path = tmp_path / "scan.ndjson"
+    # only ModB is wanted
+    records_path.write_text(scan.output.splitlines()[1] + "\n")
+
+    result = runner.invoke(
+        batch_cli.cli,
+        ["profile", "save", "ModB only", "--cfg", str(cfg_path)]
+        + ["--records", str(records_path)],
+    )
+    assert result.exit_code == 0, result.output
+
+    profile = ProfileStore(tmp_path / "p").load("ModB only")
+    assert profile.data_paths == [
+        tmp_path / "Morrowind" / "Data Files",
+        tmp_path / "mods" / "ModB_v1",
+    ]
+
+    bad_name = runner.invoke(batch_cli.cli, ["profile", "save", "../x"])
+    assert bad_name.exit_code == 2
+    assert "Invalid profile name" in bad_name.output
+
+
+def test_cli_switch_and_list_do_not_walk_data_dirs(setup, monkeypatch):
+    tmp_path, cfg_path = setup
+    monkeypatch.setattr(batch_cli.settings.core, "profiles_path", tmp_path / "p")
+    runner = CliRunner()
+    saved = runner.invoke(
+        batch_cli.cli,
+        ["profile", "save", "main", "--cfg", str(cfg_path)]
+        + ["--fallback", "Water_Map_Alpha,0.7"],
+    )
+    assert saved.exit_code == 0, saved.output
+
+    def walk(data_dir):
+        raise AssertionError(f"walked {data_dir}")
+
+    with monkeypatch.context() as patched:
+        patched.setattr(profiles, "get_data_dir_digest", walk)
+        for args in [["list"], ["switch", "main", "--cfg", str(cfg_path)]]:
+            result = runner.invoke(batch_cli.cli, ["profile", *args])
+            assert result.exit_code == 0, result.output
+            assert '"stale"' not in result.output
+
+    checked = runner.invoke(batch_cli.cli, ["profile", "refresh", "main", "--check"])
+    assert '"stale":false' in checked.output
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["--fallback", "Water_Map_Alpha"],
+        ["--fallback", ",0.7"],
+        ["--cfg", "missing.cfg"],
+    ],
+)
+def test_cli_save_rejects_bad_options(setup, monkeypatch, args):
+    tmp_path, cfg_path = setup
+    monkeypatch.setattr(batch_cli.settings.core, "profiles_path", tmp_path / "p")
+    if "--cfg" not in args:
+        args = args + ["--cfg", str(cfg_path)]
+
+    result = CliRunner().invoke(batch_cli.cli, ["profile", "save", "main", *args])
+
+    assert result.exit_code == 2
+    assert "Invalid value" in result.output
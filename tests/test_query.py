@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from app.mod_resources import ESPFile, ModDataDir, ModFile, ModsFolder
+from app.query import Query
+
+from conftest import make_file
+
+
+def test_data_dirs_in_every_branch(tmp_path: Path):
+    mod_path = tmp_path / "mods" / "Options_Mod_v1"
+    make_file(mod_path / "00 Core" / "core.esp")
+    make_file(mod_path / "00 Core" / "Optional" / "extra.esp")
+    make_file(mod_path / "01 Options" / "A" / "Textures" / "tx_a.dds")
+    make_file(mod_path / "01 Options" / "B" / "b.esp")
+
+    (mod,) = ModsFolder(tmp_path / "mods").mods
+    data_dirs = mod.get_data_dirs()
+
+    # data dirs nested inside another (00 Core/Optional) are left out
+    assert sorted(data_dir.path.relative_to(mod_path) for data_dir in data_dirs) == [
+        Path("00 Core"),
+        Path("01 Options/A"),
+        Path("01 Options/B"),
+    ]
+    assert all(isinstance(data_dir, ModDataDir) for data_dir in data_dirs)
+
+
+def test_queries_use_indexes(tmp_path: Path):
+    mod_path = tmp_path / "mods" / "Mod_v1"
+    make_file(mod_path / "Data Files" / "Mod.ESP", b"x" * 10)
+    make_file(mod_path / "Data Files" / "Textures" / "tx_a.dds", b"x" * 300)
+    make_file(mod_path / "Data Files" / "Textures" / "TX_B.DDS", b"x" * 50)
+    make_file(mod_path / "readme.txt", b"x" * 5)
+
+    mods_folder = ModsFolder(tmp_path / "mods")
+    (mod,) = mods_folder.mods
+    index = mod.query_index
+
+    plan = index.plan(Query(type=ModFile, glob="*.dds"))
+    assert plan.index == "extension"
+    assert index.plan(Query(type=ESPFile)).index == "type"
+    assert index.plan(Query(min_size=100)).index is None
+
+    textures = mod.find(extension=".DDS")
+    assert sorted(texture.data_key for texture in textures) == [
+        "textures/tx_a.dds",
+        "textures/tx_b.dds",
+    ]
+    (big,) = mod.find(type=ModFile, min_size=100)
+    assert big.data_key == "textures/tx_a.dds"
+
+    data_dir_path = mod_path / "Data Files"
+    in_data_dir = mod.find(data_dir=data_dir_path, max_depth=2)
+    assert sorted(r.folded_name for r in in_data_dir) == ["mod.esp", "textures"]
+    outside = mod.find(in_data_dir=False)
+    assert sorted(r.folded_name for r in outside) == ["data files", "readme.txt"]
+
+    (esp,) = mods_folder.find(type=ESPFile)
+    assert esp.path.name == "Mod.ESP"
+    # repeated queries come from the kept results
+    assert Query(type=ESPFile) in index._results
+
+
+def test_rescan_rebuilds_index(tmp_path: Path):
+    mod_path = tmp_path / "mods" / "Mod_v1"
+    make_file(mod_path / "Data Files" / "a.esp")
+
+    (mod,) = ModsFolder(tmp_path / "mods").mods
+    (data_dir,) = mod.get_data_dirs()
+    assert len(mod.find(type=ESPFile)) == 1
+
+    make_file(mod_path / "Data Files" / "b.esp")
+    data_dir.rescan()
+
+    assert len(mod.find(type=ESPFile)) == 2
+    assert len(data_dir.esp_files) == 2
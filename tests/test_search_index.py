@@ -0,0 +1,89 @@
+from pathlib import Path
+
+from app.mod_resources import ModsFolder
+from app.search_index import TrigramIndex
+
+from conftest import make_file
+
+
+def make_mods(root: Path):
+    make_file(root / "Better Bodies-3880-2-2" / "Data Files" / "Better Bodies.esp")
+    make_file(root / "Better Bodies-3880-2-2" / "Data Files" / "Meshes" / "bb.nif")
+    make_file(root / "Tamriel_Data_v8 - HD" / "Tamriel_Data.esm")
+    make_file(root / "Tamriel_Data_v8 - HD" / "Textures" / "Tx_TR_Road.dds")
+
+
+def test_scan_builds_search_index(tmp_path: Path):
+    make_mods(tmp_path)
+    mods_folder = ModsFolder(tmp_path, scan=False)
+    list(mods_folder.iter_mods(with_data_dirs=True))
+
+    (result,) = mods_folder.search_index.search("tr_road")
+    assert result.kind == "file"
+    assert result.text == "textures/tx_tr_road.dds"
+    assert result.mod_path == str(tmp_path / "Tamriel_Data_v8 - HD")
+
+    results = mods_folder.search_index.search("bodies", kinds=["title", "plugin"])
+    assert [result.kind for result in results] == ["title", "plugin"]
+
+
+def test_header_only_scan_is_filled_in_by_walk_trees(tmp_path: Path):
+    make_mods(tmp_path)
+    mods_folder = ModsFolder(tmp_path, scan=False)
+    mods = mods_folder.get_mods()
+    search_index = mods_folder.search_index
+    assert search_index.search("tr_road") == []
+
+    for mod in mods_folder.walk_trees(mods):
+        search_index.update_mod(mod)
+
+    (result,) = search_index.search("tr_road")
+    assert result.mod_path == str(tmp_path / "Tamriel_Data_v8 - HD")
+    assert len(search_index.search("tamriel", kinds=["title"])) == 1
+
+
+def test_search_ranks_and_fuzzy_matches():
+    search_index = TrigramIndex()
+    search_index.add_document("title", "Graphic Herbalism", "a")
+    search_index.add_document("title", "Herbalism for Purists", "b")
+    search_index.add_document("file", "meshes/herbalism/ingred.nif", "c")
+
+    results = search_index.search("herbalism")
+    # matches at the start first, then word starts, then shorter texts
+    assert [result.mod_path for result in results] == ["b", "a", "c"]
+
+    # a typo still finds it, just lower down
+    (result,) = search_index.search("graphic herbalsim")
+    assert result.mod_path == "a"
+    assert result.score < 1
+
+    assert [result.mod_path for result in search_index.search("gr")] == ["a"]
+
+
+def test_common_queries_rank_every_match():
+    search_index = TrigramIndex()
+    for idx in range(25_000):
+        search_index.add_document("file", f"textures/tx_{idx:05}.dds", "a")
+    # added last, but the shortest match
+    search_index.add_document("file", "tx.dds", "b")
+
+    (result,) = search_index.search("dds", limit=1)
+    assert result.mod_path == "b"
+
+
+def test_update_mod_replaces_documents(tmp_path: Path):
+    make_mods(tmp_path)
+    mods_folder = ModsFolder(tmp_path, scan=False)
+    mod, _ = mods_folder.get_mods(with_data_dirs=True)
+    search_index = mods_folder.search_index
+
+    make_file(mod.path / "Data Files" / "Textures" / "tx_new.dds")
+    mods_folder.rescan_mod(mod, with_data_dirs=True)
+
+    assert len(search_index.search("tx_new")) == 1
+    assert len(search_index.search("better bodies", kinds=["title"])) == 1
+
+    search_index.remove_mod(str(mod.path))
+    search_index.compact()
+    assert search_index.search("bodies") == []
+    assert all(search_index.postings.values())
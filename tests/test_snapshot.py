@@ -0,0 +1,98 @@
+from pathlib import Path
+
+import pytest
+
+from app.mod_resources import ModsFolder
+from app.snapshot import diff_snapshots, load_snapshot, save_snapshot, take_snapshot
+
+from conftest import make_file
+
+
+@pytest.fixture(scope="function")
+def mods_path(tmp_path: Path) -> Path:
+    mods_path = tmp_path / "tmp_mods"
+    make_file(mods_path / "Patch for Purists-45096-4-0-1-1593803721" / "PfP.esm")
+    make_file(mods_path / "Expansion Delay-47588-1-3-1612481103" / "Delay.esp")
+    make_file(mods_path / "Pickpocket_Fix_v101" / "Textures" / "tx_a.dds")
+    return mods_path
+
+
+def snapshot_of(mods_path: Path):
+    return take_snapshot(ModsFolder(mods_path).mods)
+
+
+def test_unchanged_folder_has_empty_diff(mods_path: Path):
+    assert diff_snapshots(snapshot_of(mods_path), snapshot_of(mods_path)).is_empty
+
+
+def test_snapshot_round_trip(mods_path: Path, tmp_path: Path):
+    snapshot = snapshot_of(mods_path)
+    save_snapshot(snapshot, tmp_path / "snapshot.json.gz")
+
+    assert load_snapshot(tmp_path / "snapshot.json.gz") == snapshot
+
+
+def test_added_and_removed_mods(mods_path: Path):
+    old = snapshot_of(mods_path)
+    make_file(mods_path / "Fonts-46854-1-0-1559397215" / "Fonts" / "a.fnt")
+    (mods_path / "Pickpocket_Fix_v101" / "Textures" / "tx_a.dds").unlink()
+    (mods_path / "Pickpocket_Fix_v101" / "Textures").rmdir()
+    (mods_path / "Pickpocket_Fix_v101").rmdir()
+
+    diff = diff_snapshots(old, snapshot_of(mods_path))
+
+    assert diff.added_mods == [str(mods_path / "Fonts-46854-1-0-1559397215")]
+    assert diff.removed_mods == [str(mods_path / "Pickpocket_Fix_v101")]
+
+
+def test_version_bump_is_matched_by_nexus_id(mods_path: Path):
+    old = snapshot_of(mods_path)
+    old_dir = mods_path / "Patch for Purists-45096-4-0-1-1593803721"
+    new_dir = mods_path / "Patch for Purists-45096-4-0-2-1593803721"
+    old_dir.rename(new_dir)
+    make_file(new_dir / "PfP - Extras.esp")
+
+    diff = diff_snapshots(old, snapshot_of(mods_path))
+
+    assert diff.added_mods == []
+    assert diff.removed_mods == []
+    assert diff.version_changes == [(str(old_dir), str(new_dir), "4.0.1", "4.0.2")]
+    assert diff.added_files == [(str(new_dir), "PfP - Extras.esp")]
+
+
+def test_plugin_files_added_and_removed_in_subdirs(mods_path: Path):
+    mod_dir = mods_path / "Expansion Delay-47588-1-3-1612481103"
+    old = snapshot_of(mods_path)
+    (mod_dir / "Delay.esp").unlink()
+    make_file(mod_dir / "Optional" / "Delay - Lite.esp")
+    make_file(mod_dir / "Optional" / "Delay - OpenMW.omwaddon")
+
+    diff = diff_snapshots(old, snapshot_of(mods_path))
+
+    assert diff.added_files == [
+        (str(mod_dir), "Optional/Delay - Lite.esp"),
+        (str(mod_dir), "Optional/Delay - OpenMW.omwaddon"),
+    ]
+    assert diff.removed_files == [(str(mod_dir), "Delay.esp")]
+
+
+def test_same_mod_under_two_roots(tmp_path: Path):
+    roots = [tmp_path / "disk_a", tmp_path / "disk_b"]
+    for root in roots:
+        make_file(root / "Fonts-46854-1-0-1559397215" / "Fonts" / "a.fnt")
+    old = take_snapshot(ModsFolder(roots).mods)
+    assert len(old["mods"]) == 2
+
+    for root in roots:
+        old_dir = root / "Fonts-46854-1-0-1559397215"
+        old_dir.rename(root / "Fonts-46854-1-1-1559397215")
+    make_file(roots[0] / "Other Mod-1234-1-0" / "other.esp")
+
+    diff = diff_snapshots(old, take_snapshot(ModsFolder(roots).mods))
+
+    # both installs are matched up, rather than one shadowing the other
+    assert diff.removed_mods == []
+    assert diff.added_mods == [str(roots[0] / "Other Mod-1234-1-0")]
+    assert sorted(change[1] for change in diff.version_changes) == [
+        str(root / "Fonts-46854-1-1-1559397215") for root in roots
+    ]
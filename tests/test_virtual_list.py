@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from app.mod_resources import ModsFolder
+from app.ui.virtual_list import get_row_key, get_visible_window
+
+
+def test_visible_window_at_start_middle_and_end():
+    assert get_visible_window(0, 30, 100) == range(0, 30)
+    assert get_visible_window(40, 30, 100) == range(40, 70)
+    # scrolling past the end keeps a full page in view
+    assert get_visible_window(90, 30, 100) == range(70, 100)
+
+
+def test_visible_window_with_few_items():
+    assert get_visible_window(0, 30, 10) == range(0, 10)
+    assert get_visible_window(5, 30, 10) == range(0, 10)
+    assert get_visible_window(0, 30, 0) == range(0)
+    assert get_visible_window(-5, 30, 100) == range(0, 30)
+
+
+def test_row_keys_differ_for_same_name_in_two_roots(tmp_path: Path):
+    for root in ("disk_a", "disk_b"):
+        (tmp_path / root / "Mod_v1").mkdir(parents=True)
+
+    mods_folder = ModsFolder([tmp_path / "disk_a", tmp_path / "disk_b"])
+    mod_a, mod_b = mods_folder.mods
+
+    assert mod_a.name == mod_b.name
+    assert get_row_key(mod_a) != get_row_key(mod_b)